@@ -1,27 +1,68 @@
 #!/usr/bin/env python3
 
+import time
+_module_load_started = time.perf_counter()  # Reported by --startup-profile.
+
 import sys
 import json
 import struct
-import time
-import psutil
-import requests
-import subprocess
 import re
-import socks
 import socket
+import select
+import signal
+import urllib.parse
 import logging
 import shutil
 import os
 import logging.handlers
-import getpass
-import platform
+import threading
+import concurrent.futures
+import atexit
+import base64
+import contextlib
+import hashlib
+import importlib
+import math
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# --- Lazy Imports ---
+# Chrome starts the host for a session, and a cold start is paid before the first reply.
+# Heavy modules are therefore loaded on first use instead of at startup: the ones used
+# throughout the host are bound to _LazyModule proxies below, and the ones used by a single
+# command (platform, getpass, ctypes, the benchmark servers, certifi) are imported inside it.
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            # import_module() is thread-safe, so racing workers get the same module.
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    @property
+    def is_loaded(self):
+        return self._module is not None
+
+psutil = _LazyModule("psutil")
+socks = _LazyModule("socks")
+ssl = _LazyModule("ssl")
+subprocess = _LazyModule("subprocess")
+LAZY_MODULES = {"psutil": psutil, "socks": socks, "ssl": ssl, "subprocess": subprocess}
+
 POSIX = os.name == 'posix'
 
 # --- Setup Logging ---
-log_dir = Path(__file__).resolve().parent.parent / "log"
+# Inside a zipapp, __file__ points into the archive; the archive then takes the place of
+# the script, so the paths below are the same for both layouts.
+HOST_PATH = Path(__file__).resolve()
+if HOST_PATH.parent.is_file():
+    HOST_PATH = HOST_PATH.parent
+log_dir = HOST_PATH.parent.parent / "log"
 log_dir.mkdir(parents=True, exist_ok=True)
 log_file = log_dir / "holocron_native_host.log"
 
@@ -30,7 +71,8 @@ log_file = log_dir / "holocron_native_host.log"
 # Note: This means logs are only re-initialized if the main log file is deleted.
 is_first_run = not log_file.exists()
 
-handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=1_048_576, backupCount=3)
+# The log file is opened on the first record rather than at startup.
+handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=1_048_576, backupCount=3, delay=True)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(funcName)s] - %(message)s')
 handler.setFormatter(formatter)
 logger = logging.getLogger()
@@ -45,14 +87,31 @@ if is_first_run:
     logging.info("--- Native host script started for the first time ---")
 
 # --- Paths ---
-SCRIPT_DIR = Path(__file__).resolve().parent
+SCRIPT_DIR = HOST_PATH.parent
 SHELL_SCRIPT_PATH = SCRIPT_DIR.parent / "sh" / "work_connect.sh"
 OPENVPN_SCRIPT_PATH = SCRIPT_DIR.parent / "sh" / "openvpn_connect.sh"
 V2RAY_SCRIPT_PATH = SCRIPT_DIR.parent / "sh" / "v2ray_connect.sh"
 CONN_LOG_DIR = log_dir / "connections"
 CONN_LOG_DIR.mkdir(exist_ok=True)
 
-
+# --- Concurrency ---
+# Requests are handled on a worker pool. Lifecycle commands (start/stop/test) for the
+# same tunnel identifier are serialized so two starts of one tunnel cannot race, while
+# commands for other tunnels and read-only requests proceed in parallel.
+MAX_WORKERS = 8
+# Probes get their own pool so that they never wait behind the requests that issued them.
+STATUS_DEADLINE_SECONDS = 10
+_probe_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="holocron-probe")
+_stdout_lock = threading.Lock()
+_tunnel_locks = {}
+_tunnel_locks_guard = threading.Lock()
+
+
+def get_tunnel_lock(config):
+    """Returns the re-entrant lock that serializes lifecycle commands for a config's tunnel."""
+    identifier = (config or {}).get("sshCommandIdentifier") or (config or {}).get("id")
+    with _tunnel_locks_guard:
+        return _tunnel_locks.setdefault(identifier, threading.RLock())
 
 def read_message():
     """Reads a message from stdin, prefixed with a 4-byte length."""
@@ -67,82 +126,664 @@ def send_message(message_content):
     """Sends a message to stdout, prefixed with a 4-byte length."""
     encoded_content = json.dumps(message_content).encode('utf-8')
     encoded_length = struct.pack('@I', len(encoded_content))
-    sys.stdout.buffer.write(encoded_length)
-    sys.stdout.buffer.write(encoded_content)
-    sys.stdout.buffer.flush()
+    # Several worker threads may respond at once; a frame must never be interleaved.
+    with _stdout_lock:
+        sys.stdout.buffer.write(encoded_length)
+        sys.stdout.buffer.write(encoded_content)
+        sys.stdout.buffer.flush()
+
+def _elapsed_ms(start_time):
+    """Returns the milliseconds elapsed since a time.perf_counter() reading."""
+    return int((time.perf_counter() - start_time) * 1000)
+
+# --- Metrics ---
+# Commands and the stages inside them (tunnel start/stop, status lookups, process scans,
+# probes) are timed into fixed-bucket histograms, so memory stays bounded over a long
+# session and the buckets map directly onto Prometheus histograms. Percentiles are
+# interpolated within their bucket. Counters tally failures by error class and probe
+# outcomes. 'getMetrics' returns a snapshot; when HOLOCRON_METRICS_TEXTFILE is set (see
+# the launcher), the snapshot is also written there in the Prometheus text format for
+# node_exporter's textfile collector.
+METRICS_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+METRICS_TEXTFILE = os.environ.get("HOLOCRON_METRICS_TEXTFILE")
+METRICS_TEXTFILE_INTERVAL_SECONDS = 15
+_metrics_started_at = time.time()
+_histograms = {}  # (kind, name) -> {"buckets", "count", "sum_ms", "max_ms"}; kind is "command" or "stage"
+_failure_counts = {}  # (source, error_class) -> count
+_probe_outcome_counts = {}  # (probe, outcome) -> count
+_metrics_lock = threading.Lock()
+
+def record_timing(kind, name, elapsed_ms):
+    """Adds a duration to the histogram of a command or stage."""
+    index = next((i for i, bound in enumerate(METRICS_BUCKETS_MS) if elapsed_ms <= bound), len(METRICS_BUCKETS_MS))
+    with _metrics_lock:
+        histogram = _histograms.get((kind, name))
+        if histogram is None:
+            histogram = _histograms[(kind, name)] = {"buckets": [0] * (len(METRICS_BUCKETS_MS) + 1),
+                                                     "count": 0, "sum_ms": 0.0, "max_ms": 0.0}
+        histogram["buckets"][index] += 1
+        histogram["count"] += 1
+        histogram["sum_ms"] += elapsed_ms
+        histogram["max_ms"] = max(histogram["max_ms"], elapsed_ms)
+
+def record_failure(source, error_class):
+    """Counts a failure of a command or stage by its error class."""
+    with _metrics_lock:
+        _failure_counts[(source, error_class)] = _failure_counts.get((source, error_class), 0) + 1
+
+def record_probe_outcome(probe, outcome):
+    """Counts the outcome of a probe ('ok', or the error it reported)."""
+    with _metrics_lock:
+        _probe_outcome_counts[(probe, outcome)] = _probe_outcome_counts.get((probe, outcome), 0) + 1
+
+@contextlib.contextmanager
+def timed(kind, name):
+    """Times the enclosed block into a histogram, and counts the exception if it raises one."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_failure(name, e.__class__.__name__)
+        raise
+    finally:
+        record_timing(kind, name, (time.perf_counter() - start_time) * 1000)
+
+def _timed_call(name, func, **kwargs):
+    """Calls `func` as a timed stage. Used for work submitted to an executor."""
+    with timed("stage", name):
+        return func(**kwargs)
+
+def _histogram_percentile(histogram, q):
+    """Estimates a percentile from a histogram by interpolating within the bucket holding it."""
+    target = q * histogram["count"]
+    seen = 0
+    for index, count in enumerate(histogram["buckets"]):
+        if count and seen + count >= target:
+            lower = METRICS_BUCKETS_MS[index - 1] if index > 0 else 0
+            upper = METRICS_BUCKETS_MS[index] if index < len(METRICS_BUCKETS_MS) else histogram["max_ms"]
+            # Never report more than was observed, e.g. when every sample sits low in its bucket.
+            return round(min(lower + (upper - lower) * (target - seen) / count, histogram["max_ms"]), 2)
+        seen += count
+    return round(histogram["max_ms"], 2)
+
+def _copy_metrics():
+    """Returns consistent copies of the histograms, failure counts and probe outcome counts."""
+    with _metrics_lock:
+        histograms = {key: {**value, "buckets": list(value["buckets"])} for key, value in _histograms.items()}
+        return histograms, dict(_failure_counts), dict(_probe_outcome_counts)
+
+def get_metrics():
+    """Returns a snapshot of all metrics, with per-command and per-stage latency summaries."""
+    histograms, failures, probe_outcomes = _copy_metrics()
+    timings = {"command": {}, "stage": {}}
+    for (kind, name), histogram in sorted(histograms.items()):
+        timings[kind][name] = {
+            "count": histogram["count"], "mean_ms": round(histogram["sum_ms"] / histogram["count"], 2),
+            "p50_ms": _histogram_percentile(histogram, 0.5), "p95_ms": _histogram_percentile(histogram, 0.95),
+            "p99_ms": _histogram_percentile(histogram, 0.99), "max_ms": round(histogram["max_ms"], 2),
+        }
+    outcomes = {}
+    for (probe, outcome), count in sorted(probe_outcomes.items()):
+        outcomes.setdefault(probe, {})[outcome] = count
+    return {
+        "started_at": _metrics_started_at,
+        "uptime_seconds": round(time.time() - _metrics_started_at, 1),
+        "commands": timings["command"],
+        "stages": timings["stage"],
+        "failures": [{"source": source, "error_class": error_class, "count": count}
+                     for (source, error_class), count in sorted(failures.items())],
+        "probe_outcomes": outcomes,
+    }
+
+def _prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_prometheus_metrics():
+    """Renders the metrics in the Prometheus text exposition format."""
+    histograms, failures, probe_outcomes = _copy_metrics()
+    lines = ["# HELP holocron_start_time_seconds When the native host session started.",
+             "# TYPE holocron_start_time_seconds gauge",
+             f"holocron_start_time_seconds {_metrics_started_at:.3f}"]
+    for kind in ("command", "stage"):
+        metric = f"holocron_{kind}_duration_seconds"
+        lines += [f"# HELP {metric} Duration of native host {kind}s.", f"# TYPE {metric} histogram"]
+        for (histogram_kind, name), histogram in sorted(histograms.items()):
+            if histogram_kind != kind:
+                continue
+            label = f'{kind}="{_prometheus_label(name)}"'
+            cumulative = 0
+            for bound, count in zip(METRICS_BUCKETS_MS + (float("inf"),), histogram["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound / 1000:g}"
+                lines.append(f'{metric}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label}}} {histogram['sum_ms'] / 1000:.6f}")
+            lines.append(f"{metric}_count{{{label}}} {histogram['count']}")
+    lines += ["# HELP holocron_failures_total Failed commands and stages by error class.",
+              "# TYPE holocron_failures_total counter"]
+    lines += [f'holocron_failures_total{{source="{_prometheus_label(source)}",'
+              f'error_class="{_prometheus_label(error_class)}"}} {count}'
+              for (source, error_class), count in sorted(failures.items())]
+    lines += ["# HELP holocron_probe_outcomes_total Probe results by outcome.",
+              "# TYPE holocron_probe_outcomes_total counter"]
+    lines += [f'holocron_probe_outcomes_total{{probe="{_prometheus_label(probe)}",'
+              f'outcome="{_prometheus_label(outcome)}"}} {count}'
+              for (probe, outcome), count in sorted(probe_outcomes.items())]
+    return "\n".join(lines) + "\n"
+
+def write_metrics_textfile(path):
+    """Writes the metrics to a textfile atomically, so node_exporter never reads a partial file."""
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temp_path.write_text(format_prometheus_metrics())
+    os.replace(temp_path, path)
+
+def _run_metrics_textfile_writer(path):
+    """Rewrites the metrics textfile periodically for the lifetime of the session."""
+    while True:
+        try:
+            write_metrics_textfile(path)
+        except OSError as e:
+            logging.warning(f"Could not write the metrics textfile {path}: {e}")
+        time.sleep(METRICS_TEXTFILE_INTERVAL_SECONDS)
+
+# --- DNS Cache ---
+# Direct probes resolve their host through this cache instead of calling the blocking
+# resolver on every check. getaddrinfo() does not expose record TTLs, so answers are kept
+# for DNS_CACHE_TTL_SECONDS and failures for DNS_NEGATIVE_TTL_SECONDS. An expired answer
+# is served while a background lookup refreshes it, so a slow resolver (common on captive
+# or censored networks) only delays the first lookup of a host. Probes through a SOCKS
+# proxy do not resolve locally at all: the proxy resolves the hostname remotely.
+DNS_CACHE_TTL_SECONDS = 60
+DNS_NEGATIVE_TTL_SECONDS = 15
+DNS_CACHE_MAX_ENTRIES = 256
+DNS_RESOLVE_TIMEOUT_SECONDS = 5
+_dns_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="holocron-dns")
+_dns_cache = {}  # host -> {"address", "error", "expires_at"}
+_dns_lookups = {}  # host -> Future of the lookup in progress
+_dns_cache_lock = threading.Lock()
+
+def _lookup_host(host):
+    """
+    Resolves `host` with the system resolver and caches the answer or the failure. Errors
+    other than gaierror (e.g. UnicodeError for an over-long label) are cached as failures too.
+    """
+    try:
+        try:
+            address, error = socket.gethostbyname(host), None
+        except socket.gaierror as e:
+            address, error = None, e.args
+        except Exception as e:
+            address, error = None, (socket.EAI_NONAME, f"{e.__class__.__name__}: {e}")
+        ttl = DNS_CACHE_TTL_SECONDS if error is None else DNS_NEGATIVE_TTL_SECONDS
+        with _dns_cache_lock:
+            if host not in _dns_cache and len(_dns_cache) >= DNS_CACHE_MAX_ENTRIES:
+                _dns_cache.pop(next(iter(_dns_cache)))  # Evict the oldest entry.
+            _dns_cache[host] = {"address": address, "error": error, "expires_at": time.monotonic() + ttl}
+        return address, error
+    finally:
+        with _dns_cache_lock:
+            _dns_lookups.pop(host, None)
+
+def _start_host_lookup(host):
+    """Returns the lookup in progress for `host`, starting one if needed. Requires _dns_cache_lock."""
+    future = _dns_lookups.get(host)
+    if future is None:
+        future = _dns_lookups[host] = _dns_executor.submit(_lookup_host, host)
+    return future
+
+def resolve_host(host, timeout=DNS_RESOLVE_TIMEOUT_SECONDS):
+    """
+    Resolves a hostname to an IPv4 address through the DNS cache.
+    Raises socket.gaierror if the host does not resolve (also while that failure is cached)
+    and socket.timeout if the resolver does not answer within `timeout` seconds.
+    """
+    with _dns_cache_lock:
+        entry = _dns_cache.get(host)
+        if entry and entry["expires_at"] <= time.monotonic():
+            _start_host_lookup(host)
+            if entry["error"] is not None:
+                entry = None  # Wait for the new lookup rather than repeat an expired failure.
+        future = None if entry else _start_host_lookup(host)
+    if future is not None:
+        try:
+            address, error = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise socket.timeout(f"Resolving {host} took longer than {timeout}s.")
+        entry = {"address": address, "error": error}
+    if entry["error"] is not None:
+        raise socket.gaierror(*entry["error"])
+    return entry["address"]
+
+def invalidate_dns_cache():
+    """Forgets all cached answers, e.g. after a VPN changed the system's DNS servers."""
+    with _dns_cache_lock:
+        _dns_cache.clear()
 
 def perform_tcp_ping(host, port=443, timeout=2, socks_port=None):
-    """Performs a TCP 'ping' by attempting a socket connection."""
+    """
+    Performs a TCP 'ping' by attempting a socket connection.
+    Returns (latency_ms, error_name, timings) where timings holds the DNS and
+    connect phases in milliseconds. Through a proxy the hostname is resolved remotely,
+    so DNS time is part of the connect phase.
+    """
     sock = None
+    timings = {"dns_ms": None, "connect_ms": None}
     try:
         sock = socks.socksocket() if socks_port else socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         if socks_port:
-            sock.set_proxy(socks.SOCKS5, "127.0.0.1", socks_port)
+            # The proxy resolves the hostname remotely, so there is no local lookup.
+            sock.set_proxy(socks.SOCKS5, "127.0.0.1", socks_port, rdns=True)
+            addr = host
+        else:
+            dns_start = time.perf_counter()
+            addr = resolve_host(host, timeout)
+            timings["dns_ms"] = _elapsed_ms(dns_start)
         sock.settimeout(timeout)
-        addr = socket.gethostbyname(host)
         start_time = time.perf_counter()
         sock.connect((addr, port))
-        end_time = time.perf_counter()
-        latency_ms = int((end_time - start_time) * 1000)
+        latency_ms = _elapsed_ms(start_time)
+        timings["connect_ms"] = latency_ms
         proxy_msg = f" via SOCKS port {socks_port}" if socks_port else " (direct)"
         logging.debug(f"TCP ping to {host}:{port}{proxy_msg} successful. Latency: {latency_ms}ms.")
-        return latency_ms, None
-    except (socks.ProxyError, socket.gaierror, socket.timeout, ConnectionRefusedError, OSError) as e:
+        return latency_ms, None, timings
+    except (socks.ProxyError, socket.gaierror, socket.timeout, ConnectionRefusedError, OSError,
+            UnicodeError, ValueError) as e:
         error_name = e.__class__.__name__
         proxy_msg = f" via SOCKS port {socks_port}" if socks_port else " (direct)"
         logging.warning(f"TCP ping to {host}:{port}{proxy_msg} failed: {error_name}")
-        return -1, error_name
+        return -1, error_name, timings
     finally:
         if sock:
             sock.close()
 
+_tls_context = None
+_tls_context_lock = threading.Lock()
+
+def get_tls_context():
+    """
+    Returns the TLS context for web checks, preferring certifi's CA bundle when available.
+    Loading the CA bundle is slow, so the context is created by the first web check.
+    """
+    global _tls_context
+    with _tls_context_lock:
+        if _tls_context is None:
+            try:
+                import certifi
+                _tls_context = ssl.create_default_context(cafile=certifi.where())
+            except ImportError:
+                _tls_context = ssl.create_default_context()
+        return _tls_context
+
+# --- Web Check Connection Pool ---
+# Web checks keep their connection open between status ticks, one pool entry per SOCKS
+# port, so a check measures the tunnel round trip rather than a fresh SOCKS handshake,
+# remote DNS lookup, TCP connect and TLS handshake each time. The cost of the last cold
+# connect is kept alongside so it can still be reported. Entries are dropped when
+# get_tunnel_status() sees their tunnel go down or move to another port.
+WEB_CHECK_POOL_MAX_IDLE_SECONDS = 120
+_web_check_pool = {}  # socks_port -> {"sock", "target", "idle_since"}
+_web_check_cold_connect_ms = {}  # socks_port -> cost of the last cold connect
+_web_check_pool_owners = {}  # tunnel identifier -> socks_port
+_web_check_pool_lock = threading.Lock()
+
+def _take_pooled_connection(socks_port, target):
+    """Removes and returns an idle, still-open pooled connection for the target, if any."""
+    with _web_check_pool_lock:
+        entry = _web_check_pool.pop(socks_port, None)
+    if not entry:
+        return None
+    sock = entry["sock"]
+    is_fresh = time.monotonic() - entry["idle_since"] < WEB_CHECK_POOL_MAX_IDLE_SECONDS
+    # A readable idle socket means the server closed it (or sent something unexpected).
+    if entry["target"] != target or not is_fresh or select.select([sock], [], [], 0)[0]:
+        sock.close()
+        return None
+    return sock
+
+def _return_pooled_connection(socks_port, target, sock):
+    """Puts a connection back into the pool, replacing (and closing) any previous entry."""
+    with _web_check_pool_lock:
+        previous = _web_check_pool.pop(socks_port, None)
+        _web_check_pool[socks_port] = {"sock": sock, "target": target, "idle_since": time.monotonic()}
+    if previous:
+        previous["sock"].close()
+
+def invalidate_web_check_pool(socks_port):
+    """Closes the pooled web check connection for a SOCKS port and forgets its cold-connect cost."""
+    with _web_check_pool_lock:
+        entry = _web_check_pool.pop(socks_port, None)
+        _web_check_cold_connect_ms.pop(socks_port, None)
+    if entry:
+        logging.debug(f"Closed pooled web check connection for SOCKS port {socks_port}.")
+        entry["sock"].close()
+
+def _sync_web_check_pool(identifier, status):
+    """Keeps the web check pool in step with the tunnel state reported for an identifier."""
+    new_port = status.get("socks_port") if status.get("connected") else None
+    with _web_check_pool_lock:
+        old_port = _web_check_pool_owners.pop(identifier, None)
+        if new_port:
+            _web_check_pool_owners[identifier] = new_port
+    if old_port and old_port != new_port:
+        invalidate_web_check_pool(old_port)
+
+def _open_web_check_connection(host, port, is_https, socks_port, timeout, timings):
+    """Opens a (optionally proxied and TLS-wrapped) connection, recording each phase in timings."""
+    if socks_port:
+        sock = socks.socksocket()
+        sock.set_proxy(socks.SOCKS5, "127.0.0.1", socks_port, rdns=True)
+        address = host
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        dns_start = time.perf_counter()
+        try:
+            address = resolve_host(host, timeout)
+        except OSError:
+            sock.close()
+            raise
+        timings["dns_ms"] = _elapsed_ms(dns_start)
+    sock.settimeout(timeout)
+    try:
+        connect_start = time.perf_counter()
+        sock.connect((address, port))
+        timings["connect_ms"] = _elapsed_ms(connect_start)
+        if is_https:
+            tls_start = time.perf_counter()
+            sock = get_tls_context().wrap_socket(sock, server_hostname=host)
+            timings["tls_ms"] = _elapsed_ms(tls_start)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+def _send_head_request(sock, request, timeout):
+    """Sends a HEAD request and reads the complete response head. Returns (head, first_byte_ms)."""
+    sock.settimeout(timeout)
+    request_start = time.perf_counter()
+    sock.sendall(request)
+    head = sock.recv(4096)
+    if not head:
+        raise ConnectionResetError("Connection closed before a response was received.")
+    first_byte_ms = _elapsed_ms(request_start)
+    # A HEAD response has no body, so the connection is reusable once the head is consumed.
+    while b"\r\n\r\n" not in head:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        head += chunk
+    return head, first_byte_ms
+
 def perform_web_check(url, socks_port, timeout=10):
-    """Performs an HTTP HEAD request, optionally through a SOCKS5 proxy."""
+    """
+    Performs an HTTP HEAD request, optionally through a SOCKS5 proxy.
+    The request is issued on a raw socket so each phase can be timed separately, and the
+    connection is kept alive in a per-SOCKS-port pool for the next check.
+    Returns (latency_ms, status, error_name, timings) where timings holds the DNS,
+    connect, TLS and first-byte phases in milliseconds, whether a pooled connection was
+    reused, and the cost of the last cold connect. Through a proxy the hostname is
+    resolved remotely (like 'socks5h'), so DNS time is part of the connect phase.
+    """
+    timings = {"dns_ms": None, "connect_ms": None, "tls_ms": None, "first_byte_ms": None,
+               "reused": False, "cold_connect_ms": None}
     if not url or not url.startswith(('http://', 'https://')):
-        return -1, "Invalid URL", "ConfigurationError"
-    proxies = {'http': f'socks5h://127.0.0.1:{socks_port}', 'https': f'socks5h://127.0.0.1:{socks_port}'} if socks_port else None
-    headers = {'User-Agent': 'HolocronStatusCheck/1.0'}
+        return -1, "Invalid URL", "ConfigurationError", timings
+
+    try:
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname
+        is_https = parts.scheme == 'https'
+        port = parts.port or (443 if is_https else 80)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        request = (f"HEAD {path} HTTP/1.1\r\nHost: {parts.netloc.rsplit('@', 1)[-1]}\r\n"
+                   "User-Agent: HolocronStatusCheck/1.0\r\nAccept: */*\r\nConnection: keep-alive\r\n\r\n").encode('ascii')
+    except (ValueError, UnicodeError):  # An out-of-range port or a non-ASCII path.
+        host = None
+    if not host:
+        return -1, "Invalid URL", "ConfigurationError", timings
+    target = (parts.scheme, host, port)
+    sock = None
     try:
         start_time = time.perf_counter()
-        response = requests.head(url, proxies=proxies, timeout=timeout, headers=headers)
-        end_time = time.perf_counter()
-        latency_ms = int((end_time - start_time) * 1000)
-        if 200 <= response.status_code < 400:
-            return latency_ms, "OK", None
-        return latency_ms, f"Failed (Status {response.status_code})", None
-    except requests.exceptions.RequestException as e:
-        error_name = e.__class__.__name__
-        logging.error(f"Web check for {url} failed with exception: {error_name}")
-        if "SOCKSHTTPSConnectionPool" in str(e):
-            return -1, "Failed (Proxy Error)", "ProxyError"
-        return -1, "Failed (Connection Error)", "ConnectionError"
+        sock = _take_pooled_connection(socks_port, target)
+        timings["reused"] = sock is not None
+        if sock is None:
+            sock = _open_web_check_connection(host, port, is_https, socks_port, timeout, timings)
+        try:
+            head, timings["first_byte_ms"] = _send_head_request(sock, request, timeout)
+        except (ConnectionError, socket.timeout, ssl.SSLError):
+            if not timings["reused"]:
+                raise
+            # The pooled connection went stale while idle; retry once on a fresh one.
+            logging.debug(f"Pooled web check connection for SOCKS port {socks_port} was stale. Reconnecting.")
+            sock.close()
+            sock = None
+            timings["reused"] = False
+            start_time = time.perf_counter()
+            sock = _open_web_check_connection(host, port, is_https, socks_port, timeout, timings)
+            head, timings["first_byte_ms"] = _send_head_request(sock, request, timeout)
+        latency_ms = _elapsed_ms(start_time)
+
+        if not timings["reused"]:
+            cold_connect_ms = (timings["connect_ms"] or 0) + (timings["tls_ms"] or 0)
+            with _web_check_pool_lock:
+                _web_check_cold_connect_ms[socks_port] = cold_connect_ms
+        with _web_check_pool_lock:
+            timings["cold_connect_ms"] = _web_check_cold_connect_ms.get(socks_port)
+
+        header_block = head.split(b"\r\n\r\n", 1)[0].decode('latin-1')
+        status_line = header_block.split("\r\n", 1)[0]
+        match = re.match(r'HTTP/(\d(?:\.\d)?)\s+(\d{3})', status_line)
+        if not match:
+            logging.error(f"Web check for {url} received an invalid response: {status_line!r}")
+            return -1, "Failed (Invalid Response)", "InvalidResponse", timings
+        status_code = int(match.group(2))
+
+        keep_alive = match.group(1) == "1.1" and not re.search(r'^connection:\s*close', header_block, re.IGNORECASE | re.MULTILINE)
+        if keep_alive and head.endswith(b"\r\n\r\n"):
+            _return_pooled_connection(socks_port, target, sock)
+            sock = None
+
+        if 200 <= status_code < 400:
+            return latency_ms, "OK", None, timings
+        return latency_ms, f"Failed (Status {status_code})", None, timings
+    except socks.ProxyError as e:
+        logging.error(f"Web check for {url} failed with exception: {e.__class__.__name__}")
+        return -1, "Failed (Proxy Error)", "ProxyError", timings
+    except ssl.SSLError as e:
+        logging.error(f"Web check for {url} failed with exception: {e.__class__.__name__}")
+        return -1, "Failed (TLS Error)", "SSLError", timings
+    except (socket.gaierror, socket.timeout, OSError, ValueError, TypeError, UnicodeError) as e:
+        logging.error(f"Web check for {url} failed with exception: {e.__class__.__name__}")
+        return -1, "Failed (Connection Error)", "ConnectionError", timings
+    finally:
+        if sock:
+            sock.close()
 
-def get_process_using_port(port):
+def _submit_probes(ping_host, socks_port=None, web_check_url=None, deadline=STATUS_DEADLINE_SECONDS):
+    """Starts the TCP ping and (if a URL is given) the web check. Returns (tcp_future, web_future)."""
+    tcp_future = _probe_executor.submit(_timed_call, "probe_tcp", perform_tcp_ping, host=ping_host,
+                                        socks_port=socks_port, timeout=min(2, deadline))
+    web_future = None
+    if web_check_url is not None:
+        web_future = _probe_executor.submit(_timed_call, "probe_web", perform_web_check, url=web_check_url,
+                                            socks_port=socks_port, timeout=min(10, deadline))
+    return tcp_future, web_future
+
+def _probe_result(future, probe):
+    """Returns the result of a finished probe, or None (logged) if the probe raised."""
+    try:
+        return future.result()
+    except Exception as e:
+        logging.error(f"The {probe} probe failed unexpectedly: {e.__class__.__name__}: {e}")
+        return None
+
+def _collect_probes(ping_host, web_check_url, tcp_future, web_future):
     """
-    Checks if a TCP port is in use. If so, returns info about the process using it.
-    This implementation is more robust for macOS to avoid psutil.AccessDenied
-    crashes when scanning system-wide connections.
-    Returns a descriptive string if the port is in use, None otherwise.
+    Builds the probe fields of a status response; probes not done yet are reported as timed
+    out, and a probe that raised is reported as failed rather than failing the whole response.
     """
-    listen_addrs = ('127.0.0.1', '0.0.0.0', '::1', '::')
-    
-    # On macOS, psutil.net_connections() can fail with AccessDenied if it can't
-    # inspect a process owned by another user (e.g., root). We iterate through
-    # processes manually and handle the exception gracefully for each one.
+    if tcp_future.done():
+        tcp_latency, tcp_error, tcp_timings = _probe_result(tcp_future, "TCP ping") or (-1, "error", {})
+    else:
+        logging.warning(f"TCP ping to {ping_host} did not finish within the deadline.")
+        tcp_latency, tcp_error, tcp_timings = -1, "timeout", {}
+    record_probe_outcome("tcp", tcp_error or "ok")
+    result = {"tcp_ping_ms": tcp_latency, "tcp_ping_error": tcp_error, "probe_timings": {"tcp": tcp_timings}}
+
+    if web_future is None:
+        result.update({"web_check_latency_ms": -1, "web_check_status": "N/A (Tunnel Down)"})
+    else:
+        if web_future.done():
+            web_latency, web_status, web_error, web_timings = (
+                _probe_result(web_future, "web check") or (-1, "Failed (Connection Error)", "ConnectionError", {}))
+        else:
+            logging.warning(f"Web check for {web_check_url} did not finish within the deadline.")
+            web_latency, web_status, web_error, web_timings = -1, "Failed (Timeout)", "Timeout", {}
+        record_probe_outcome("web", web_error or ("ok" if web_status == "OK" else "HTTPStatus"))
+        result.update({"web_check_latency_ms": web_latency, "web_check_status": web_status,
+                       "web_check_error": web_error, "web_check_cold_connect_ms": web_timings.get("cold_connect_ms")})
+        result["probe_timings"]["web"] = web_timings
+    return result
+
+def run_probes(ping_host, socks_port=None, web_check_url=None, deadline=STATUS_DEADLINE_SECONDS):
+    """
+    Runs the web check and the TCP ping concurrently under one shared deadline.
+    The web check is skipped when no URL is given (e.g. when the tunnel is down).
+    Returns the probe fields of a status response, including per-probe timings.
+    A probe still running when the deadline expires is reported as timed out.
+    """
+    started = time.perf_counter()
+    tcp_future, web_future = _submit_probes(ping_host, socks_port, web_check_url, deadline)
+    concurrent.futures.wait([f for f in (tcp_future, web_future) if f], timeout=deadline)
+    result = _collect_probes(ping_host, web_check_url, tcp_future, web_future)
+    result["probe_timings"]["total_ms"] = _elapsed_ms(started)
+    return result
+
+# --- Process Index ---
+# Status checks and the start pre-flight used to scan every process (and, for ports,
+# every process's sockets) on each lookup. Instead, one index of Holocron SSH processes
+# by identifier and of listening sockets by port is built on demand and shared by all
+# lookups for a short TTL. Entries are re-validated by PID liveness before use, and
+# the index is dropped whenever a tunnel is started or stopped.
+PROCESS_INDEX_TTL_SECONDS = 2.0
+SSH_CONTROL_PATH_PREFIX = "ControlPath=/tmp/holocron.ssh.socket."
+LISTEN_ADDRS = ('127.0.0.1', '0.0.0.0', '::1', '::')
+_process_index = {"ssh": None, "ports": None}  # kind -> {"built_at", "entries"}
+_process_index_lock = threading.Lock()
+
+def _build_ssh_index():
+    """Maps tunnel identifiers to the current user's Holocron SSH processes in a single scan."""
+    import getpass
+    entries = {}
+    current_user = getpass.getuser()
+    for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'username']):
+        try:
+            if proc.info['name'] == 'ssh' and proc.info['cmdline'] and proc.info['username'] == current_user:
+                for arg in proc.info['cmdline']:
+                    if arg.startswith(SSH_CONTROL_PATH_PREFIX):
+                        entries[arg[len(SSH_CONTROL_PATH_PREFIX):]] = {"pid": proc.pid, "cmdline": proc.info['cmdline']}
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    return entries
+
+def _build_port_index():
+    """
+    Maps listening TCP ports to the PID and name of the process bound to them.
+    psutil.net_connections() lists every socket in one call, but on macOS it raises
+    AccessDenied unless run as root. In that case we iterate through processes manually
+    and skip the ones we are not allowed to inspect (e.g. owned by root).
+    """
+    entries = {}
+    try:
+        for conn in psutil.net_connections(kind='inet'):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr.ip in LISTEN_ADDRS:
+                entries.setdefault(conn.laddr.port, {"pid": conn.pid, "name": None})
+        return entries
+    except psutil.AccessDenied:
+        pass
     for proc in psutil.process_iter(['pid', 'name']):
         try:
             # is_running() is a quick check to skip zombies and other defunct processes.
             if not proc.is_running():
                 continue
-            conns = proc.connections(kind='inet')
+            conns = proc.net_connections(kind='inet') if hasattr(proc, 'net_connections') else proc.connections(kind='inet')
         except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
             # This is expected for some system processes, just skip them.
             continue
         for conn in conns:
-            if conn.status == psutil.CONN_LISTEN and conn.laddr.port == port and conn.laddr.ip in listen_addrs:
-                return f"process '{proc.info['name']}' (PID: {proc.pid})"
+            if conn.status == psutil.CONN_LISTEN and conn.laddr.ip in LISTEN_ADDRS:
+                entries.setdefault(conn.laddr.port, {"pid": proc.pid, "name": proc.info['name']})
+    return entries
+
+def _get_process_index(kind):
+    """Returns the entries of the given index ('ssh' or 'ports'), rebuilding it when older than the TTL."""
+    with _process_index_lock:
+        index = _process_index[kind]
+        if index and time.monotonic() - index["built_at"] < PROCESS_INDEX_TTL_SECONDS:
+            return index["entries"]
+        build_start = time.perf_counter()
+        with timed("stage", f"process_scan_{kind}"):
+            entries = _build_ssh_index() if kind == "ssh" else _build_port_index()
+        _process_index[kind] = {"built_at": time.monotonic(), "entries": entries}
+        logging.debug(f"Built '{kind}' process index with {len(entries)} entries in {_elapsed_ms(build_start)}ms.")
+        return entries
+
+def invalidate_process_index():
+    """Drops the process index so that the next lookup sees processes started or stopped since."""
+    with _process_index_lock:
+        _process_index["ssh"] = None
+        _process_index["ports"] = None
+
+def _read_pid_file(path):
+    """Returns the PID recorded in a lock file, or None if it is missing or invalid."""
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+def find_ssh_tunnel_process(identifier):
+    """
+    Returns the command line of the SSH process for a tunnel identifier, or None.
+    The PID recorded by work_connect.sh is tried first, which avoids any scan; the
+    shared process index is only consulted when that PID does not match.
+    """
+    tag = f"{SSH_CONTROL_PATH_PREFIX}{identifier}"
+    pid = _read_pid_file(Path.home() / ".ssh" / f"holocron_tunnel_{identifier}.lock")
+    if pid:
+        try:
+            cmdline = psutil.Process(pid).cmdline()
+            if tag in cmdline:
+                logging.debug(f"Found matching SSH process with PID {pid} from its lock file.")
+                return cmdline
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    entry = _get_process_index("ssh").get(identifier)
+    if entry and psutil.pid_exists(entry["pid"]):
+        logging.debug(f"Found matching SSH process with PID: {entry['pid']}")
+        return entry["cmdline"]
     return None
 
+def get_process_using_port(port):
+    """
+    Checks if a TCP port is in use. If so, returns info about the process using it.
+    Lookups share the process index, so checking several forwarding rules costs one scan.
+    Returns a descriptive string if the port is in use, None otherwise.
+    """
+    entry = _get_process_index("ports").get(port)
+    if not entry:
+        return None
+    pid = entry["pid"]
+    if pid is None:
+        return "another process (owner not visible)"
+    try:
+        name = entry["name"] or psutil.Process(pid).name()
+    except psutil.NoSuchProcess:
+        # The listener exited after the index was built, so the port is free now.
+        return None
+    except (psutil.AccessDenied, psutil.ZombieProcess):
+        name = "unknown"
+    return f"process '{name}' (PID: {pid})"
+
 def get_ovpn_socks_port(ovpn_content):
     """Parses .ovpn file content to find the SOCKS proxy port."""
     if not ovpn_content:
@@ -168,6 +809,21 @@ def find_openvpn_executable():
     # Fallback to searching in PATH using shutil.which
     return shutil.which("openvpn")
 
+def sanitize_ovpn_content(ovpn_content):
+    """
+    Removes directives from .ovpn content that would interfere with our management of
+    logs, status files, daemonization and PID files, as well as deprecated/insecure
+    compression directives that can cause connection failures.
+    """
+    lines = ovpn_content.splitlines()
+    # The \b ensures we match whole words (e.g. 'log' but not 'log-file').
+    directives_to_remove = re.compile(r"^\s*(log|log-append|status|daemon|writepid|comp-lzo|compress)\b", re.IGNORECASE)
+    sanitized_lines = [line for line in lines if not directives_to_remove.match(line)]
+    # Add directives for robust connections to address warnings and potential restart failures.
+    sanitized_lines.append("persist-tun")
+    sanitized_lines.append("persist-key")
+    return "\n".join(sanitized_lines)
+
 def get_ovpn_temp_paths(identifier):
     """Returns a dictionary of all temporary file paths for an OpenVPN connection."""
     base = CONN_LOG_DIR / f"holocron_openvpn_{identifier}"
@@ -177,10 +833,1156 @@ def get_ovpn_temp_paths(identifier):
         "log": base.with_suffix(".log"),
         "auth": base.with_suffix(".auth"),
         "stderr": base.with_suffix(".stderr.log"),
+        "management": base.with_suffix(".mgmt"),  # The management port, where it is not a Unix socket.
     }
 
+# --- OpenVPN Management Interface ---
+# OpenVPN is started with a management socket (a Unix socket on POSIX, a loopback TCP port
+# elsewhere) and --management-hold, so it waits until we are attached and have subscribed to
+# its >STATE: notifications. Readiness and failure are then reported by OpenVPN itself
+# rather than found by scanning its log, liveness is the open management connection, and
+# the tunnel is stopped with 'signal SIGTERM' instead of a 'sudo kill'. 'bytecount' keeps
+# a running total of the tunnel's traffic. One client is kept per running tunnel; after a
+# host restart it re-attaches on the first status request.
+OVPN_MANAGEMENT_SOCKET_PREFIX = "/tmp/holocron.ovpn.socket."
+OVPN_MANAGEMENT_ATTACH_TIMEOUT_SECONDS = 5
+OVPN_MANAGEMENT_COMMAND_TIMEOUT_SECONDS = 5
+OVPN_BYTECOUNT_INTERVAL_SECONDS = 5
+# RECONNECTING reasons that mean a start will not succeed by retrying.
+OVPN_FAILED_START_REASONS = ("auth-failure", "tls-error")
+_ovpn_sessions = {}  # identifier -> _OpenVpnManagement
+_ovpn_sessions_lock = threading.Lock()
+
+def get_ovpn_management_address(identifier):
+    """Returns the management address for a tunnel: a socket path on POSIX, else ('127.0.0.1', port)."""
+    if POSIX:
+        return OVPN_MANAGEMENT_SOCKET_PREFIX + identifier
+    port_file = get_ovpn_temp_paths(identifier)["management"]
+    try:
+        return ("127.0.0.1", int(port_file.read_text().strip()))
+    except (OSError, ValueError):
+        return None
+
+def _reserve_ovpn_management_address(identifier):
+    """Picks the management address for a new OpenVPN process and returns its --management arguments."""
+    if POSIX:
+        return [get_ovpn_management_address(identifier), "unix"]
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    get_ovpn_temp_paths(identifier)["management"].write_text(str(port))
+    return ["127.0.0.1", str(port)]
+
+class _OpenVpnManagement:
+    """A client of one OpenVPN process's management interface."""
+    def __init__(self, identifier, sock):
+        self.identifier = identifier
+        self.state = None  # The latest state name, e.g. "CONNECTED" or "RECONNECTING".
+        self.state_detail = None
+        self.failure = None  # Why OpenVPN gave up, from EXITING, FATAL or a failed authentication.
+        self.bytes_in = self.bytes_out = None
+        self.bytecount_at = None  # time.monotonic() of the latest BYTECOUNT notification.
+        self.started = False  # Set once the start completed, so later state changes are pushed.
+        self.closed = False
+        self._sock = sock
+        self._reader = sock.makefile("r", encoding="utf-8", errors="replace", newline="")
+        self._command_lock = threading.Lock()
+        self._condition = threading.Condition()
+        # One slot per command still awaiting its reply, oldest first. OpenVPN answers commands
+        # in order, so a late reply to a command that timed out fills that command's slot
+        # rather than being taken as the reply to the next one.
+        self._pending_replies = []
+        threading.Thread(target=self._read_loop, name=f"holocron-ovpn-{identifier}", daemon=True).start()
+
+    def _read_loop(self):
+        try:
+            for raw_line in self._reader:
+                line = raw_line.rstrip("\r\n")
+                if line.startswith(">"):
+                    self._on_notification(line[1:])
+                    continue
+                with self._condition:
+                    if not self._pending_replies:
+                        logging.debug(f"Unexpected OpenVPN management output for '{self.identifier}': {line}")
+                        continue
+                    slot = self._pending_replies[0]
+                    if not slot["multiline"] or (not slot["lines"] and line.startswith("ERROR:")):
+                        slot["reply"] = line
+                    elif line == "END":
+                        slot["reply"] = slot["lines"]
+                    else:
+                        slot["lines"].append(line)
+                        continue
+                    self._pending_replies.pop(0)
+                    self._condition.notify_all()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._condition:
+                self.closed = True
+                self._condition.notify_all()
+            with _ovpn_sessions_lock:
+                if _ovpn_sessions.get(self.identifier) is self:
+                    del _ovpn_sessions[self.identifier]
+            if self.started:
+                push_event(TUNNEL_STATE_EVENT, identifier=self.identifier, state="down",
+                           message=self.failure or "OpenVPN exited.")
+
+    def _on_notification(self, notification):
+        kind, _, payload = notification.partition(":")
+        state_changed = False
+        with self._condition:
+            if kind == "STATE":
+                fields = payload.split(",")
+                previous, self.state = self.state, fields[1] if len(fields) > 1 else None
+                self.state_detail = fields[2] if len(fields) > 2 else None
+                if self.state == "EXITING":
+                    self.failure = self.failure or f"OpenVPN is exiting ({self.state_detail or 'unknown reason'})."
+                state_changed = self.started and self.state != previous and self.state in ("RECONNECTING", "CONNECTED")
+            elif kind == "BYTECOUNT":
+                try:
+                    self.bytes_in, self.bytes_out = (int(value) for value in payload.split(","))
+                    self.bytecount_at = time.monotonic()
+                except ValueError:
+                    pass
+            elif kind == "FATAL":
+                self.failure = payload
+            elif kind == "PASSWORD" and payload.startswith("Verification Failed"):
+                self.failure = "Authentication failed. Please check your username and password."
+            self._condition.notify_all()
+        if state_changed:
+            # OpenVPN restarts a dropped connection by itself; the extension is told as it happens.
+            push_event(TUNNEL_STATE_EVENT, identifier=self.identifier,
+                       state="reconnecting" if self.state == "RECONNECTING" else "up", message=self.state_detail or None)
+
+    def command(self, text, multiline=False, timeout=OVPN_MANAGEMENT_COMMAND_TIMEOUT_SECONDS):
+        """
+        Sends a management command and returns its reply: a list of lines if `multiline`, unless
+        OpenVPN answered with a single "ERROR: ..." line, which is returned as is. Returns None
+        if no reply came within `timeout`.
+        """
+        slot = {"multiline": multiline, "lines": [], "reply": None}
+        with self._command_lock:
+            with self._condition:
+                self._pending_replies.append(slot)
+            try:
+                self._sock.sendall(f"{text}\n".encode("utf-8"))
+            except OSError:
+                with self._condition:
+                    self._pending_replies.remove(slot)
+                return None
+            with self._condition:
+                self._condition.wait_for(lambda: slot["reply"] is not None or self.closed, timeout)
+                return slot["reply"]
+
+    def wait_until_connected(self, timeout):
+        """Waits for the CONNECTED state. Returns (ready, reason), like wait_for_tunnel_ready()."""
+        def settled():
+            return self.state == "CONNECTED" or self.failure or self.closed or \
+                (self.state == "RECONNECTING" and self.state_detail in OVPN_FAILED_START_REASONS)
+        with self._condition:
+            if not self._condition.wait_for(settled, timeout):
+                return False, f"Timed out after {timeout} seconds waiting for the tunnel to become ready."
+            if self.state == "CONNECTED" and not self.failure:
+                return True, None
+            if self.failure:
+                return False, self.failure
+            if self.closed:
+                return False, "The tunnel process exited."
+            return False, f"OpenVPN is reconnecting after a {self.state_detail}."
+
+    def subscribe(self):
+        """Subscribes to state and traffic notifications and reads the current state."""
+        self.command("state on")
+        self.command(f"bytecount {OVPN_BYTECOUNT_INTERVAL_SECONDS}")
+        history = self.command("state", multiline=True)
+        if isinstance(history, list) and history:
+            fields = history[-1].split(",")
+            with self._condition:
+                if len(fields) > 2 and self.state is None:
+                    self.state, self.state_detail = fields[1], fields[2]
+
+    def get_pid(self):
+        """Asks OpenVPN for its PID (the process we start is sudo, whose PID is not OpenVPN's)."""
+        match = re.match(r"SUCCESS: pid=(\d+)", self.command("pid") or "")
+        return int(match.group(1)) if match else None
+
+    def stop(self, timeout=OVPN_MANAGEMENT_COMMAND_TIMEOUT_SECONDS):
+        """Asks OpenVPN to exit and waits for it to close the connection. Returns True once it has."""
+        self.started = False  # An intended stop is not reported as the tunnel going down.
+        self.command("signal SIGTERM")
+        with self._condition:
+            return self._condition.wait_for(lambda: self.closed, timeout)
+
+    def close(self):
+        self.started = False  # Closing our end is not the tunnel going down.
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+def _connect_ovpn_management(identifier):
+    """Opens a connection to a tunnel's management interface, or returns None if nothing listens."""
+    address = get_ovpn_management_address(identifier)
+    if address is None:
+        return None
+    sock = socket.socket(socket.AF_UNIX if POSIX else socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def attach_ovpn_management(identifier, process=None, timeout=OVPN_MANAGEMENT_ATTACH_TIMEOUT_SECONDS):
+    """
+    Attaches to a freshly started OpenVPN process, waiting for its management interface to
+    come up, and lets it out of its hold. Returns the session, or None if OpenVPN exited or
+    never opened the interface.
+    """
+    deadline = time.perf_counter() + timeout
+    delay = 0.02
+    while True:
+        sock = _connect_ovpn_management(identifier)
+        if sock:
+            break
+        if (process is not None and process.poll() is not None) or time.perf_counter() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+    session = _OpenVpnManagement(identifier, sock)
+    session.subscribe()
+    # Clear the hold flag before releasing it, so OpenVPN's own restarts (e.g. after a
+    # ping timeout) do not wait for a client that may no longer be attached.
+    session.command("hold off")
+    session.command("hold release")
+    with _ovpn_sessions_lock:
+        previous = _ovpn_sessions.get(identifier)
+        _ovpn_sessions[identifier] = session
+    if previous:
+        previous.close()
+    return session
+
+def get_ovpn_session(identifier):
+    """Returns the management session of a running tunnel, re-attaching to it if needed, or None."""
+    with _ovpn_sessions_lock:
+        session = _ovpn_sessions.get(identifier)
+    if session and not session.closed:
+        return session
+    sock = _connect_ovpn_management(identifier)
+    if not sock:
+        return None
+    session = _OpenVpnManagement(identifier, sock)
+    session.started = True
+    session.subscribe()
+    with _ovpn_sessions_lock:
+        current = _ovpn_sessions.get(identifier)
+        if current and not current.closed:
+            session.close()
+            return current
+        _ovpn_sessions[identifier] = session
+    return session
+
+# --- Config Registry ---
+# The extension registers each tunnel config once per session with 'registerConfigs',
+# tagged with a content hash it computes, and later commands carry only a reference
+# {"id", "hash", "ref": true}. This keeps large fields such as 'ovpnFileContent' out of
+# every status request. Artifacts derived from a config (the sanitized .ovpn, its SOCKS
+# port) are cached with its registered version and dropped when a new version arrives.
+# A reference to an unknown or outdated version is answered with 'needsConfig', and the
+# extension registers the config again and retries.
+_config_registry = {}  # config id -> {"hash", "config", "derived"}
+_config_registry_lock = threading.Lock()
+_written_ovpn_hashes = {}  # .ovpn path -> hash of the config version written to it
+
+def register_configs(configs):
+    """Stores configs in the registry and returns the ids that were registered."""
+    registered = []
+    with _config_registry_lock:
+        for config in configs or []:
+            config_id, config_hash = config.get("id"), config.get("hash")
+            if not config_id or not config_hash:
+                continue
+            entry = _config_registry.get(config_id)
+            if not entry or entry["hash"] != config_hash:
+                _config_registry[config_id] = {"hash": config_hash, "config": dict(config), "derived": {}}
+            registered.append(config_id)
+    return registered
+
+def resolve_config(config):
+    """
+    Returns the full config for a message's config or config reference.
+    Full configs are passed through unchanged; a reference resolves to the registered
+    version, or None if that version is not registered.
+    """
+    if not config or not config.get("ref"):
+        return config
+    with _config_registry_lock:
+        entry = _config_registry.get(config.get("id"))
+    if not entry or entry["hash"] != config.get("hash"):
+        return None
+    return entry["config"]
+
+def resolve_message_configs(message):
+    """
+    Replaces the config references in a message with the registered configs, in place.
+    Returns the ids of references that could not be resolved.
+    """
+    missing = []
+    if message.get("config"):
+        config = resolve_config(message["config"])
+        if config is None:
+            missing.append(message["config"].get("id"))
+        else:
+            message["config"] = config
+    if message.get("configs"):
+        configs = []
+        for ref in message["configs"]:
+            config = resolve_config(ref)
+            if config is None:
+                missing.append(ref.get("id"))
+            else:
+                configs.append(config)
+        message["configs"] = configs
+    return missing
+
+def get_derived_artifact(config, name, compute):
+    """
+    Returns an artifact derived from a config, computing it at most once per registered
+    version. Configs that were not registered (no 'hash') are computed on every call.
+    """
+    config_id, config_hash = config.get("id"), config.get("hash")
+    with _config_registry_lock:
+        entry = _config_registry.get(config_id)
+        if entry and entry["hash"] == config_hash and name in entry["derived"]:
+            return entry["derived"][name]
+    value = compute()
+    with _config_registry_lock:
+        entry = _config_registry.get(config_id)
+        if entry and config_hash and entry["hash"] == config_hash:
+            entry["derived"][name] = value
+    return value
+
+def get_config_socks_port(config):
+    """Returns the SOCKS proxy port declared in an OpenVPN config."""
+    return get_derived_artifact(config, "socks_port", lambda: get_ovpn_socks_port(config.get("ovpnFileContent")))
+
+def get_sanitized_ovpn_content(config):
+    """Returns the .ovpn content of a config as it is written for OpenVPN."""
+    return get_derived_artifact(config, "sanitized_ovpn", lambda: sanitize_ovpn_content(config.get("ovpnFileContent")))
+
+def ovpn_config_file_is_current(config_file, config):
+    """Returns True if `config_file` already holds this version of the config."""
+    return bool(config.get("hash")) and _written_ovpn_hashes.get(str(config_file)) == config.get("hash") \
+        and config_file.is_file()
+
+def write_ovpn_config_file(config_file, config):
+    """Writes the sanitized .ovpn of a config and records which version the file holds."""
+    config_file.write_text(get_sanitized_ovpn_content(config))
+    _written_ovpn_hashes[str(config_file)] = config.get("hash")
+
+def redact_message(message):
+    """Returns a copy of a message that is safe and short enough to log."""
+    redacted = dict(message)
+    for key in ("config", "configs"):
+        if isinstance(redacted.get(key), dict):
+            redacted[key] = _redact_config(redacted[key])
+        elif isinstance(redacted.get(key), list):
+            redacted[key] = [_redact_config(config) for config in redacted[key]]
+    return redacted
+
+def _redact_config(config):
+    """Replaces the secrets and bulky fields of a config with a placeholder."""
+    return {key: ("<redacted>" if key in ("ovpnFileContent", "ovpnPass") else value)
+            for key, value in config.items()} if isinstance(config, dict) else config
+
+# --- V2Ray / Xray ---
+# Share links (vless://, vmess://, trojan://) are parsed here and turned into an Xray
+# config, so starting a tunnel does not fork a shell pipeline per field. Generated configs
+# are cached on disk by URL hash. Each tunnel identifier is given its own SOCKS port, so
+# several V2Ray tunnels can run side by side. Every config also enables Xray's stats API on
+# a loopback port V2RAY_SOCKS_PORT_SPAN above the SOCKS port, for traffic accounting.
+XRAY_CONFIG_DIR = CONN_LOG_DIR / "xray"
+XRAY_PORTS_FILE = XRAY_CONFIG_DIR / "socks_ports.json"
+XRAY_CONFIG_FORMAT = 2  # Bumped whenever build_xray_config() changes, so cached configs are regenerated.
+XRAY_PROXY_OUTBOUND_TAG = "proxy"
+XRAY_API_TAG = "api"
+V2RAY_SOCKS_PORT_BASE = 10808  # The first tunnel keeps the port earlier versions always used.
+V2RAY_SOCKS_PORT_SPAN = 100
+V2RAY_DEFAULT_ALPN = ["h2", "http/1.1"]
+_xray_ports_lock = threading.Lock()
+
+
+def _xray_stream_settings(address, network, security, params):
+    """Builds an Xray streamSettings object from share-link transport parameters."""
+    network = network or "tcp"
+    security = security or "none"
+    sni = params.get("sni") or address
+    stream = {"network": network, "security": security}
+    if security in ("tls", "xtls"):
+        alpn = [a.strip() for a in (params.get("alpn") or "").split(",") if a.strip()]
+        stream[f"{security}Settings"] = {
+            "serverName": sni,
+            "fingerprint": params.get("fp") or "chrome",
+            "alpn": alpn or V2RAY_DEFAULT_ALPN,
+        }
+    elif security == "reality":
+        stream["realitySettings"] = {
+            "serverName": sni,
+            "fingerprint": params.get("fp") or "chrome",
+            "publicKey": params.get("pbk", ""),
+            "shortId": params.get("sid", ""),
+            "spiderX": params.get("spx", ""),
+        }
+    if network == "ws":
+        stream["wsSettings"] = {"path": params.get("path") or "/", "headers": {"Host": params.get("host") or sni}}
+    elif network == "httpupgrade":
+        stream["httpupgradeSettings"] = {"path": params.get("path") or "/", "host": params.get("host") or sni}
+    elif network == "grpc":
+        stream["grpcSettings"] = {"serviceName": params.get("serviceName", "")}
+    elif network == "tcp" and params.get("headerType") == "http":
+        stream["tcpSettings"] = {"header": {"type": "http", "request": {
+            "path": [params.get("path") or "/"],
+            "headers": {"Host": [params.get("host") or sni]},
+        }}}
+    return stream
+
+def _split_share_link(url):
+    """Splits a vless:// or trojan:// link into (credential, address, port, query params)."""
+    parts = urllib.parse.urlsplit(url)
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    credential = urllib.parse.unquote(parts.username or "")
+    if not credential or not parts.hostname or not port:
+        raise ValueError("Failed to parse the required fields (credential, address, port) from the URL.")
+    # parse_qs decodes every percent-escape, not just the handful the old shell parser knew.
+    params = {k: v[0] for k, v in urllib.parse.parse_qs(parts.query).items()}
+    return credential, parts.hostname, port, params
+
+def _parse_vmess_link(url):
+    """Decodes a vmess:// link (base64-encoded JSON) into an Xray outbound."""
+    payload = url[len("vmess://"):].split("#", 1)[0].strip().replace("-", "+").replace("_", "/")
+    try:
+        info = json.loads(base64.b64decode(payload + "=" * (-len(payload) % 4)))
+        port = int(info.get("port", 0))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"The vmess:// payload is not valid base64-encoded JSON: {e}")
+    address, user_id = info.get("add"), info.get("id")
+    if not address or not user_id or not port:
+        raise ValueError("Failed to parse the required fields (id, address, port) from the URL.")
+    params = {
+        "sni": info.get("sni") or info.get("host"), "fp": info.get("fp"), "alpn": info.get("alpn"),
+        "path": info.get("path"), "host": info.get("host"), "headerType": info.get("type"),
+        "serviceName": info.get("path"),
+    }
+    return {
+        "protocol": "vmess",
+        "settings": {"vnext": [{"address": address, "port": port, "users": [{
+            "id": user_id, "alterId": int(info.get("aid") or 0), "security": info.get("scy") or "auto",
+        }]}]},
+        "streamSettings": _xray_stream_settings(address, info.get("net"), info.get("tls"), {k: v for k, v in params.items() if v}),
+    }
+
+def parse_v2ray_url(url):
+    """
+    Parses a vless://, vmess:// or trojan:// share link into an Xray outbound object.
+    Raises ValueError if the link cannot be understood.
+    """
+    url = (url or "").strip()
+    scheme = url.split("://", 1)[0].lower()
+    if scheme == "vmess":
+        return _parse_vmess_link(url)
+    if scheme == "vless":
+        user_id, address, port, params = _split_share_link(url)
+        user = {"id": user_id, "encryption": params.get("encryption") or "none"}
+        if params.get("flow"):
+            user["flow"] = params["flow"]
+        return {
+            "protocol": "vless",
+            "settings": {"vnext": [{"address": address, "port": port, "users": [user]}]},
+            "streamSettings": _xray_stream_settings(address, params.get("type"), params.get("security"), params),
+        }
+    if scheme == "trojan":
+        password, address, port, params = _split_share_link(url)
+        return {
+            "protocol": "trojan",
+            "settings": {"servers": [{"address": address, "port": port, "password": password}]},
+            "streamSettings": _xray_stream_settings(address, params.get("type"), params.get("security") or "tls", params),
+        }
+    raise ValueError("Unsupported URL. It must start with vless://, vmess:// or trojan://.")
+
+def get_xray_api_port(socks_port):
+    """Returns the loopback port of the stats API of the Xray tunnel on a SOCKS port."""
+    return socks_port + V2RAY_SOCKS_PORT_SPAN
+
+def build_xray_config(outbound, socks_port):
+    """
+    Returns a complete Xray config that exposes `outbound` as a local SOCKS5 proxy, with
+    per-outbound traffic counters readable through the stats API.
+    """
+    return {
+        "log": {"loglevel": "warning"},
+        "stats": {},
+        "api": {"tag": XRAY_API_TAG, "services": ["StatsService"]},
+        "policy": {"system": {"statsOutboundUplink": True, "statsOutboundDownlink": True}},
+        "inbounds": [{
+            "port": socks_port,
+            "listen": "127.0.0.1",
+            "protocol": "socks",
+            "settings": {"auth": "noauth", "udp": True},
+        }, {
+            "tag": XRAY_API_TAG,
+            "port": get_xray_api_port(socks_port),
+            "listen": "127.0.0.1",
+            "protocol": "dokodemo-door",
+            "settings": {"address": "127.0.0.1"},
+        }],
+        "outbounds": [{**outbound, "tag": XRAY_PROXY_OUTBOUND_TAG}],
+        "routing": {"rules": [{"type": "field", "inboundTag": [XRAY_API_TAG], "outboundTag": XRAY_API_TAG}]},
+    }
+
+def get_xray_config_path(url, socks_port):
+    """
+    Returns the path of the Xray config for a share link and SOCKS port, generating it only
+    if no config for the same URL hash and port exists yet. Configs previously generated for
+    this port (from an older URL) are removed.
+    """
+    url_hash = hashlib.sha256(url.strip().encode("utf-8")).hexdigest()[:16]
+    config_path = XRAY_CONFIG_DIR / f"{url_hash}-v{XRAY_CONFIG_FORMAT}-{socks_port}.json"
+    if config_path.is_file():
+        logging.debug(f"Reusing cached Xray config {config_path.name}.")
+        return config_path
+
+    xray_config = build_xray_config(parse_v2ray_url(url), socks_port)
+    XRAY_CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+    for stale in XRAY_CONFIG_DIR.glob(f"*-{socks_port}.json"):
+        stale.unlink(missing_ok=True)
+    tmp_path = config_path.with_suffix(".tmp")
+    # The config holds the server credentials, so only the owner may read it.
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(xray_config, f, indent=2)
+    os.replace(tmp_path, config_path)
+    logging.info(f"Generated Xray config {config_path.name} for SOCKS port {socks_port}.")
+    return config_path
+
+def _load_v2ray_socks_ports():
+    """Returns the identifier -> SOCKS port assignments made by allocate_v2ray_socks_port()."""
+    try:
+        return json.loads(XRAY_PORTS_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _is_local_port_free(port):
+    """Returns True if a listener could bind to the port on the loopback address."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        if POSIX:
+            # Xray sets SO_REUSEADDR too, so lingering TIME_WAIT connections do not block it.
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+def _v2ray_ports_free(socks_port):
+    """Returns True if both the SOCKS port and the stats API port of a V2Ray tunnel are free."""
+    return _is_local_port_free(socks_port) and _is_local_port_free(get_xray_api_port(socks_port))
+
+def get_v2ray_socks_port(identifier):
+    """Returns the SOCKS port assigned to a V2Ray tunnel identifier."""
+    with _xray_ports_lock:
+        return _load_v2ray_socks_ports().get(identifier, V2RAY_SOCKS_PORT_BASE)
+
+def allocate_v2ray_socks_port(identifier):
+    """
+    Returns a free SOCKS port for a V2Ray tunnel that is about to start. An identifier keeps
+    its previous port whenever that port is still free, so proxy settings stay valid. The
+    stats API port that goes with it must be free as well.
+    """
+    with _xray_ports_lock:
+        ports = _load_v2ray_socks_ports()
+        taken = {port for ident, port in ports.items() if ident != identifier}
+        assigned = ports.get(identifier)
+        if assigned and assigned not in taken and _v2ray_ports_free(assigned):
+            return assigned
+        for port in range(V2RAY_SOCKS_PORT_BASE, V2RAY_SOCKS_PORT_BASE + V2RAY_SOCKS_PORT_SPAN):
+            if port not in taken and _v2ray_ports_free(port):
+                ports[identifier] = port
+                XRAY_CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+                XRAY_PORTS_FILE.write_text(json.dumps(ports))
+                if assigned:
+                    logging.warning(f"SOCKS port {assigned} for V2Ray tunnel '{identifier}' is in use; moved to {port}.")
+                return port
+    raise RuntimeError(
+        f"No free SOCKS port between {V2RAY_SOCKS_PORT_BASE} and {V2RAY_SOCKS_PORT_BASE + V2RAY_SOCKS_PORT_SPAN - 1}.")
+
+def find_v2ray_process(identifier):
+    """Returns the PID of the running Xray/V2Ray process for an identifier, or None."""
+    pid = _read_pid_file(Path(f"/tmp/holocron_v2ray_{identifier}.lock"))
+    if not pid:
+        return None
+    try:
+        name = psutil.Process(pid).name()
+    except psutil.Error:
+        logging.warning(f"Stale lock file found for V2Ray identifier '{identifier}'.")
+        return None
+    return pid if ('v2ray' in name or 'xray' in name) else None
+
+# --- SSH Connection Multiplexing ---
+# work_connect.sh starts each SSH tunnel as a ControlMaster. Forwards are then added and
+# removed on the live master with `ssh -O forward/cancel`, which avoids a new TCP, key
+# exchange and authentication round trip. Stopping a tunnel only cancels its forwards: the
+# master stays idle for SSH_MASTER_IDLE_SECONDS so that a reconnect is near-instant. The
+# forwards the host has applied are recorded in a per-identifier state file. Idle timers
+# live in this process only, so every new host process reaps the masters a previous one
+# parked: expired ones are closed and the others get their timer back.
+SSH_PATH = "/usr/bin/ssh"
+SSH_MUX_TIMEOUT_SECONDS = 10
+SSH_MASTER_IDLE_SECONDS = 300
+_idle_ssh_masters = {}  # identifier -> threading.Timer that closes the idle master
+
+
+def get_ssh_mux_paths(identifier):
+    """Returns the ControlMaster socket and forward state file paths for an SSH identifier."""
+    return {
+        "control": Path(f"/tmp/holocron.ssh.socket.{identifier}"),
+        "state": Path.home() / ".ssh" / f"holocron_tunnel_{identifier}.mux.json",
+        "lock": Path.home() / ".ssh" / f"holocron_tunnel_{identifier}.lock",
+    }
+
+def get_ssh_forward_args(config):
+    """Returns the (flag, spec) pairs for a config's forwarding rules, e.g. ("-D", "1080")."""
+    forwards = []
+    for rule in config.get("portForwards", []):
+        if rule.get("type") == "D" and rule.get("localPort"):
+            forwards.append(("-D", str(rule.get("localPort"))))
+        elif rule.get("type") in ("L", "R") and all(k in rule for k in ["localPort", "remoteHost", "remotePort"]):
+            forwards.append((f"-{rule['type']}", f"{rule['localPort']}:{rule['remoteHost']}:{rule['remotePort']}"))
+    return forwards
+
+def find_busy_forward_port(forwards):
+    """Returns an error message if the local port of an -L or -D forward is already in use, else None."""
+    for flag, spec in forwards:
+        # -R forwards bind on the remote server, so only -L and -D are checked.
+        if flag not in ("-L", "-D"):
+            continue
+        try:
+            local_port = int(spec.split(":", 1)[0])
+        except ValueError:
+            logging.warning(f"Invalid port in forwarding rule '{flag} {spec}'. Skipping check.")
+            continue
+        process_info = get_process_using_port(local_port)
+        if process_info:
+            return f"Port {local_port} is already in use by {process_info}. Please close the application or change the configuration."
+    return None
+
+def _ssh_mux_command(identifier, operation, destination, *args):
+    """Sends a control command (check, forward, cancel, exit) to an identifier's SSH master."""
+    control_path = get_ssh_mux_paths(identifier)["control"]
+    cmd = [SSH_PATH, "-S", str(control_path), "-O", operation, *args, destination]
+    logging.debug(f"SSH mux command: {' '.join(cmd)}")
+    return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                          timeout=SSH_MUX_TIMEOUT_SECONDS, check=False)
+
+def load_ssh_mux_state(identifier):
+    """Returns the recorded master state ({"session", "forwards", "idle_since"}), or None."""
+    try:
+        state = json.loads(get_ssh_mux_paths(identifier)["state"].read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    state["forwards"] = [tuple(f) for f in state.get("forwards", [])]
+    return state
+
+def save_ssh_mux_state(identifier, session, forwards, idle_since=None):
+    """Records the session and forwards applied to an identifier's SSH master."""
+    state_path = get_ssh_mux_paths(identifier)["state"]
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps({"session": session, "forwards": forwards, "idle_since": idle_since}))
+
+def clear_ssh_mux_state(identifier):
+    """Forgets an identifier's SSH master and cancels its idle timer."""
+    timer = _idle_ssh_masters.pop(identifier, None)
+    if timer:
+        timer.cancel()
+    get_ssh_mux_paths(identifier)["state"].unlink(missing_ok=True)
+
+def ssh_master_alive(identifier, destination):
+    """Returns True if the identifier's ControlMaster answers `ssh -O check`."""
+    if not get_ssh_mux_paths(identifier)["control"].exists():
+        return False  # No socket, no master; skip the fork.
+    try:
+        return _ssh_mux_command(identifier, "check", destination).returncode == 0
+    except subprocess.TimeoutExpired:
+        return False
+
+def exit_ssh_master(identifier, destination):
+    """Closes an identifier's SSH master and removes its lock and state files."""
+    try:
+        _ssh_mux_command(identifier, "exit", destination)
+    except subprocess.TimeoutExpired:
+        logging.warning(f"Timed out closing the SSH master for '{identifier}'.")
+    paths = get_ssh_mux_paths(identifier)
+    paths["lock"].unlink(missing_ok=True)
+    clear_ssh_mux_state(identifier)
+
+def reuse_ssh_master(identifier, session, forwards):
+    """
+    Applies the wanted forwards to a live SSH master for the same session by cancelling the
+    ones no longer wanted and adding the new ones. Returns a response dict, or None if there
+    is no reusable master and a new connection must be made.
+    """
+    state = load_ssh_mux_state(identifier)
+    if not state:
+        return None
+    destination = state["session"]["destination"]
+    if not ssh_master_alive(identifier, destination):
+        clear_ssh_mux_state(identifier)
+        return None
+    if state["session"] != session:
+        logging.info(f"SSH session for '{identifier}' changed; closing the old master.")
+        exit_ssh_master(identifier, destination)
+        return None
+
+    current = state["forwards"]
+    busy_message = find_busy_forward_port([f for f in forwards if f not in current])
+    if busy_message:
+        logging.error(busy_message)
+        return {"success": False, "message": busy_message}
+    applied = list(current)
+    for flag, spec in [f for f in current if f not in forwards]:
+        result = _ssh_mux_command(identifier, "cancel", destination, flag, spec)
+        if result.returncode == 0:
+            applied.remove((flag, spec))
+        else:
+            logging.warning(f"Could not cancel forward {flag} {spec} on '{identifier}': {result.stderr.strip()}")
+    for flag, spec in [f for f in forwards if f not in current]:
+        result = _ssh_mux_command(identifier, "forward", destination, flag, spec)
+        if result.returncode != 0:
+            save_ssh_mux_state(identifier, session, applied, None if applied else time.time())
+            error_output = result.stderr.strip() or result.stdout.strip()
+            logging.error(f"Could not add forward {flag} {spec} on '{identifier}': {error_output}")
+            return {"success": False, "message": f"Failed to add forward {flag} {spec}: {error_output}"}
+        applied.append((flag, spec))
+
+    timer = _idle_ssh_masters.pop(identifier, None)
+    if timer:
+        timer.cancel()
+    save_ssh_mux_state(identifier, session, applied)
+    logging.info(f"Reused the SSH master for '{identifier}' with {len(applied)} forward(s).")
+    return {"success": True, "message": "Tunnel started on the existing SSH connection."}
+
+def park_ssh_master(identifier):
+    """
+    Cancels all forwards of a live SSH master and keeps it idle for SSH_MASTER_IDLE_SECONDS.
+    Returns False if there is no live master (the caller should stop the process instead).
+    """
+    state = load_ssh_mux_state(identifier)
+    if not state or not ssh_master_alive(identifier, state["session"]["destination"]):
+        clear_ssh_mux_state(identifier)
+        return False
+    destination = state["session"]["destination"]
+    for flag, spec in state["forwards"]:
+        result = _ssh_mux_command(identifier, "cancel", destination, flag, spec)
+        if result.returncode != 0:
+            # A forward that cannot be cancelled would stay open; close the whole master.
+            logging.warning(f"Could not cancel forward {flag} {spec} on '{identifier}'; closing the master.")
+            exit_ssh_master(identifier, destination)
+            return True
+    save_ssh_mux_state(identifier, state["session"], [], time.time())
+    _arm_idle_ssh_master_timer(identifier, SSH_MASTER_IDLE_SECONDS)
+    logging.info(f"SSH master for '{identifier}' parked for {SSH_MASTER_IDLE_SECONDS} seconds.")
+    return True
+
+def _arm_idle_ssh_master_timer(identifier, delay):
+    """(Re)starts the timer that closes an identifier's parked master after `delay` seconds."""
+    timer = threading.Timer(delay, close_idle_ssh_master, args=(identifier,))
+    timer.daemon = True
+    previous = _idle_ssh_masters.pop(identifier, None)
+    if previous:
+        previous.cancel()
+    _idle_ssh_masters[identifier] = timer
+    timer.start()
+
+def close_idle_ssh_master(identifier):
+    """Closes an SSH master that is still idle, i.e. no start reused it in the meantime."""
+    with get_tunnel_lock({"id": identifier}):
+        state = load_ssh_mux_state(identifier)
+        if state and not state["forwards"] and state.get("idle_since"):
+            logging.info(f"Closing idle SSH master for '{identifier}'.")
+            exit_ssh_master(identifier, state["session"]["destination"])
+
+def close_all_idle_ssh_masters():
+    """Closes the parked masters of this session, so none outlives the native host."""
+    for identifier in list(_idle_ssh_masters):
+        close_idle_ssh_master(identifier)
+
+def reap_idle_ssh_masters():
+    """
+    Closes the masters parked by earlier host processes whose idle time has run out, and
+    re-arms the idle timer of the others for the time they have left.
+    """
+    prefix, suffix = "holocron_tunnel_", ".mux.json"
+    for state_path in (Path.home() / ".ssh").glob(f"{prefix}*{suffix}"):
+        identifier = state_path.name[len(prefix):-len(suffix)]
+        state = load_ssh_mux_state(identifier)
+        if not state or state["forwards"] or not state.get("idle_since"):
+            continue
+        remaining = SSH_MASTER_IDLE_SECONDS - (time.time() - state["idle_since"])
+        if remaining <= 0:
+            close_idle_ssh_master(identifier)
+        else:
+            logging.debug(f"SSH master for '{identifier}' stays parked for another {int(remaining)} seconds.")
+            _arm_idle_ssh_master_timer(identifier, remaining)
+
+atexit.register(close_all_idle_ssh_masters)
+
+# --- Traffic Accounting ---
+# Each running tunnel reports cumulative bytes in (from the server) and out (to the server),
+# read from the cheapest counter its connection type offers: the BYTECOUNT notifications of
+# the OpenVPN management interface, the outbound counters of Xray's stats API, and for SSH
+# the kernel's per-socket counters of the SOCKS port on Linux (`ss -ti`) or the per-process
+# counters of the master on macOS (`nettop`). Socket counters vanish with their socket, so
+# on Linux a closed connection's bytes since the previous sample are not counted. Throughput
+# is the rate between two samples at least TRAFFIC_RATE_MIN_INTERVAL_SECONDS apart; samples
+# taken sooner return the last counters, so status polls never spawn more than one counter
+# process per tunnel and second. OpenVPN counters are timed by their notification, since they
+# only change every OVPN_BYTECOUNT_INTERVAL_SECONDS.
+TRAFFIC_RATE_MIN_INTERVAL_SECONDS = 1.0
+TRAFFIC_COMMAND_TIMEOUT_SECONDS = 2
+SS_BYTES_PATTERN = re.compile(r"\bbytes_(acked|received):(\d+)")
+_traffic_samples = {}  # identifier -> the latest traffic dict plus its "at" monotonic time
+_ssh_socket_counters = {}  # identifier -> {"sockets": {key: (acked, received)}, "bytes_in", "bytes_out"}
+_traffic_lock = threading.Lock()
+
+
+def _run_counter_command(args):
+    """Runs a counter command and returns its stdout, or None if it failed."""
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=TRAFFIC_COMMAND_TIMEOUT_SECONDS)
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.debug(f"Traffic counter command {args[0]} failed: {e}")
+        return None
+    if result.returncode != 0:
+        logging.debug(f"Traffic counter command {args[0]} exited with {result.returncode}: {result.stderr.strip()}")
+        return None
+    return result.stdout
+
+def read_xray_traffic(identifier):
+    """Returns (bytes_in, bytes_out) of a V2Ray tunnel from its Xray stats API, or None."""
+    pid = find_v2ray_process(identifier)
+    if not pid:
+        return None
+    try:
+        executable = psutil.Process(pid).exe()
+    except psutil.Error:
+        return None
+    api_port = get_xray_api_port(get_v2ray_socks_port(identifier))
+    output = _run_counter_command([executable, "api", "statsquery", f"--server=127.0.0.1:{api_port}",
+                                   "-pattern", f"outbound>>>{XRAY_PROXY_OUTBOUND_TAG}>>>traffic>>>"])
+    if output is None:
+        return None  # Tunnels started from a config without the stats API have no counters.
+    try:
+        # int64 values are JSON strings, and counters that are still zero are left out.
+        stats = {stat["name"].rsplit(">>>", 1)[-1]: int(stat.get("value", 0))
+                 for stat in json.loads(output).get("stat", [])}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logging.debug(f"Unreadable Xray stats for '{identifier}': {output[:200]!r}")
+        return None
+    return stats.get("downlink", 0), stats.get("uplink", 0)
+
+def _parse_ss_sockets(output):
+    """Returns {(local, peer): (bytes_acked, bytes_received)} from `ss -tinH` output."""
+    sockets = {}
+    key = None
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            fields = line.split()
+            key = tuple(fields[-2:]) if len(fields) >= 4 else None
+            continue
+        if key is not None:
+            counters = dict(SS_BYTES_PATTERN.findall(line))
+            sockets[key] = (int(counters.get("acked", 0)), int(counters.get("received", 0)))
+            key = None
+    return sockets
+
+def read_ssh_socket_traffic(identifier, socks_port):
+    """
+    Returns (bytes_in, bytes_out) that an SSH tunnel carried through its SOCKS port, summed
+    from the counters of the accepted sockets on Linux. Bytes the tunnel sent to the browser
+    are bytes in; bytes it received from the browser are bytes out.
+    """
+    output = _run_counter_command(["ss", "-tinH", "state", "established", f"( sport = :{socks_port} )"])
+    if output is None:
+        return None
+    sockets = _parse_ss_sockets(output)
+    with _traffic_lock:
+        totals = _ssh_socket_counters.setdefault(identifier, {"sockets": {}, "bytes_in": 0, "bytes_out": 0})
+        for key, (acked, received) in sockets.items():
+            previous_acked, previous_received = totals["sockets"].get(key, (0, 0))
+            if acked < previous_acked or received < previous_received:
+                previous_acked = previous_received = 0  # The address pair was reused by a new socket.
+            totals["bytes_in"] += acked - previous_acked
+            totals["bytes_out"] += received - previous_received
+        totals["sockets"] = sockets
+        return totals["bytes_in"], totals["bytes_out"]
+
+def read_ssh_process_traffic(pid):
+    """Returns (bytes_in, bytes_out) of an SSH master's external connections on macOS, or None."""
+    output = _run_counter_command(["nettop", "-P", "-L", "1", "-x", "-t", "external",
+                                   "-J", "bytes_in,bytes_out", "-p", str(pid)])
+    if output is None:
+        return None
+    for line in output.splitlines()[1:]:
+        fields = line.split(",")
+        if len(fields) >= 3 and fields[1].isdigit() and fields[2].isdigit():
+            return int(fields[1]), int(fields[2])
+    return None
+
+def read_tunnel_traffic(config, status):
+    """
+    Returns the cumulative (bytes_in, bytes_out, measured_at) of a connected tunnel, or None
+    if unknown. `measured_at` is the time.monotonic() at which the counters were current.
+    """
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    conn_type = config.get("type", "ssh")
+    counters = None
+    with timed("stage", f"traffic_{conn_type}"):
+        if conn_type == "openvpn":
+            session = get_ovpn_session(identifier)
+            if session and session.bytecount_at is not None:
+                return session.bytes_in, session.bytes_out, session.bytecount_at
+        elif conn_type == "v2ray":
+            counters = read_xray_traffic(identifier)
+        elif conn_type == "ssh":
+            if sys.platform == "darwin":
+                pid = get_tunnel_pid(config)
+                counters = read_ssh_process_traffic(pid) if pid else None
+            elif status.get("socks_port"):
+                counters = read_ssh_socket_traffic(identifier, status["socks_port"])
+    return (*counters, time.monotonic()) if counters else None
+
+def sample_tunnel_traffic(config, status):
+    """
+    Returns the traffic dict of a connected tunnel, {"bytes_in", "bytes_out", "in_bps",
+    "out_bps"}, or None when its counters cannot be read. Rates are in bits per second.
+    """
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    now = time.monotonic()
+    with _traffic_lock:
+        previous = _traffic_samples.get(identifier)
+    if previous and now - previous["at"] < TRAFFIC_RATE_MIN_INTERVAL_SECONDS:
+        return {key: value for key, value in previous.items() if key != "at"}
+
+    counters = read_tunnel_traffic(config, status)
+    if counters is None:
+        return None
+    bytes_in, bytes_out, measured_at = counters
+    if previous and measured_at <= previous["at"]:
+        return {key: value for key, value in previous.items() if key != "at"}
+    traffic = {"bytes_in": bytes_in, "bytes_out": bytes_out, "in_bps": 0, "out_bps": 0}
+    if previous and bytes_in >= previous["bytes_in"] and bytes_out >= previous["bytes_out"]:
+        elapsed = measured_at - previous["at"]
+        traffic["in_bps"] = round((bytes_in - previous["bytes_in"]) * 8 / elapsed)
+        traffic["out_bps"] = round((bytes_out - previous["bytes_out"]) * 8 / elapsed)
+    with _traffic_lock:
+        _traffic_samples[identifier] = {**traffic, "at": measured_at}
+    return traffic
+
+def forget_tunnel_traffic(identifier):
+    """Drops the traffic samples of a tunnel that is no longer running."""
+    with _traffic_lock:
+        _traffic_samples.pop(identifier, None)
+        _ssh_socket_counters.pop(identifier, None)
+
+# --- Tunnel Readiness ---
+# A freshly started tunnel is ready when its SOCKS port completes a SOCKS5 greeting or its
+# log reports success, and it has failed as soon as its process exits. Rather than sleeping
+# for fixed intervals, the wait blocks on the kernel: inotify and a pidfd on Linux, kqueue on
+# macOS. SOCKS ports have no readiness event, so they are probed with a short back-off.
+READINESS_TIMEOUT_SECONDS = 20
+SOCKS_PROBE_MIN_INTERVAL = 0.05
+SOCKS_PROBE_MAX_INTERVAL = 0.25
+FALLBACK_WAIT_INTERVAL = 0.1
+IN_MODIFY = 0x2
+SSH_FAILURE_PATTERN = re.compile(
+    r"Permission denied|Could not resolve hostname|Connection refused|Connection timed out|"
+    r"Address already in use|forwarding failed|Host key verification failed", re.IGNORECASE)
+SSH_SUCCESS_PATTERN = re.compile(r"Entering interactive session")
+V2RAY_FAILURE_PATTERN = re.compile(r"Failed to start|failed to listen", re.IGNORECASE)
+
+
+def probe_socks5(port, host="127.0.0.1", timeout=1.0):
+    """Returns True if the port answers a SOCKS5 no-authentication greeting."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(b"\x05\x01\x00")
+            reply = b""
+            while len(reply) < 2:
+                chunk = sock.recv(2 - len(reply))
+                if not chunk:
+                    return False
+                reply += chunk
+            return reply == b"\x05\x00"
+    except OSError:
+        return False
+
+def _inotify_watch(path):
+    """Returns a non-blocking inotify descriptor that becomes readable when `path` is written, or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(str(path)), IN_MODIFY) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+class _TunnelEventWaiter:
+    """
+    Blocks until a process exits or a file is written, whichever happens first, or a timeout passes.
+    With `pid` None only the file is watched.
+    """
+
+    def __init__(self, pid, watch_path=None):
+        self._fds = []
+        self._inotify_fd = None
+        self._kqueue = None
+        self._watch_fd = None
+        if hasattr(select, "kqueue"):
+            self._kqueue = select.kqueue()
+            try:
+                if pid is not None:
+                    self._kqueue.control([select.kevent(pid, filter=select.KQ_FILTER_PROC,
+                                                        flags=select.KQ_EV_ADD, fflags=select.KQ_NOTE_EXIT)], 0, 0)
+            except OSError:
+                pass  # Already gone; the caller's exit check notices.
+            if watch_path and watch_path.is_file():
+                self._watch_fd = os.open(watch_path, os.O_RDONLY)
+                self._kqueue.control([select.kevent(self._watch_fd, filter=select.KQ_FILTER_VNODE,
+                                                    flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                                                    fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND)], 0, 0)
+            return
+        if pid is not None and hasattr(os, "pidfd_open"):
+            try:
+                self._fds.append(os.pidfd_open(pid))
+            except OSError:
+                pass
+        if watch_path and watch_path.is_file():
+            self._inotify_fd = _inotify_watch(watch_path)
+            if self._inotify_fd is not None:
+                self._fds.append(self._inotify_fd)
+
+    def wait(self, timeout):
+        """Waits up to `timeout` seconds for an event."""
+        if self._kqueue is not None:
+            self._kqueue.control(None, 4, timeout)
+        elif self._fds:
+            select.select(self._fds, [], [], timeout)
+            if self._inotify_fd is not None:
+                try:
+                    os.read(self._inotify_fd, 4096)  # Drain events so the next select blocks again.
+                except BlockingIOError:
+                    pass
+        else:
+            time.sleep(min(timeout, FALLBACK_WAIT_INTERVAL))
+
+    def close(self):
+        for fd in self._fds + ([self._watch_fd] if self._watch_fd is not None else []):
+            os.close(fd)
+        if self._kqueue is not None:
+            self._kqueue.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _process_exited(pid, process=None):
+    """Returns True if the process has exited; `process` is the Popen object when it is our child."""
+    if process is not None:
+        return process.poll() is not None
+    try:
+        return psutil.Process(pid).status() == psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return True
+    except psutil.AccessDenied:
+        return False
+
+def wait_for_tunnel_ready(pid, socks_port=None, process=None, log_path=None,
+                          success_pattern=None, failure_pattern=None, timeout=READINESS_TIMEOUT_SECONDS):
+    """
+    Waits until a freshly started tunnel is usable.
+
+    The tunnel is ready when `socks_port` answers a SOCKS5 greeting or a new log line matches
+    `success_pattern`. It has failed when the process exits, a log line matches
+    `failure_pattern`, or `timeout` passes. Returns (ready, reason), where `reason` says why
+    the tunnel is not ready.
+    """
+    start_time = time.perf_counter()
+    deadline = start_time + timeout
+    interval = SOCKS_PROBE_MIN_INTERVAL
+    watch_log = log_path is not None and (success_pattern or failure_pattern)
+    log_reader = None
+    try:
+        with _TunnelEventWaiter(pid, log_path if watch_log else None) as waiter:
+            while True:
+                if watch_log and log_reader is None and log_path.is_file():
+                    log_reader = open(log_path, "r", encoding="utf-8", errors="ignore")
+                if log_reader is not None:
+                    for line in iter(log_reader.readline, ""):
+                        if failure_pattern and failure_pattern.search(line):
+                            return False, line.strip()
+                        if success_pattern and success_pattern.search(line):
+                            logging.info(f"Tunnel PID {pid} ready after {_elapsed_ms(start_time)} ms (log).")
+                            return True, None
+                if socks_port and probe_socks5(socks_port):
+                    logging.info(f"Tunnel PID {pid} ready after {_elapsed_ms(start_time)} ms (SOCKS5 on port {socks_port}).")
+                    return True, None
+                if _process_exited(pid, process):
+                    return False, "The tunnel process exited."
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False, f"Timed out after {timeout} seconds waiting for the tunnel to become ready."
+                waiter.wait(min(interval, remaining) if socks_port else remaining)
+                interval = min(interval * 2, SOCKS_PROBE_MAX_INTERVAL)
+    finally:
+        if log_reader is not None:
+            log_reader.close()
+
 def get_tunnel_status(config):
-    """Checks for the tunnel process (SSH or OpenVPN) and extracts the SOCKS port."""
+    """
+    Checks for the tunnel process (SSH or OpenVPN) and extracts the SOCKS port. A connected
+    tunnel also reports its traffic counters and throughput when they can be read.
+    The pooled web check connection for the tunnel is dropped when it is found down.
+    """
+    with timed("stage", "tunnel_status"):
+        status = _get_tunnel_status(config)
+    if config:
+        identifier = config.get('sshCommandIdentifier') or config.get('id')
+        _sync_web_check_pool(identifier, status)
+        if status["connected"]:
+            traffic = sample_tunnel_traffic(config, status)
+            if traffic:
+                status["traffic"] = traffic
+        else:
+            forget_tunnel_traffic(identifier)
+    return status
+
+def _get_tunnel_status(config):
+    """Looks up the tunnel's process for its connection type and returns its status."""
     if not config or not (config.get('sshCommandIdentifier') or config.get('id')):
         logging.warning("No config or identifier provided to get_tunnel_status.")
         return {"connected": False, "socks_port": None}
@@ -190,68 +1992,120 @@ def get_tunnel_status(config):
     logging.debug(f"Checking for {conn_type} process with identifier: '{identifier}'")
 
     if conn_type == "ssh":
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'username']):
-            try:
-                if proc.info['name'] == 'ssh' and proc.info['cmdline'] and proc.info['username'] == getpass.getuser():
-                    cmd_str = " ".join(proc.info['cmdline'])
-                    if f"ControlPath=/tmp/holocron.ssh.socket.{identifier}" in cmd_str:
-                        logging.debug(f"Found matching SSH process with PID: {proc.pid}")
-                        match = re.search(r'-D\s*(\d+)', cmd_str)
-                        socks_port = int(match.group(1)) if match else None
-                        return {"connected": True, "socks_port": socks_port}
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
+        mux_state = load_ssh_mux_state(identifier)
+        if mux_state is not None:
+            # A parked master has no forwards, so the tunnel counts as stopped.
+            if mux_state["forwards"] and ssh_master_alive(identifier, mux_state["session"]["destination"]):
+                socks_port = next((int(spec) for flag, spec in mux_state["forwards"] if flag == "-D" and spec.isdigit()), None)
+                return {"connected": True, "socks_port": socks_port}
+            return {"connected": False, "socks_port": None}
+        # Tunnels started before multiplexing was enabled are found by their process.
+        cmdline = find_ssh_tunnel_process(identifier)
+        if cmdline:
+            match = re.search(r'-D\s*(\d+)', " ".join(cmdline))
+            socks_port = int(match.group(1)) if match else None
+            return {"connected": True, "socks_port": socks_port}
     elif conn_type == "openvpn":
+        session = get_ovpn_session(identifier)
+        if session and session.state != "EXITING":
+            return {"connected": True, "socks_port": get_config_socks_port(config), "ovpn_state": session.state}
+        # Tunnels started without a management interface (by an earlier version) are found by PID.
         paths = get_ovpn_temp_paths(identifier)
         lock_file = paths["lock"]
-        if lock_file.is_file():
+        if not session and lock_file.is_file():
             try:
                 pid = int(lock_file.read_text().strip())
                 if psutil.pid_exists(pid) and 'openvpn' in psutil.Process(pid).name():
                     logging.debug(f"Found matching OpenVPN process with PID: {pid}")
-                    socks_port = get_ovpn_socks_port(config.get('ovpnFileContent'))
+                    socks_port = get_config_socks_port(config)
                     return {"connected": True, "socks_port": socks_port}
             except (ValueError, psutil.NoSuchProcess):
                 logging.warning(f"Stale lock file found for OpenVPN identifier '{identifier}'.")
     elif conn_type == "v2ray":
-        lock_file = Path(f"/tmp/holocron_v2ray_{identifier}.lock")
-        if lock_file.is_file():
-            try:
-                pid = int(lock_file.read_text().strip())
-                if psutil.pid_exists(pid) and ('v2ray' in psutil.Process(pid).name() or 'xray' in psutil.Process(pid).name()):
-                    logging.debug(f"Found matching V2Ray process with PID: {pid}")
-                    # This is a simplification. The actual port should be read from the generated config.
-                    # For now, we'll assume a default, which the v2ray_connect.sh script must ensure it uses.
-                    return {"connected": True, "socks_port": 10808}
-            except (ValueError, psutil.NoSuchProcess):
-                logging.warning(f"Stale lock file found for V2Ray identifier '{identifier}'.")
+        pid = find_v2ray_process(identifier)
+        if pid:
+            logging.debug(f"Found matching V2Ray process with PID: {pid}")
+            return {"connected": True, "socks_port": get_v2ray_socks_port(identifier)}
     return {"connected": False, "socks_port": None}
 
-def _cleanup_openvpn_files(identifier):
+def get_all_tunnel_statuses(configs, ping_host, web_check_url, deadline=STATUS_DEADLINE_SECONDS):
+    """
+    Returns the status of every configuration, keyed by configuration ID, in one pass.
+    Tunnel states are resolved concurrently against the shared process index, then every
+    live SOCKS port is probed at once under a single deadline. Tunnels sharing a SOCKS port
+    are probed once, and all tunnels without one share a single direct TCP ping.
+    """
+    started = time.perf_counter()
+    configs = [c for c in configs or [] if c and c.get("id")]
+    statuses = dict(zip([c["id"] for c in configs], _probe_executor.map(get_tunnel_status, configs)))
+
+    def probe_port(status):
+        return status.get("socks_port") if status["connected"] else None
+
+    probes = {}  # SOCKS port (None for direct) -> (tcp_future, web_future)
+    for status in statuses.values():
+        port = probe_port(status)
+        if port not in probes:
+            probes[port] = _submit_probes(ping_host, port, (web_check_url or "") if port else None, deadline)
+    concurrent.futures.wait([f for pair in probes.values() for f in pair if f], timeout=deadline)
+    probe_results = {port: _collect_probes(ping_host, web_check_url, *pair) for port, pair in probes.items()}
+
+    for config in configs:
+        status = statuses[config["id"]]
+        status.update(probe_results[probe_port(status)])
+        supervisor = get_supervisor_state(config)
+        if supervisor:
+            status["supervisor"] = supervisor
+    logging.debug(f"Resolved {len(configs)} tunnel statuses with {len(probes)} probe set(s) in {_elapsed_ms(started)}ms.")
+    return {"success": True, "statuses": statuses, "total_ms": _elapsed_ms(started)}
+
+def _cleanup_openvpn_files(identifier, keep_config=False):
     """
     Cleans up all temporary files for a given OpenVPN connection identifier.
-    This is crucial because OpenVPN runs with sudo, creating root-owned files
-    that the user-level script cannot otherwise remove.
+    With `keep_config`, the .ovpn file is left in place to be reused.
     """
     if not identifier:
         return
 
     paths = get_ovpn_temp_paths(identifier)
-    files_to_clean = list(paths.values())
-
-    if POSIX:
-        # Use sudo to remove all potentially root-owned files at once.
-        existing_files = [str(f) for f in files_to_clean if f.is_file()]
-        if existing_files:
-            rm_cmd = ["/usr/bin/sudo", "/bin/rm", "-f"] + existing_files
-            logging.info(f"Cleaning up temp files with command: {' '.join(rm_cmd)}")
-            subprocess.run(rm_cmd, check=False, timeout=10, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    else:
-        # On non-POSIX systems, we assume no sudo was used.
-        for f in files_to_clean:
+    files_to_clean = [path for key, path in paths.items() if not (keep_config and key == "config")]
+    if not keep_config:
+        _written_ovpn_hashes.pop(str(paths["config"]), None)
+
+    # The files live in our own directory, so even root-owned ones can be unlinked without
+    # sudo. It is only needed for a file we cannot remove, e.g. after a permissions change.
+    stubborn_files = []
+    for f in files_to_clean:
+        try:
             f.unlink(missing_ok=True)
+        except PermissionError:
+            stubborn_files.append(str(f))
+    if stubborn_files and POSIX:
+        rm_cmd = ["/usr/bin/sudo", "/bin/rm", "-f"] + stubborn_files
+        logging.info(f"Cleaning up temp files with command: {' '.join(rm_cmd)}")
+        subprocess.run(rm_cmd, check=False, timeout=10, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 def execute_tunnel_command(command, config):
+    """
+    Executes a tunnel command while holding the lock for the config's identifier,
+    so concurrent start/stop requests for the same tunnel run one after another.
+    """
+    with get_tunnel_lock(config):
+        try:
+            with timed("stage", f"tunnel_{command}"):
+                response = _execute_tunnel_command(command, config)
+        finally:
+            # Processes were started or stopped, so cached lookups are out of date.
+            invalidate_process_index()
+            if config and config.get("type") == "openvpn":
+                # OpenVPN can push its own DNS servers, which may answer differently.
+                invalidate_dns_cache()
+    if command == "stop" and response.get("success"):
+        # Don't keep a pooled web check connection through a tunnel that is gone.
+        _sync_web_check_pool(config.get("sshCommandIdentifier") or config.get("id"), {"connected": False})
+    return response
+
+def _execute_tunnel_command(command, config):
     """Executes the appropriate connection script (SSH or OpenVPN)."""
     if command not in ["start", "stop"]:
         return {"success": False, "message": f"Invalid command: {command}"}
@@ -267,27 +2121,8 @@ def execute_tunnel_command(command, config):
         script_path = SHELL_SCRIPT_PATH
         cmd_list = [str(script_path), command, "--identifier", identifier]
         if command == "start":
-            # --- Port Pre-flight Check ---
-            port_forwards = config.get("portForwards", [])
-            for rule in port_forwards:
-                # We only care about local ports that SSH will try to bind.
-                # This applies to -L (local) and -D (dynamic) forwards.
-                # For -R (remote) forwards, the binding is on the remote server.
-                if rule.get("type") in ["L", "D"]:
-                    local_port_str = rule.get("localPort")
-                    if local_port_str:
-                        try:
-                            local_port = int(local_port_str)
-                            process_info = get_process_using_port(local_port)
-                            if process_info:
-                                message = f"Port {local_port} is already in use by {process_info}. Please close the application or change the configuration."
-                                logging.error(message)
-                                return {"success": False, "message": message}
-                        except (ValueError, TypeError):
-                            # Ignore invalid port numbers, they will be caught by other validation
-                            # in the options page, but we shouldn't crash here.
-                            logging.warning(f"Invalid port '{local_port_str}' in forwarding rule. Skipping check.")
-                            pass
+            # Readiness is awaited here (see wait_for_tunnel_ready), not by the script.
+            cmd_list.append("--no-wait")
             ssh_user = config.get("sshUser")
             ssh_host = config.get("sshHost")
 
@@ -303,19 +2138,27 @@ def execute_tunnel_command(command, config):
                 final_user = ssh_user
                 final_host = ssh_host
 
+            forwards = get_ssh_forward_args(config)
+            session = {"destination": f"{final_user}@{final_host}", "remote_command": config.get("sshRemoteCommand") or ""}
+            # An authenticated master for the same session only needs its forwards adjusted.
+            response = reuse_ssh_master(identifier, session, forwards)
+            if response is not None:
+                return response
+
+            # --- Port Pre-flight Check ---
+            busy_message = find_busy_forward_port(forwards)
+            if busy_message:
+                logging.error(busy_message)
+                return {"success": False, "message": busy_message}
+
             if final_user: cmd_list.extend(["--user", final_user])
             if final_host: cmd_list.extend(["--host", final_host])
             if config.get("sshRemoteCommand"):
                 cmd_list.extend(["--remote-command", config.get("sshRemoteCommand")])
             for ssid in config.get("wifiSsidList", []):
                 if ssid: cmd_list.extend(["--ssid", ssid])
-            for rule in config.get("portForwards", []):
-                if rule.get("type") == "D" and rule.get("localPort"):
-                    cmd_list.extend(["-D", str(rule.get("localPort"))])
-                elif rule.get("type") == "L" and all(k in rule for k in ["localPort", "remoteHost", "remotePort"]):
-                    cmd_list.extend(["-L", f"{rule['localPort']}:{rule['remoteHost']}:{rule['remotePort']}"])
-                elif rule.get("type") == "R" and all(k in rule for k in ["localPort", "remoteHost", "remotePort"]):
-                    cmd_list.extend(["-R", f"{rule['localPort']}:{rule['remoteHost']}:{rule['remotePort']}"])
+            for flag, spec in forwards:
+                cmd_list.extend([flag, spec])
         
         if command == "start":
             try:
@@ -339,28 +2182,46 @@ def execute_tunnel_command(command, config):
                     return {"success": False, "message": f"Failed to start tunnel: {error_output}"}
 
                 # --- Verification Step ---
-                logging.info("Start script finished. Waiting 2s to verify tunnel stability...")
-                time.sleep(2)
+                if returncode == 0:
+                    pid = _read_pid_file(Path.home() / ".ssh" / f"holocron_tunnel_{identifier}.lock")
+                    socks_port = next((int(rule["localPort"]) for rule in config.get("portForwards", [])
+                                       if rule.get("type") == "D" and str(rule.get("localPort", "")).isdigit()), None)
+                    log_path = get_log_path_for_config(identifier, "ssh")
+                    ready, reason = (False, "The start script did not record the SSH process ID.")
+                    if pid:
+                        logging.info(f"Start script finished. Waiting for tunnel '{identifier}' (PID {pid}) to become ready...")
+                        ready, reason = wait_for_tunnel_ready(
+                            pid, socks_port=socks_port, log_path=log_path,
+                            success_pattern=None if socks_port else SSH_SUCCESS_PATTERN,
+                            failure_pattern=SSH_FAILURE_PATTERN)
+                    if not ready:
+                        logging.error(f"Tunnel '{identifier}' did not become ready: {reason}")
+                        if pid and not _process_exited(pid):
+                            try:
+                                psutil.Process(pid).terminate()
+                            except psutil.Error:
+                                pass
+                        Path.home().joinpath(".ssh", f"holocron_tunnel_{identifier}.lock").unlink(missing_ok=True)
+                        error_details = f"The SSH tunnel failed to start: {reason}"
+                        if log_path.is_file():
+                            try:
+                                with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+                                    last_lines = "".join(f.readlines()[-10:]).strip()
+                                if last_lines:
+                                    error_details += f"\nLast log entries:\n---\n{last_lines}"
+                            except Exception as log_e:
+                                logging.warning(f"Could not read SSH log file at {log_path}: {log_e}")
+                        return {"success": False, "message": error_details}
 
+                if returncode == 0:
+                    save_ssh_mux_state(identifier, session, forwards)
                 status = get_tunnel_status(config)
                 if status.get("connected"):
                     logging.info(f"Successfully started and verified tunnel '{identifier}'.")
                     return {"success": True, "message": "Tunnel started and verified."}
                 else:
                     logging.error(f"Verification failed. Tunnel '{identifier}' is not running after start command.")
-                    log_path = get_log_path_for_config(identifier, "ssh")
-                    error_details = "Verification failed: The SSH process is not running. Check logs for details."
-                    if log_path.is_file():
-                        try:
-                            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                log_lines = f.readlines()
-                                last_lines = "".join(log_lines[-10:]).strip()
-                                if last_lines:
-                                    error_details = f"The SSH process failed after connecting. Last log entries:\n---\n{last_lines}"
-                        except Exception as log_e:
-                            logging.warning(f"Could not read SSH log file at {log_path}: {log_e}")
-                            error_details = "The SSH process failed. Could not read its log file."
-                    return {"success": False, "message": error_details}
+                    return {"success": False, "message": "Verification failed: The SSH process is not running. Check logs for details."}
 
             except subprocess.TimeoutExpired:
                 logging.error(f"Timeout: The 'start' command for tunnel '{identifier}' took too long to execute.")
@@ -370,7 +2231,8 @@ def execute_tunnel_command(command, config):
                 return {"success": False, "message": f"An unexpected error occurred: {e}"}
 
         elif command == "stop":
-            # The existing logic for stop is sufficient.
+            if park_ssh_master(identifier):
+                return {"success": True, "message": "Tunnel stopped. The SSH connection is kept briefly for a fast reconnect."}
             result = subprocess.run(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=10, check=False)
             if result.returncode != 0:
                 return {"success": False, "message": result.stderr.strip() or result.stdout.strip()}
@@ -392,25 +2254,15 @@ def execute_tunnel_command(command, config):
             # Proactively clean up any stale files from previous runs. This is critical
             # to prevent permission errors if root-owned files were left behind from
             # a previous failed or improperly stopped session.
-            _cleanup_openvpn_files(identifier)
+            _cleanup_openvpn_files(identifier, keep_config=ovpn_config_file_is_current(config_file, config))
             
-            ovpn_content = config.get("ovpnFileContent")
-            if not ovpn_content:
+            if not config.get("ovpnFileContent"):
                 return {"success": False, "message": "OpenVPN content is missing."}
-            
-            # Sanitize OVPN content to remove directives that could interfere with our script's
-            # management of logs, status files, daemonization, and PID files.
-            # Also remove deprecated/insecure compression directives that can cause connection failures.
-            lines = ovpn_content.splitlines()
-            # The \b ensures we match whole words (e.g. 'log' but not 'log-file').
-            directives_to_remove = re.compile(r"^\s*(log|log-append|status|daemon|writepid|comp-lzo|compress)\b", re.IGNORECASE)
-            sanitized_lines = [line for line in lines if not directives_to_remove.match(line)]
-            # Add directives for robust connections to address warnings and potential restart failures.
-            sanitized_lines.append("persist-tun")
-            sanitized_lines.append("persist-key")
-            sanitized_ovpn_content = "\n".join(sanitized_lines)
-            
-            config_file.write_text(sanitized_ovpn_content)
+
+            # The .ovpn file is kept across restarts of the same config version, so it is
+            # only rewritten when the config changed.
+            if not ovpn_config_file_is_current(config_file, config):
+                write_ovpn_config_file(config_file, config)
             
             # On POSIX systems, creating a TUN/TAP interface requires root privileges.
             # We prepend 'sudo' to the command. The user must have configured passwordless
@@ -418,8 +2270,12 @@ def execute_tunnel_command(command, config):
             # We run OpenVPN in the foreground relative to this script (no --daemon) and manage
             # the process directly. This provides reliable control over logging and process state,
             # avoiding issues where --daemon redirects logs to syslog.
-            cmd_list = [openvpn_exec, "--config", str(config_file)]
+            # OpenVPN holds until we attach to its management interface (see attach_ovpn_management).
+            cmd_list = [openvpn_exec, "--config", str(config_file),
+                        "--management", *_reserve_ovpn_management_address(identifier), "--management-hold"]
             if POSIX:
+                import getpass
+                import platform
                 username = getpass.getuser()
                 # Determine the correct group name for privilege dropping.
                 # On macOS, the primary group is 'staff'. On many Linux distros,
@@ -438,6 +2294,8 @@ def execute_tunnel_command(command, config):
                 # log and pid files it creates are owned by the user, preventing
                 # permission errors on subsequent reads or cleanup operations.
                 cmd_list.extend(["--user", username, "--group", groupname])
+                # The management socket is created by root; only we may connect to it.
+                cmd_list.extend(["--management-client-user", username])
                 cmd_list.insert(0, "/usr/bin/sudo")
             # Handle username/password authentication
             ovpn_user = config.get("ovpnUser")
@@ -466,61 +2324,42 @@ def execute_tunnel_command(command, config):
                      open(stderr_log_file, 'w', buffering=1, encoding='utf-8', errors='ignore') as stderr_f:
                     process = subprocess.Popen(cmd_list, stdout=stdout_f, stderr=stderr_f)
 
-                # Actively monitor the log file for success or failure, with a timeout.
-                timeout_seconds = 20
-                poll_interval_seconds = 0.5
-                start_time = time.time()
-                
-                success_pattern = re.compile(r"Initialization Sequence Completed")
-                failure_patterns = re.compile(r"AUTH_FAILED|Cannot resolve host|Exiting due to fatal error|TLS Error|route_gateway_iface", re.IGNORECASE)
-
-                # Use a 'tail -f' like approach to read the log file in real-time.
-                # This is more robust than re-reading the entire file in a loop.
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as log_reader:
-                    while time.time() - start_time < timeout_seconds:
-                        # Check if the process has already exited
-                        if process.poll() is not None:
-                            logging.warning(f"OpenVPN process exited prematurely with code {process.returncode}.")
-                            break # Exit loop to report failure
-
-                        line = log_reader.readline()
-                        if not line:
-                            # No new line yet, wait a bit before checking again.
-                            time.sleep(poll_interval_seconds)
-                            continue
-
-                        # We have a new line, check it for success or failure patterns.
-                        logging.debug(f"Read from OVPN log: {line.strip()}")
-                        if success_pattern.search(line):
-                            logging.info("OpenVPN 'Initialization Sequence Completed' found in log.")
-                            lock_file.write_text(str(process.pid))
-                            stderr_log_file.unlink(missing_ok=True) # Clean up on success
-                            return {"success": True, "message": f"OpenVPN tunnel started with PID {process.pid}."}
-                        
-                        if failure_patterns.search(line):
-                            logging.error(f"OpenVPN failure pattern found in log: {line.strip()}")
-                            process.terminate()
-                            try:
-                                process.wait(timeout=2)
-                            except subprocess.TimeoutExpired:
-                                process.kill()
-                            break # Exit loop to report failure
-                
-                # If we get here, the loop ended without success (timeout or premature exit)
-                if process.poll() is None:
-                    logging.error(f"OpenVPN connection timed out after {timeout_seconds} seconds.")
-                    process.terminate()
+                # Wait for OpenVPN to report the CONNECTED state or a failure, or to exit.
+                start_time = time.perf_counter()
+                session = attach_ovpn_management(identifier, process=process)
+                if session:
+                    ready, reason = session.wait_until_connected(READINESS_TIMEOUT_SECONDS)
+                else:
+                    ready, reason = False, "OpenVPN did not open its management interface."
+                if ready:
+                    pid = session.get_pid() or process.pid
+                    logging.info(f"OpenVPN connected after {_elapsed_ms(start_time)} ms (PID {pid}).")
+                    session.started = True
+                    lock_file.write_text(str(pid))
+                    stderr_log_file.unlink(missing_ok=True) # Clean up on success
+                    return {"success": True, "message": f"OpenVPN tunnel started with PID {pid}."}
+
+                if process.poll() is not None:
+                    logging.warning(f"OpenVPN process exited prematurely with code {process.returncode}: {reason}")
+                else:
+                    logging.error(f"OpenVPN did not become ready: {reason}")
+                    if not (session and session.stop()):
+                        process.terminate()
                     try:
                         process.wait(timeout=2)
                     except subprocess.TimeoutExpired:
                         process.kill()
+                if session:
+                    session.close()
 
                 # Construct the final error message
                 launch_error = stderr_log_file.read_text().strip() if stderr_log_file.is_file() else ""
                 log_content = log_file.read_text().strip() if log_file.is_file() else "No log file found or log was empty."
                 
                 final_error = "OpenVPN failed to start."
-                if "connection timed out" in log_content.lower():
+                if reason and reason.startswith("Authentication failed"):
+                     final_error = reason
+                elif "connection timed out" in log_content.lower():
                      final_error = "OpenVPN connection timed out. Check server address and network."
                 elif "AUTH_FAILED" in log_content:
                      final_error = "Authentication failed. Please check your username and password."
@@ -538,8 +2377,17 @@ def execute_tunnel_command(command, config):
                 return {"success": False, "message": f"A critical error occurred while starting OpenVPN: {e}"}
 
         elif command == "stop":
+            session = get_ovpn_session(identifier)
+            if session:
+                logging.info(f"Stopping OpenVPN '{identifier}' through its management interface.")
+                if not session.stop():
+                    logging.warning(f"OpenVPN '{identifier}' did not exit within {OVPN_MANAGEMENT_COMMAND_TIMEOUT_SECONDS} seconds of SIGTERM.")
+                session.close()
+                _cleanup_openvpn_files(identifier)
+                return {"success": True, "message": "OpenVPN tunnel stopped."}
             if not lock_file.is_file():
                 return {"success": True, "message": "Tunnel already stopped."}
+            # A tunnel started without a management interface (by an earlier version) is killed by PID.
             try:
                 pid = int(lock_file.read_text().strip())
                 if psutil.pid_exists(pid):
@@ -563,10 +2411,21 @@ def execute_tunnel_command(command, config):
     elif conn_type == "v2ray":
         script_path = V2RAY_SCRIPT_PATH
         cmd_list = [str(script_path), command, "--identifier", identifier]
+        socks_port = None
         if command == "start":
             if not config.get("v2rayUrl"):
                 return {"success": False, "message": "V2Ray URL is missing in the configuration."}
-            cmd_list.extend(["--url", config["v2rayUrl"]])
+            if find_v2ray_process(identifier):
+                return {"success": True, "already_running": True, "message": "V2Ray tunnel is already running.",
+                        "socks_port": get_v2ray_socks_port(identifier)}
+            try:
+                socks_port = allocate_v2ray_socks_port(identifier)
+                config_path = get_xray_config_path(config["v2rayUrl"], socks_port)
+            except (ValueError, RuntimeError, OSError) as e:
+                logging.error(f"Could not prepare the Xray config for '{identifier}': {e}")
+                return {"success": False, "message": f"Could not prepare the V2Ray tunnel: {e}"}
+            # Readiness is awaited here (see wait_for_tunnel_ready), not by the script.
+            cmd_list.extend(["--config", str(config_path), "--no-wait"])
 
         if not script_path.is_file() or not os.access(script_path, os.X_OK):
             error_msg = f"V2Ray script not found or not executable at {script_path}"
@@ -587,6 +2446,20 @@ def execute_tunnel_command(command, config):
                 logging.error(f"V2Ray script failed. Exit code: {result.returncode}. Output: {error_output}")
                 return {"success": False, "message": f"Failed to {command} V2Ray tunnel: {error_output}"}
 
+            if command == "start":
+                pid = _read_pid_file(Path(f"/tmp/holocron_v2ray_{identifier}.lock"))
+                ready, reason = (False, "The start script did not record the Xray process ID.")
+                if pid:
+                    ready, reason = wait_for_tunnel_ready(
+                        pid, socks_port=socks_port, log_path=get_log_path_for_config(identifier, "v2ray"),
+                        failure_pattern=V2RAY_FAILURE_PATTERN)
+                if not ready:
+                    logging.error(f"V2Ray tunnel '{identifier}' did not become ready: {reason}")
+                    subprocess.run([str(script_path), "stop", "--identifier", identifier],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10, check=False)
+                    return {"success": False, "message": f"Xray process failed to start correctly: {reason} Check the log for details."}
+                return {"success": True, "message": f"V2Ray tunnel started with SOCKS port {socks_port}.", "socks_port": socks_port}
+
             return {"success": True, "message": result.stdout.strip() or "V2Ray tunnel command executed successfully."}
         except subprocess.TimeoutExpired:
             logging.error(f"Timeout: The command '{command}' for V2Ray tunnel '{identifier}' took too long.")
@@ -597,6 +2470,544 @@ def execute_tunnel_command(command, config):
     else:
         return {"success": False, "message": f"Unknown connection type: {conn_type}"}
 
+# --- Tunnel Supervision ---
+# A supervised tunnel is watched by a thread of its own instead of the extension's
+# once-a-minute status alarm. The thread sleeps on the tunnel process's exit event
+# (kqueue or pidfd, see _TunnelEventWaiter) between health probes, so a dead tunnel is
+# noticed at once and a hung one within one probe interval. Failed tunnels are restarted
+# with exponential backoff, and every state change is pushed to the extension as an
+# unsolicited {"event": "tunnelStateChanged"} message.
+SUPERVISOR_DEFAULT_INTERVAL_SECONDS = 10
+SUPERVISOR_MIN_INTERVAL_SECONDS = 2
+SUPERVISOR_FAILURE_THRESHOLD = 2  # Consecutive failed probes of a live process before a restart.
+SUPERVISOR_MIN_BACKOFF_SECONDS = 1
+SUPERVISOR_MAX_BACKOFF_SECONDS = 60
+SUPERVISOR_MAX_RESTART_ATTEMPTS = 6
+TUNNEL_STATE_EVENT = "tunnelStateChanged"
+_supervised_tunnels = {}  # identifier -> supervision entry
+_supervised_tunnels_lock = threading.Lock()
+
+
+def push_event(event, **fields):
+    """Sends an unsolicited event message (one without a requestId) to the extension."""
+    try:
+        send_message({"event": event, **fields})
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not push '{event}' event: {e}")
+
+def get_tunnel_pid(config):
+    """Returns the PID recorded in the lock file of a config's tunnel, or None."""
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    conn_type = config.get("type", "ssh")
+    if conn_type == "ssh":
+        return _read_pid_file(get_ssh_mux_paths(identifier)["lock"])
+    if conn_type == "openvpn":
+        return _read_pid_file(get_ovpn_temp_paths(identifier)["lock"])
+    if conn_type == "v2ray":
+        return _read_pid_file(Path(f"/tmp/holocron_v2ray_{identifier}.lock"))
+    return None
+
+def probe_tunnel_health(config):
+    """Returns (healthy, reason): the tunnel must be running and its SOCKS port must answer."""
+    status = _get_tunnel_status(config)
+    if not status.get("connected"):
+        return False, "The tunnel is not running."
+    socks_port = status.get("socks_port")
+    if socks_port and not probe_socks5(socks_port):
+        return False, f"The SOCKS proxy on port {socks_port} is not answering."
+    return True, None
+
+def get_supervisor_state(config):
+    """Returns the supervision state of a config's tunnel for status responses, or None."""
+    identifier = (config or {}).get("sshCommandIdentifier") or (config or {}).get("id")
+    with _supervised_tunnels_lock:
+        entry = _supervised_tunnels.get(identifier)
+        if not entry:
+            return None
+        return {"state": entry["state"], "message": entry["message"], "restarts": entry["restarts"],
+                "interval_seconds": entry["interval"]}
+
+def _set_supervisor_state(identifier, entry, state, message=None, **fields):
+    """Records a supervision state change and pushes it to the extension."""
+    entry["state"] = state
+    entry["message"] = message
+    log = logging.warning if state != "up" else logging.info
+    log(f"Supervised tunnel '{identifier}' is {state}{f': {message}' if message else ''}.")
+    push_event(TUNNEL_STATE_EVENT, identifier=identifier, state=state, message=message,
+               restarts=entry["restarts"], **fields)
+
+def _restart_tunnel(config):
+    """Stops and starts a tunnel. An SSH master is closed first, since a broken one must not be reused."""
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    if config.get("type", "ssh") == "ssh":
+        state = load_ssh_mux_state(identifier)
+        if state:
+            exit_ssh_master(identifier, state["session"]["destination"])
+    execute_tunnel_command("stop", config)
+    return execute_tunnel_command("start", config)
+
+def _restart_supervised_tunnel(identifier, entry, reason):
+    """Restarts a failed tunnel with exponential backoff. Returns False if supervision ended."""
+    stop_event = entry["stop_event"]
+    backoff = SUPERVISOR_MIN_BACKOFF_SECONDS
+    for attempt in range(1, SUPERVISOR_MAX_RESTART_ATTEMPTS + 1):
+        entry["restarts"] += 1
+        _set_supervisor_state(identifier, entry, "restarting", reason, attempt=attempt)
+        with get_tunnel_lock(entry["config"]):
+            # A stop request sets the event before it takes the lock, so it always wins.
+            if stop_event.is_set():
+                return False
+            response = _restart_tunnel(entry["config"])
+        if response.get("success"):
+            _set_supervisor_state(identifier, entry, "up", socks_port=get_tunnel_status(entry["config"]).get("socks_port"))
+            return True
+        reason = response.get("message") or "The tunnel could not be restarted."
+        if stop_event.wait(backoff):
+            return False
+        backoff = min(backoff * 2, SUPERVISOR_MAX_BACKOFF_SECONDS)
+
+    with _supervised_tunnels_lock:
+        if _supervised_tunnels.get(identifier) is entry:
+            del _supervised_tunnels[identifier]
+    _set_supervisor_state(identifier, entry, "failed", f"Gave up after {SUPERVISOR_MAX_RESTART_ATTEMPTS} restart attempts: {reason}")
+    return False
+
+def _supervise_tunnel(identifier, entry):
+    """Supervision loop: waits for the process to exit or the probe interval to pass, then probes."""
+    stop_event = entry["stop_event"]
+    failures = 0
+    while not stop_event.is_set():
+        pid = get_tunnel_pid(entry["config"])
+        if pid:
+            with _TunnelEventWaiter(pid) as waiter:
+                waiter.wait(entry["interval"])
+        else:
+            stop_event.wait(entry["interval"])
+        if stop_event.is_set():
+            break
+        healthy, reason = probe_tunnel_health(entry["config"])
+        if healthy:
+            failures = 0
+            continue
+        failures += 1
+        if pid and not _process_exited(pid) and failures < SUPERVISOR_FAILURE_THRESHOLD:
+            logging.debug(f"Health probe failed for live tunnel '{identifier}' ({reason}); probing again.")
+            continue
+        if not _restart_supervised_tunnel(identifier, entry, reason):
+            break
+        failures = 0
+    logging.debug(f"Supervision of tunnel '{identifier}' ended.")
+
+def supervise_tunnel(config, interval=None):
+    """Starts supervising a running tunnel, replacing any earlier supervision of it."""
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    try:
+        interval = max(SUPERVISOR_MIN_INTERVAL_SECONDS, float(interval or SUPERVISOR_DEFAULT_INTERVAL_SECONDS))
+    except (TypeError, ValueError):
+        interval = SUPERVISOR_DEFAULT_INTERVAL_SECONDS
+    unsupervise_tunnel(config)
+    entry = {"config": dict(config), "interval": interval, "stop_event": threading.Event(),
+             "state": "up", "message": None, "restarts": 0}
+    with _supervised_tunnels_lock:
+        _supervised_tunnels[identifier] = entry
+    threading.Thread(target=_supervise_tunnel, args=(identifier, entry),
+                     name=f"holocron-supervisor-{identifier}", daemon=True).start()
+    logging.info(f"Supervising tunnel '{identifier}' with health probes every {interval} seconds.")
+
+def unsupervise_tunnel(config):
+    """Stops supervising a config's tunnel (the tunnel itself is left as it is)."""
+    identifier = (config or {}).get("sshCommandIdentifier") or (config or {}).get("id")
+    with _supervised_tunnels_lock:
+        entry = _supervised_tunnels.pop(identifier, None)
+    if entry:
+        entry["stop_event"].set()
+        logging.info(f"Stopped supervising tunnel '{identifier}'.")
+
+# --- Tunnel Ranking ---
+# With load balancing on, several tunnels run at once. A ranking thread probes each of them
+# on an interval and orders them by smoothed (EWMA) web + TCP latency, with a hysteresis
+# margin so that two tunnels of similar speed do not swap places on every pass. Whenever the
+# order or a tunnel's health changes, a "tunnelRankingChanged" event is pushed and the
+# extension regenerates its PAC fallback chain.
+RANKING_DEFAULT_INTERVAL_SECONDS = 30
+RANKING_MIN_INTERVAL_SECONDS = 5
+RANKING_EWMA_ALPHA = 0.3
+RANKING_HYSTERESIS = 0.2  # A tunnel must be 20% faster than the one ahead of it to overtake it.
+TUNNEL_RANKING_EVENT = "tunnelRankingChanged"
+_ranking_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="holocron-ranking")
+_ranking_lock = threading.Lock()
+_ranking_state = {"stop_event": None, "scores": {}, "ranking": []}
+
+
+def _measure_tunnel(config, ping_host, web_check_url):
+    """Probes one tunnel through its SOCKS port. Returns its ranking entry before smoothing."""
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    status = get_tunnel_status(config)
+    socks_port = status.get("socks_port")
+    entry = {"id": config.get("id"), "identifier": identifier, "socks_port": socks_port,
+             "healthy": False, "latency_ms": None, "web_check_latency_ms": -1, "tcp_ping_ms": -1}
+    if not status.get("connected") or not socks_port:
+        return entry
+    probes = run_probes(ping_host, socks_port=socks_port, web_check_url=web_check_url)
+    entry["web_check_latency_ms"] = probes["web_check_latency_ms"]
+    entry["tcp_ping_ms"] = probes["tcp_ping_ms"]
+    if probes["web_check_latency_ms"] > -1 and probes["tcp_ping_ms"] > -1 and probes["web_check_status"] == "OK":
+        entry["healthy"] = True
+        entry["latency_ms"] = probes["web_check_latency_ms"] + probes["tcp_ping_ms"]
+    return entry
+
+def _order_ranking(entries, scores, previous_order):
+    """
+    Orders healthy tunnels by score, then unhealthy ones. Tunnels start from their previous
+    position and only move ahead of another tunnel when they beat it by RANKING_HYSTERESIS.
+    """
+    position = {tunnel_id: i for i, tunnel_id in enumerate(previous_order)}
+    healthy = sorted((e for e in entries if e["healthy"]),
+                     key=lambda e: (position.get(e["id"], len(position)), scores[e["id"]]))
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(healthy) - 1):
+            ahead, behind = healthy[i], healthy[i + 1]
+            if scores[behind["id"]] < scores[ahead["id"]] * (1 - RANKING_HYSTERESIS):
+                healthy[i], healthy[i + 1] = behind, ahead
+                changed = True
+    unhealthy = [e for e in entries if not e["healthy"]]
+    return healthy + unhealthy
+
+def rank_tunnels(configs, ping_host, web_check_url, stop_event):
+    """
+    Probes the tunnels of `configs` concurrently and updates the ranking.
+    Returns (ranking, changed), where `changed` is True if the order or health of any tunnel changed.
+    `stop_event` identifies the ranking session; if it is no longer the current one when the
+    probes finish (ranking was stopped or restarted meanwhile), the result is dropped: the
+    unsmoothed entries are returned and the stored scores and order are left alone.
+    """
+    futures = [_ranking_executor.submit(_measure_tunnel, config, ping_host, web_check_url) for config in configs]
+    entries = [future.result() for future in futures]
+    with _ranking_lock:
+        if _ranking_state["stop_event"] is not stop_event:
+            for entry in entries:
+                entry["score_ms"] = None
+            return entries, False
+        scores = _ranking_state["scores"]
+        for entry in entries:
+            if entry["healthy"]:
+                previous = scores.get(entry["id"])
+                scores[entry["id"]] = entry["latency_ms"] if previous is None else (
+                    RANKING_EWMA_ALPHA * entry["latency_ms"] + (1 - RANKING_EWMA_ALPHA) * previous)
+                entry["score_ms"] = round(scores[entry["id"]])
+            else:
+                scores.pop(entry["id"], None)  # A recovered tunnel starts over from a fresh sample.
+                entry["score_ms"] = None
+        previous = _ranking_state["ranking"]
+        ranking = _order_ranking(entries, scores, [e["id"] for e in previous])
+        changed = [(e["id"], e["healthy"]) for e in ranking] != [(e["id"], e["healthy"]) for e in previous]
+        _ranking_state["ranking"] = ranking
+    return ranking, changed
+
+def _run_tunnel_ranking(stop_event, configs, ping_host, web_check_url, interval):
+    """Ranking loop: re-ranks the tunnels every `interval` seconds and pushes order changes."""
+    while not stop_event.wait(interval):
+        try:
+            ranking, changed = rank_tunnels(configs, ping_host, web_check_url, stop_event)
+            if changed and not stop_event.is_set():
+                logging.info(f"Tunnel ranking changed: {[(e['id'], e['score_ms']) for e in ranking]}")
+                push_event(TUNNEL_RANKING_EVENT, ranking=ranking)
+        except Exception as e:
+            logging.error(f"Tunnel ranking pass failed: {e}", exc_info=True)
+
+def start_tunnel_ranking(configs, ping_host, web_check_url, interval=None):
+    """Starts (or restarts) ranking the given tunnels. Returns the first ranking."""
+    try:
+        interval = max(RANKING_MIN_INTERVAL_SECONDS, float(interval or RANKING_DEFAULT_INTERVAL_SECONDS))
+    except (TypeError, ValueError):
+        interval = RANKING_DEFAULT_INTERVAL_SECONDS
+    stop_tunnel_ranking()
+    stop_event = threading.Event()
+    with _ranking_lock:
+        _ranking_state["stop_event"] = stop_event
+    ranking, _ = rank_tunnels(configs, ping_host, web_check_url, stop_event)
+    threading.Thread(target=_run_tunnel_ranking, args=(stop_event, configs, ping_host, web_check_url, interval),
+                     name="holocron-ranking-loop", daemon=True).start()
+    logging.info(f"Ranking {len(configs)} tunnel(s) every {interval} seconds.")
+    return ranking
+
+def stop_tunnel_ranking():
+    """Stops ranking tunnels and forgets the scores."""
+    with _ranking_lock:
+        stop_event = _ranking_state["stop_event"]
+        _ranking_state.update({"stop_event": None, "scores": {}, "ranking": []})
+    if stop_event:
+        stop_event.set()
+
+# --- Benchmarks ---
+# benchmarkTunnel measures a tunnel through its SOCKS port against stand-in echo and HTTP
+# servers that this process starts on loopback, so it needs no network access and can run
+# in CI. The tunnel's exit must be able to reach the stand-ins at the target host: that
+# holds for tunnels to this machine (e.g. SSH to localhost in CI) and for local SOCKS
+# servers; 'targetHost' names an address of this machine reachable from a remote exit.
+BENCHMARK_RESULTS_FILE = CONN_LOG_DIR / "benchmarks.json"
+BENCHMARK_MAX_RESULTS_PER_TUNNEL = 20
+BENCHMARK_DEFAULT_SAMPLES = 20
+BENCHMARK_MAX_SAMPLES = 200
+BENCHMARK_DEFAULT_TRANSFER_BYTES = 16 * 1024 * 1024
+BENCHMARK_MAX_TRANSFER_BYTES = 256 * 1024 * 1024
+BENCHMARK_STREAM_COUNTS = (1, 8, 64)
+BENCHMARK_TIMEOUT_SECONDS = 15
+BENCHMARK_CHUNK_BYTES = 64 * 1024
+_benchmark_lock = threading.Lock()  # One benchmark at a time, so runs do not skew each other.
+_benchmark_results_lock = threading.Lock()
+
+_benchmark_handlers = None
+
+def _get_benchmark_handlers():
+    """
+    Returns the request handler classes of the stand-in servers. They are defined on first
+    use, so that socketserver and http.server are only imported when a benchmark runs.
+    """
+    global _benchmark_handlers
+    if _benchmark_handlers is not None:
+        return _benchmark_handlers
+    import socketserver
+    import http.server
+
+    class _BenchmarkEchoHandler(socketserver.BaseRequestHandler):
+        """Echoes everything it receives until the client closes the connection."""
+        def handle(self):
+            while True:
+                data = self.request.recv(BENCHMARK_CHUNK_BYTES)
+                if not data:
+                    return
+                self.request.sendall(data)
+
+    class _BenchmarkHTTPHandler(http.server.BaseHTTPRequestHandler):
+        """Serves GET /download?bytes=N with N bytes and drains the body of POST /upload."""
+        protocol_version = "HTTP/1.1"
+        _payload = bytes(BENCHMARK_CHUNK_BYTES)
+
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            remaining = int(query.get("bytes", ["0"])[0])
+            self.send_response(200)
+            self.send_header("Content-Length", str(remaining))
+            self.end_headers()
+            payload = memoryview(self._payload)
+            while remaining > 0:
+                chunk = payload[:min(remaining, len(payload))]
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+        def do_POST(self):
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                data = self.rfile.read(min(remaining, BENCHMARK_CHUNK_BYTES))
+                if not data:
+                    return
+                remaining -= len(data)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass  # Benchmark requests would flood the log (and stderr belongs to the browser).
+
+    _benchmark_handlers = (socketserver, http.server, _BenchmarkEchoHandler, _BenchmarkHTTPHandler)
+    return _benchmark_handlers
+
+class _BenchmarkServers:
+    """Runs the stand-in echo and HTTP servers on ephemeral loopback ports for one benchmark."""
+    def __init__(self, bind_host="127.0.0.1"):
+        socketserver, http_server, echo_handler, http_handler = _get_benchmark_handlers()
+        self.echo = socketserver.ThreadingTCPServer((bind_host, 0), echo_handler)
+        self.echo.daemon_threads = True
+        self.http = http_server.ThreadingHTTPServer((bind_host, 0), http_handler)
+        self.http.daemon_threads = True
+
+    def __enter__(self):
+        for server in (self.echo, self.http):
+            threading.Thread(target=server.serve_forever, name="holocron-benchmark-server", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for server in (self.echo, self.http):
+            server.shutdown()
+            server.server_close()
+
+def _benchmark_connect(socks_port, target, timeout=BENCHMARK_TIMEOUT_SECONDS):
+    """Opens a connection to `target` through the SOCKS port."""
+    sock = socks.socksocket()
+    sock.set_proxy(socks.SOCKS5, "127.0.0.1", socks_port, rdns=True)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(target)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+def _http_exchange(sock, method, path, upload_bytes=0):
+    """
+    Sends one HTTP/1.1 request on `sock` (with `upload_bytes` of body) and drains the response.
+    Returns the time.perf_counter() reading at which the first response byte arrived.
+    """
+    sock.sendall(f"{method} {path} HTTP/1.1\r\nHost: holocron-benchmark\r\n"
+                 f"Content-Length: {upload_bytes}\r\n\r\n".encode())
+    payload = memoryview(bytes(BENCHMARK_CHUNK_BYTES))
+    remaining = upload_bytes
+    while remaining > 0:
+        chunk = payload[:min(remaining, len(payload))]
+        sock.sendall(chunk)
+        remaining -= len(chunk)
+
+    head = b""
+    first_byte_at = None
+    while b"\r\n\r\n" not in head:
+        data = sock.recv(BENCHMARK_CHUNK_BYTES)
+        if not data:
+            raise ConnectionError("The benchmark server closed the connection mid-response.")
+        if first_byte_at is None:
+            first_byte_at = time.perf_counter()
+        head += data
+    head, _, body = head.partition(b"\r\n\r\n")
+    match = re.search(rb"content-length:\s*(\d+)", head, re.IGNORECASE)
+    remaining = (int(match.group(1)) if match else 0) - len(body)
+    buffer = bytearray(BENCHMARK_CHUNK_BYTES)
+    while remaining > 0:
+        received = sock.recv_into(buffer, min(remaining, len(buffer)))
+        if not received:
+            raise ConnectionError("The benchmark server closed the connection mid-response.")
+        remaining -= received
+    return first_byte_at
+
+def _percentiles(samples_ms):
+    """Summarizes latency samples (in milliseconds) with nearest-rank percentiles."""
+    if not samples_ms:
+        return None
+    ordered = sorted(samples_ms)
+    def rank(q):
+        return round(ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))], 2)
+    return {"count": len(ordered), "min_ms": round(ordered[0], 2), "p50_ms": rank(0.5),
+            "p90_ms": rank(0.9), "p99_ms": rank(0.99), "max_ms": round(ordered[-1], 2)}
+
+def _mbps(num_bytes, seconds):
+    return round(num_bytes * 8 / seconds / 1_000_000, 2) if seconds > 0 else None
+
+def _benchmark_latency(socks_port, echo_target, http_target, samples):
+    """Measures connect latency, echo round trips and time-to-first-byte, one fresh connection per sample."""
+    connect_ms, echo_rtt_ms, ttfb_ms = [], [], []
+    for _ in range(samples):
+        start = time.perf_counter()
+        with _benchmark_connect(socks_port, echo_target) as sock:
+            connect_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            sock.sendall(b"\x00")
+            if not sock.recv(1):
+                raise ConnectionError("The benchmark echo server closed the connection.")
+            echo_rtt_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        with _benchmark_connect(socks_port, http_target) as sock:
+            first_byte_at = _http_exchange(sock, "GET", "/download?bytes=0")
+        ttfb_ms.append((first_byte_at - start) * 1000)
+    return {"connect": _percentiles(connect_ms), "echo_rtt": _percentiles(echo_rtt_ms),
+            "time_to_first_byte": _percentiles(ttfb_ms)}
+
+def _benchmark_transfer(socks_port, http_target, direction, num_bytes):
+    """Moves `num_bytes` over one connection. Returns the seconds taken, excluding the connect."""
+    with _benchmark_connect(socks_port, http_target) as sock:
+        start = time.perf_counter()
+        if direction == "download":
+            _http_exchange(sock, "GET", f"/download?bytes={num_bytes}")
+        else:
+            _http_exchange(sock, "POST", "/upload", upload_bytes=num_bytes)
+        return time.perf_counter() - start
+
+def _benchmark_streams(socks_port, http_target, streams, transfer_bytes):
+    """Downloads `transfer_bytes` split across `streams` concurrent connections."""
+    per_stream = max(BENCHMARK_CHUNK_BYTES, transfer_bytes // streams)
+    failures = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams, thread_name_prefix="holocron-benchmark") as executor:
+        futures = [executor.submit(_benchmark_transfer, socks_port, http_target, "download", per_stream)
+                   for _ in range(streams)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                failures += 1
+                logging.debug(f"Benchmark stream failed: {e.__class__.__name__}: {e}")
+    elapsed = time.perf_counter() - start
+    completed = streams - failures
+    return {"streams": streams, "failed_streams": failures, "bytes": per_stream * completed,
+            "seconds": round(elapsed, 3), "mbps": _mbps(per_stream * completed, elapsed)}
+
+def run_tunnel_benchmark(socks_port, samples=BENCHMARK_DEFAULT_SAMPLES,
+                         transfer_bytes=BENCHMARK_DEFAULT_TRANSFER_BYTES, target_host="127.0.0.1"):
+    """Benchmarks the SOCKS proxy on `socks_port` against freshly started stand-in servers."""
+    bind_host = "127.0.0.1" if target_host in ("127.0.0.1", "localhost") else "0.0.0.0"
+    with _BenchmarkServers(bind_host) as servers:
+        echo_target = (target_host, servers.echo.server_address[1])
+        http_target = (target_host, servers.http.server_address[1])
+        result = {"socks_port": socks_port, "samples": samples, "transfer_bytes": transfer_bytes}
+        result["latency"] = _benchmark_latency(socks_port, echo_target, http_target, samples)
+        throughput = {}
+        for direction in ("download", "upload"):
+            seconds = _benchmark_transfer(socks_port, http_target, direction, transfer_bytes)
+            throughput[direction] = {"bytes": transfer_bytes, "seconds": round(seconds, 3),
+                                     "mbps": _mbps(transfer_bytes, seconds)}
+        result["throughput"] = throughput
+        result["concurrency"] = [_benchmark_streams(socks_port, http_target, streams, transfer_bytes)
+                                 for streams in BENCHMARK_STREAM_COUNTS]
+    return result
+
+def load_benchmark_results():
+    """Returns the stored benchmark results as identifier -> list of results, oldest first."""
+    with _benchmark_results_lock:
+        try:
+            return json.loads(BENCHMARK_RESULTS_FILE.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+def _store_benchmark_result(identifier, result):
+    """Appends a result, keeping the latest BENCHMARK_MAX_RESULTS_PER_TUNNEL per tunnel."""
+    with _benchmark_results_lock:
+        try:
+            results = json.loads(BENCHMARK_RESULTS_FILE.read_text())
+        except (FileNotFoundError, ValueError):
+            results = {}
+        history = results.get(identifier, []) + [result]
+        results[identifier] = history[-BENCHMARK_MAX_RESULTS_PER_TUNNEL:]
+        BENCHMARK_RESULTS_FILE.write_text(json.dumps(results))
+
+def benchmark_tunnel(config, samples=None, transfer_bytes=None, target_host=None):
+    """Benchmarks a running tunnel and stores the result for comparison with other tunnels."""
+    if not config:
+        return {"success": False, "message": "No configuration provided for the benchmark."}
+    try:
+        samples = min(BENCHMARK_MAX_SAMPLES, max(1, int(samples or BENCHMARK_DEFAULT_SAMPLES)))
+        transfer_bytes = min(BENCHMARK_MAX_TRANSFER_BYTES,
+                             max(BENCHMARK_CHUNK_BYTES, int(transfer_bytes or BENCHMARK_DEFAULT_TRANSFER_BYTES)))
+    except (TypeError, ValueError):
+        return {"success": False, "message": "The benchmark samples and transfer size must be numbers."}
+    identifier = config.get("sshCommandIdentifier") or config.get("id")
+    status = get_tunnel_status(config)
+    if not status.get("connected") or not status.get("socks_port"):
+        return {"success": False, "message": f"Tunnel '{identifier}' is not running with a SOCKS port."}
+    if not _benchmark_lock.acquire(blocking=False):
+        return {"success": False, "message": "Another benchmark is already running."}
+    try:
+        logging.info(f"Benchmarking tunnel '{identifier}' via SOCKS port {status['socks_port']}.")
+        result = run_tunnel_benchmark(status["socks_port"], samples, transfer_bytes, target_host or "127.0.0.1")
+    except Exception as e:
+        logging.warning(f"Benchmark of tunnel '{identifier}' failed: {e.__class__.__name__}: {e}")
+        return {"success": False, "message": f"Benchmark failed: {e.__class__.__name__}: {e}"}
+    finally:
+        _benchmark_lock.release()
+    result.update({"id": config.get("id"), "identifier": identifier, "name": config.get("name"),
+                   "type": config.get("type"), "timestamp": int(time.time())})
+    _store_benchmark_result(identifier, result)
+    return {"success": True, "result": result}
+
 def get_log_path_for_config(identifier, conn_type):
     """Determines the log file path for a given configuration."""
     if not identifier or not conn_type:
@@ -613,26 +3024,198 @@ def get_log_path_for_config(identifier, conn_type):
         # Fallback for unknown types
         return log_file
 
-def get_logs(identifier=None, conn_type=None):
-    """Reads the last part of the log file and returns it."""
+# Upper bound on the log bytes returned by one getLogs call, well under the 1 MB native messaging limit.
+LOG_TAIL_MAX_BYTES = 256 * 1024
+LOG_TAIL_WINDOW_BYTES = 20 * 1024
+
+
+def _log_file_token(stat_result):
+    """Identifies a log file independently of its name, so rotation and recreation can be detected."""
+    return f"{stat_result.st_dev}:{stat_result.st_ino}"
+
+def _read_log_bytes(path, offset, size, complete_lines):
+    """
+    Reads the bytes of `path` between `offset` and `size`, keeping at most LOG_TAIL_MAX_BYTES.
+    Returns (data, end_offset, skipped); `skipped` is True if older bytes were dropped to fit.
+    With `complete_lines`, a trailing partial line is held back until its newline is written.
+    """
+    start = max(offset, size - LOG_TAIL_MAX_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        raw = f.read(max(0, size - start))
+    end_offset = start + len(raw)
+    skipped = start > offset
+    data = raw[raw.find(b"\n") + 1:] if skipped else raw  # Resume at a line boundary.
+    if complete_lines and data and not data.endswith(b"\n"):
+        cut = data.rfind(b"\n") + 1
+        if cut > 0 or len(raw) < LOG_TAIL_MAX_BYTES:
+            end_offset -= len(data) - cut
+            data = data[:cut]
+    return data, end_offset, skipped
+
+def _tail_log(log_path, offset, token):
+    """
+    Returns the log bytes written after `offset` in the file identified by `token`.
+
+    If the file was rotated by RotatingFileHandler (renamed to "<name>.1"), the rest of
+    the old file is returned first, followed by the new file. `truncated` is True when the
+    content does not continue from `offset` (the file was truncated or replaced, or more
+    than LOG_TAIL_MAX_BYTES were written), in which case the caller should discard what it
+    has instead of appending.
+    """
+    try:
+        st = log_path.stat()
+    except FileNotFoundError:
+        return {"success": True, "log_content": "", "next_offset": 0, "token": None, "truncated": bool(offset)}
+
+    current_token = _log_file_token(st)
+    truncated = False
+    rotated_data = b""
+    if token and token != current_token:
+        rotated_path = log_path.with_name(log_path.name + ".1")
+        try:
+            rotated_st = rotated_path.stat()
+        except FileNotFoundError:
+            rotated_st = None
+        if rotated_st and _log_file_token(rotated_st) == token and offset <= rotated_st.st_size:
+            rotated_data, _, truncated = _read_log_bytes(rotated_path, offset, rotated_st.st_size, complete_lines=False)
+        else:
+            truncated = True
+        offset = 0
+    elif offset > st.st_size:
+        # Truncated in place, e.g. by clearLogs.
+        truncated = True
+        offset = 0
+
+    data, next_offset, skipped = _read_log_bytes(log_path, offset, st.st_size, complete_lines=True)
+    content = rotated_data + data
+    if skipped or len(content) > LOG_TAIL_MAX_BYTES:
+        content = content[-LOG_TAIL_MAX_BYTES:]
+        truncated = True
+    return {
+        "success": True,
+        "log_content": content.decode("utf-8", errors="ignore"),
+        "next_offset": next_offset,
+        "token": current_token,
+        "truncated": truncated,
+    }
+
+def get_logs(identifier=None, conn_type=None, offset=None, token=None):
+    """
+    Reads a log file and returns it.
+
+    Without an offset, returns the whole per-tunnel log, or the last 20 KB of the main log.
+    With an offset and token from a previous call, returns only what was written since
+    (see _tail_log). Both forms return `next_offset` and `token` for the next call.
+    """
     log_to_read = get_log_path_for_config(identifier, conn_type)
     try:
+        if offset is not None:
+            return _tail_log(log_to_read, max(0, int(offset)), token)
         if not log_to_read.is_file():
             if identifier:
                 return {"success": True, "log_content": "Waiting for log output..."}
             return {"success": True, "log_content": "Log file does not exist yet."}
-        file_size = log_to_read.stat().st_size
-        read_size = file_size if identifier else min(file_size, 20 * 1024)
-        with open(log_to_read, 'r', encoding='utf-8', errors='ignore') as f:
-            if file_size > read_size and not identifier:
-                f.seek(file_size - read_size)
+        st = log_to_read.stat()
+        read_size = st.st_size if identifier else min(st.st_size, LOG_TAIL_WINDOW_BYTES)
+        with open(log_to_read, 'rb') as f:
+            f.seek(st.st_size - read_size)
+            if st.st_size > read_size:
                 f.readline()
-            content = f.read()
-        return {"success": True, "log_content": content}
+            content = f.read(read_size)
+            next_offset = f.tell()
+        return {
+            "success": True,
+            "log_content": content.decode("utf-8", errors="ignore"),
+            "next_offset": next_offset,
+            "token": _log_file_token(st),
+            "truncated": True,
+        }
     except Exception as e:
         logging.error(f"Error reading log file {log_to_read}: {e}", exc_info=True)
         return {"success": False, "message": f"Error reading log file {log_to_read}: {e}"}
 
+# --- Log Streams ---
+# Instead of polling getLogs, the extension can subscribe to a log. The host then tails the
+# file on its own thread, woken by kernel file events (with a timed re-check that catches
+# rotation), and pushes what was written as "logData" events. After each push it waits
+# LOG_STREAM_MIN_INTERVAL_SECONDS, so a burst of writes goes out as one coalesced delta.
+LOG_STREAM_EVENT = "logData"
+LOG_STREAM_MIN_INTERVAL_SECONDS = 0.2
+LOG_STREAM_RECHECK_SECONDS = 1.0
+LOG_STREAM_MAX_SUBSCRIPTIONS = 16
+_log_streams = {}  # subscription ID -> threading.Event that stops the stream
+_log_streams_lock = threading.Lock()
+
+def _stream_log(subscription_id, log_path, offset, token, stop_event, reply_sent=None):
+    """
+    Pushes what is written to `log_path` after `offset` until `stop_event` is set. Nothing is
+    pushed before `reply_sent` is set, so no delta overtakes the subscription's snapshot.
+    """
+    waiter = None
+    watched_token = None
+    try:
+        if reply_sent is not None:
+            reply_sent.wait()
+        while not stop_event.is_set():
+            delta = _tail_log(log_path, offset, token)
+            if delta["log_content"] or delta["truncated"] or delta["token"] != token:
+                delta.pop("success")
+                push_event(LOG_STREAM_EVENT, subscriptionId=subscription_id, **delta)
+                offset, token = delta["next_offset"], delta["token"]
+                stop_event.wait(LOG_STREAM_MIN_INTERVAL_SECONDS)
+                continue
+            if waiter is None or watched_token != token:
+                # The file is new (or was replaced): watch it, then re-read what was written meanwhile.
+                if waiter:
+                    waiter.close()
+                waiter = _TunnelEventWaiter(None, log_path)
+                watched_token = token
+                continue
+            waiter.wait(LOG_STREAM_RECHECK_SECONDS)
+    except Exception as e:
+        logging.error(f"Log stream {subscription_id} for {log_path} failed: {e}", exc_info=True)
+    finally:
+        if waiter:
+            waiter.close()
+        with _log_streams_lock:
+            if _log_streams.get(subscription_id) is stop_event:
+                del _log_streams[subscription_id]
+
+def subscribe_logs(subscription_id, identifier=None, conn_type=None, offset=None, token=None, reply_sent=None):
+    """
+    Starts pushing a log to the extension as it is written. Returns the same response as
+    get_logs() for the content so far; the stream continues from there once `reply_sent`
+    is set, i.e. after that response has been written.
+    """
+    if not subscription_id:
+        return {"success": False, "message": "A subscription ID is required."}
+    with _log_streams_lock:
+        if subscription_id not in _log_streams and len(_log_streams) >= LOG_STREAM_MAX_SUBSCRIPTIONS:
+            return {"success": False, "message": f"Too many log subscriptions (at most {LOG_STREAM_MAX_SUBSCRIPTIONS})."}
+    response = get_logs(identifier, conn_type, offset, token)
+    if not response.get("success"):
+        return response
+    stop_event = threading.Event()
+    with _log_streams_lock:
+        previous = _log_streams.get(subscription_id)
+        _log_streams[subscription_id] = stop_event
+    if previous:
+        previous.set()
+    threading.Thread(target=_stream_log, name=f"holocron-log-stream-{subscription_id}", daemon=True,
+                     args=(subscription_id, get_log_path_for_config(identifier, conn_type),
+                           response.get("next_offset", 0), response.get("token"), stop_event, reply_sent)).start()
+    logging.debug(f"Log subscription {subscription_id} started for '{identifier or 'native host'}'.")
+    return response
+
+def unsubscribe_logs(subscription_id):
+    """Stops a log subscription. Unknown IDs are ignored, so unsubscribing twice is harmless."""
+    with _log_streams_lock:
+        stop_event = _log_streams.pop(subscription_id, None)
+    if stop_event:
+        stop_event.set()
+        logging.debug(f"Log subscription {subscription_id} stopped.")
+
 def clear_logs():
     """Clears the content of the log file."""
     try:
@@ -691,8 +3274,9 @@ def handle_test_connection(message):
         return {"success": False, "message": "Tunnel is active but has no SOCKS proxy (-D rule) configured for testing."}
 
     logging.info(f"Test Connection: Performing checks for '{config.get('name')}' via SOCKS port {socks_port}.")
-    web_latency, web_status, web_error = perform_web_check(url=web_check_url, socks_port=socks_port)
-    tcp_latency, tcp_error = perform_tcp_ping(host=ping_host, socks_port=socks_port)
+    probes = run_probes(ping_host, socks_port=socks_port, web_check_url=web_check_url)
+    web_latency, web_status, web_error = probes["web_check_latency_ms"], probes["web_check_status"], probes["web_check_error"]
+    tcp_latency, tcp_error = probes["tcp_ping_ms"], probes["tcp_ping_error"]
     
     # 4. Stop the tunnel if we started it for the test.
     if not tunnel_was_running:
@@ -705,56 +3289,219 @@ def handle_test_connection(message):
     if tunnel_was_running:
         final_message = f"(Tunnel was already running) {final_message}"
 
-    return {"success": is_overall_success, "connected": True, "web_check_latency_ms": web_latency, "web_check_status": web_status or web_error, "tcp_ping_ms": tcp_latency, "tcp_ping_error": tcp_error, "message": final_message}
+    return {"success": is_overall_success, "connected": True, "web_check_latency_ms": web_latency, "web_check_status": web_status or web_error, "tcp_ping_ms": tcp_latency, "tcp_ping_error": tcp_error, "probe_timings": probes["probe_timings"], "message": final_message}
+
+AFTER_SEND_KEY = "_after_send"  # See process_message().
+
+def handle_message(message):
+    """Dispatches a single request to its command handler and returns the response."""
+    command = message.get("command")
+    response = {}
+
+    missing_config_ids = resolve_message_configs(message)
+    if missing_config_ids:
+        return {"success": False, "needsConfig": True, "configIds": missing_config_ids,
+                "message": f"Config version not registered: {', '.join(map(str, missing_config_ids))}"}
+
+    if command == "registerConfigs":
+        response = {"success": True, "registered": register_configs(message.get("configs"))}
+    elif command == "startTunnel":
+        response = execute_tunnel_command("start", message.get("config"))
+        if response.get("success") and message.get("supervise"):
+            supervise_tunnel(message.get("config"), message.get("healthCheckIntervalSeconds"))
+    elif command == "stopTunnel":
+        # Stop supervising first, so the supervisor does not restart the tunnel being stopped.
+        unsupervise_tunnel(message.get("config"))
+        response = execute_tunnel_command("stop", message.get("config"))
+    elif command == "startLoadBalancing":
+        configs = message.get("configs") or []
+        if not configs:
+            response = {"success": False, "message": "No tunnels were given to balance."}
+        else:
+            ranking = start_tunnel_ranking(configs, message.get("pingHost", "youtube.com"),
+                                           message.get("webCheckUrl") or "", message.get("intervalSeconds"))
+            response = {"success": True, "ranking": ranking}
+    elif command == "benchmarkTunnel":
+        response = benchmark_tunnel(message.get("config"), message.get("samples"),
+                                    message.get("transferBytes"), message.get("targetHost"))
+    elif command == "getBenchmarks":
+        results = load_benchmark_results()
+        identifier = message.get("identifier")
+        response = {"success": True, "results": {identifier: results.get(identifier, [])} if identifier else results}
+    elif command == "stopLoadBalancing":
+        stop_tunnel_ranking()
+        response = {"success": True, "message": "Load balancing stopped."}
+    elif command == "getStatus":
+        config = message.get("config")
+        status = get_tunnel_status(config)
+        response = status
+        supervisor = get_supervisor_state(config)
+        if supervisor:
+            response["supervisor"] = supervisor
+        ping_host = message.get("pingHost", "youtube.com")
+        if status["connected"] and status.get("socks_port"):
+            response.update(run_probes(ping_host, socks_port=status["socks_port"], web_check_url=message.get("webCheckUrl") or ""))
+        else:
+            response.update(run_probes(ping_host, socks_port=None))
+    elif command == "getStatusAll":
+        response = get_all_tunnel_statuses(message.get("configs"), message.get("pingHost", "youtube.com"),
+                                           message.get("webCheckUrl"))
+    elif command == "testConnection":
+        # Hold the tunnel lock for the whole start/test/stop cycle.
+        with get_tunnel_lock(message.get("config")):
+            response = handle_test_connection(message)
+    elif command == "getLogs":
+        identifier = message.get("identifier")
+        conn_type = message.get("conn_type")
+        response = get_logs(identifier=identifier, conn_type=conn_type,
+                            offset=message.get("offset"), token=message.get("token"))
+    elif command == "subscribeLogs":
+        reply_sent = threading.Event()
+        response = subscribe_logs(message.get("subscriptionId"), message.get("identifier"),
+                                  message.get("conn_type"), message.get("offset"), message.get("token"),
+                                  reply_sent)
+        response[AFTER_SEND_KEY] = reply_sent.set
+    elif command == "unsubscribeLogs":
+        unsubscribe_logs(message.get("subscriptionId"))
+        response = {"success": True, "message": "Unsubscribed."}
+    elif command == "clearLogs":
+        response = clear_logs()
+    elif command == "getMetrics":
+        response = {"success": True, "metrics": get_metrics(), "textfile": METRICS_TEXTFILE}
+    else:
+        logging.warning(f"Unknown command received: {command}")
+        # The session stays open, so always answer to avoid a pending request on the extension side.
+        response = {"success": False, "message": f"Unknown command: {command}"}
+    return response
+
+def process_message(message):
+    """
+    Handles one request on a worker thread and writes its response.
+    Responses are tagged with the request's 'requestId' because they can be
+    written in a different order than the requests arrived. A response may carry a
+    callable under AFTER_SEND_KEY, which is removed and called once it was written.
+    """
+    request_id = message.get("requestId")
+    command = str(message.get("command"))
+    try:
+        with timed("command", command):
+            response = handle_message(message)
+        if response.get("success") is False:
+            record_failure(command, "UnsuccessfulResponse")
+    except Exception as e:
+        logging.error(f"An unhandled exception occurred while handling '{message.get('command')}': {e}", exc_info=True)
+        # Send an error response, so the extension isn't left hanging
+        response = {"success": False, "message": f"A critical error occurred in the native host: {e}"}
+
+    after_send = response.pop(AFTER_SEND_KEY, None)
+    if request_id is not None:
+        response["requestId"] = request_id
+    if logger.isEnabledFor(logging.DEBUG):
+        logging.debug("Sending response: %s", response)
+    try:
+        send_message(response)
+    except (OSError, ValueError) as e:
+        # The extension may have closed the port while this request was running.
+        logging.warning(f"Could not send response for '{message.get('command')}': {e}")
+    finally:
+        if after_send:
+            after_send()
+
+def _exit_on_signal(signum, frame):
+    """Turns a termination signal into SystemExit, so atexit handlers still run."""
+    logging.info(f"Received signal {signum}; exiting.")
+    raise SystemExit(128 + signum)
 
 def main():
-    """Main loop to read commands and send status."""
-    while True:
-        try:
-            message = read_message()
-            # --- Key Change 5: Demote frequent, routine messages to DEBUG ---
-            logging.debug(f"Received message: {message}")
-            command = message.get("command")
-            response = {}
-
-            if command == "startTunnel":
-                response = execute_tunnel_command("start", message.get("config"))
-            elif command == "stopTunnel":
-                response = execute_tunnel_command("stop", message.get("config"))
-            elif command == "getStatus":
-                config = message.get("config")
-                status = get_tunnel_status(config)
-                response = status
-                if status["connected"] and status.get("socks_port"):
-                    web_latency, web_status, _ = perform_web_check(url=message.get("webCheckUrl"), socks_port=status["socks_port"])
-                    tcp_latency, _ = perform_tcp_ping(host=message.get("pingHost", "youtube.com"), socks_port=status["socks_port"])
-                    response.update({"web_check_latency_ms": web_latency, "web_check_status": web_status, "tcp_ping_ms": tcp_latency})
-                else:
-                    tcp_latency, _ = perform_tcp_ping(host=message.get("pingHost", "youtube.com"), socks_port=None)
-                    response.update({"web_check_latency_ms": -1, "web_check_status": "N/A (Tunnel Down)", "tcp_ping_ms": tcp_latency})
-            elif command == "testConnection":
-                response = handle_test_connection(message)
-            elif command == "getLogs":
-                identifier = message.get("identifier")
-                conn_type = message.get("conn_type")
-                response = get_logs(identifier=identifier, conn_type=conn_type)
-            elif command == "clearLogs":
-                response = clear_logs()
-            else:
-                logging.warning(f"Unknown command received: {command}")
+    """
+    Main loop to read commands and dispatch them.
+    The extension keeps a single native messaging port open for its lifetime, so this
+    loop serves every request of the session. Requests run on a worker pool so that a
+    slow command (e.g. a tunnel start) does not block status or log requests behind it.
+    The loop ends when the extension closes the port (EOF on stdin); in-flight requests
+    are allowed to finish so that no tunnel is left half-started.
+    """
+    logging.debug(f"Native host session started (PID {os.getpid()}).")
+    # Chrome sends SIGTERM to a host that lingers after the port closed. Exiting through
+    # SystemExit runs the atexit handlers, so parked SSH masters are closed.
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    threading.Thread(target=reap_idle_ssh_masters, name="holocron-ssh-reaper", daemon=True).start()
+    if METRICS_TEXTFILE:
+        threading.Thread(target=_run_metrics_textfile_writer, args=(METRICS_TEXTFILE,),
+                         name="holocron-metrics", daemon=True).start()
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="holocron-worker") as executor:
+        while True:
+            try:
+                message = read_message()
+                # --- Key Change 5: Demote frequent, routine messages to DEBUG ---
+                # Formatting a message is skipped unless debug logging is on, and config
+                # secrets are never logged.
+                if logger.isEnabledFor(logging.DEBUG):
+                    logging.debug("Received message: %s", redact_message(message))
+                executor.submit(process_message, message)
+            except Exception as e:
+                logging.error(f"An unhandled exception occurred in the main loop: {e}", exc_info=True)
+                # Send an error response if possible, so the extension isn't left hanging
+                try:
+                    send_message({"success": False, "message": f"A critical error occurred in the native host: {e}"})
+                except:
+                    pass # If sending fails, just continue
                 continue
 
-            logging.debug(f"Sending response: {response}")
-            send_message(response)
+# --- Startup Profile ---
+# `--startup-profile` reports where a cold start spends its time: interpreter startup,
+# loading this module, and the first responses to cheap commands, including which lazy
+# modules each of them pulled in. Run it through the launcher to profile the installed host.
+STARTUP_PROFILE_COMMANDS = (
+    {"command": "getLogs"},
+    {"command": "getBenchmarks"},
+    {"command": "registerConfigs", "configs": []},
+)
+
+def _loaded_lazy_modules():
+    return sorted(name for name, module in LAZY_MODULES.items() if module.is_loaded)
+
+def run_startup_profile(module_loaded_at):
+    """Measures the host's startup and returns the timings in milliseconds."""
+    loaded_at_startup = _loaded_lazy_modules()
+    responses = []
+    for message in STARTUP_PROFILE_COMMANDS:
+        loaded_before = set(_loaded_lazy_modules())
+        start_time = time.perf_counter()
+        json.dumps(handle_message(dict(message)))
+        responses.append({"command": message["command"], "ms": round((time.perf_counter() - start_time) * 1000, 2),
+                          "lazy_imports": sorted(set(_loaded_lazy_modules()) - loaded_before)})
+    # Deferred imports, as the first command that needs each one pays for it.
+    import_ms = {}
+    for name, module in LAZY_MODULES.items():
+        if not module.is_loaded:
+            start_time = time.perf_counter()
+            module.__name__
+            import_ms[name] = round((time.perf_counter() - start_time) * 1000, 2)
+    # The process start time is only known to the second on some systems, so this is an estimate.
+    interpreter_ms = (time.time() - (time.perf_counter() - _module_load_started) - psutil.Process().create_time()) * 1000
+    return {
+        "python": sys.version.split()[0],
+        "zipapp": HOST_PATH != Path(__file__).resolve(),
+        "interpreter_startup_ms": round(max(interpreter_ms, 0), 2),
+        "module_load_ms": round((module_loaded_at - _module_load_started) * 1000, 2),
+        "lazy_modules_loaded_at_startup": loaded_at_startup,
+        "first_responses": responses,
+        "deferred_import_ms": import_ms,
+    }
+
+def cli(argv=None):
+    """Entry point of the script and of the zipapp built by install.sh."""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) > 1 and argv[0] == "--benchmark":
+        # For CI: benchmark the SOCKS proxy on the given port and print the result.
+        print(json.dumps(run_tunnel_benchmark(int(argv[1])), indent=2))
+    elif argv and argv[0] == "--startup-profile":
+        print(json.dumps(run_startup_profile(_module_loaded_at), indent=2))
+    else:
+        main()
 
-        except Exception as e:
-            logging.error(f"An unhandled exception occurred in the main loop: {e}", exc_info=True)
-            # Send an error response if possible, so the extension isn't left hanging
-            try:
-                send_message({"success": False, "message": f"A critical error occurred in the native host: {e}"})
-            except:
-                pass # If sending fails, just continue
-            continue
+_module_loaded_at = time.perf_counter()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    cli()
@@ -11,8 +11,12 @@
 # Path to the Python executable. This will be replaced by the install script.
 PYTHON_EXEC="/Users/majidsoorani/chrome_holocron/.venv/bin/python"
 
-# Path to the Python native host script. This will be replaced by the install script.
+# Path to the Python native host script, or the zipapp that install.sh packages it into.
+# This will be replaced by the install script.
 SCRIPT_PATH="/Users/majidsoorani/chrome_holocron/backends/python/holocron_native_host.py"
 
+# Uncomment to have the native host write its metrics for node_exporter's textfile collector.
+# export HOLOCRON_METRICS_TEXTFILE="/var/lib/node_exporter/textfile_collector/holocron.prom"
+
 # Execute the script with the specified Python interpreter, passing along all arguments.
 exec "$PYTHON_EXEC" "$SCRIPT_PATH" "$@"
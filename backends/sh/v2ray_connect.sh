@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # --- Configuration ---
-SOCKS_PORT="10808" # Default SOCKS port
+SOCKS_PORT="10808" # Default SOCKS port, overridden by --socks-port
 
 # --- Helper Functions ---
 log() {
@@ -38,33 +38,15 @@ find_xray_executable() {
 
 cleanup() {
     log "Cleaning up temporary files..."
-    rm -f "$CONFIG_FILE" "$LOCK_FILE"
-}
-
-# --- Command Functions ---
-start_tunnel() {
-    local XRAY_EXEC
-    XRAY_EXEC=$(find_xray_executable)
-    if [ -z "$XRAY_EXEC" ]; then
-        local error_msg="Error: 'xray' executable not found. Please install Xray-core and ensure it's in your PATH or a standard location (e.g., /opt/homebrew/bin)."
-        echo "$error_msg"
-        log "$error_msg"
-        exit 1
-    fi
-
-    if [ -f "$LOCK_FILE" ]; then
-        pid=$(cat "$LOCK_FILE")
-        if ps -p "$pid" > /dev/null; then
-            echo "V2Ray tunnel is already running with PID $pid."
-            log "Start command issued, but tunnel already running with PID $pid."
-            exit 3 # Special exit code for "already running"
-        else
-            log "Found stale lock file for PID $pid. Cleaning up."
-            cleanup
-        fi
+    if [ "$KEEP_CONFIG" != true ]; then
+        rm -f "$CONFIG_FILE"
     fi
+    rm -f "$LOCK_FILE"
+}
 
-    log "--- Starting V2Ray Tunnel ---"
+# Parses a VLESS URL and writes the Xray config. Used when the script is run by hand;
+# the native host generates the config itself and passes it with --config.
+generate_config_from_url() {
     log "Received URL: $V2RAY_URL"
 
     # --- Parse VLESS URL ---
@@ -127,18 +109,6 @@ start_tunnel() {
     # --- Generate Xray JSON Config ---
     log "Generating Xray config file at $CONFIG_FILE"
 
-    # ... (rest of the script has a larger change, see below)
-
-    # Basic validation
-    if [ -z "$UUID" ] || [ -z "$DOMAIN" ] || [ -z "$PORT" ]; then
-        echo "Error: Failed to parse required fields (UUID, domain, port) from URL."
-        log "Error: Failed to parse required fields from URL."
-        exit 1
-    fi
-
-    # --- Generate Xray JSON Config ---
-    log "Generating Xray config file at $CONFIG_FILE"
-
     # Basic validation
     if [ -z "$UUID" ] || [ -z "$DOMAIN" ] || [ -z "$PORT" ]; then
         echo "Error: Failed to parse required fields (UUID, domain, port) from URL."
@@ -238,7 +208,46 @@ EOF
 }
 EOL
 
-    log "Config file generated. Starting Xray..."
+    log "Config file generated."
+}
+
+# --- Command Functions ---
+start_tunnel() {
+    local XRAY_EXEC
+    XRAY_EXEC=$(find_xray_executable)
+    if [ -z "$XRAY_EXEC" ]; then
+        local error_msg="Error: 'xray' executable not found. Please install Xray-core and ensure it's in your PATH or a standard location (e.g., /opt/homebrew/bin)."
+        echo "$error_msg"
+        log "$error_msg"
+        exit 1
+    fi
+
+    if [ -f "$LOCK_FILE" ]; then
+        pid=$(cat "$LOCK_FILE")
+        if ps -p "$pid" > /dev/null; then
+            echo "V2Ray tunnel is already running with PID $pid."
+            log "Start command issued, but tunnel already running with PID $pid."
+            exit 3 # Special exit code for "already running"
+        else
+            log "Found stale lock file for PID $pid. Cleaning up."
+            cleanup
+        fi
+    fi
+
+    log "--- Starting V2Ray Tunnel ---"
+    if [ "$KEEP_CONFIG" = true ]; then
+        # The native host parses the URL and generates (and caches) the config itself.
+        if [ ! -f "$CONFIG_FILE" ]; then
+            echo "Error: Config file not found: $CONFIG_FILE"
+            log "Error: Config file not found: $CONFIG_FILE"
+            exit 1
+        fi
+        log "Using pre-generated config file $CONFIG_FILE"
+    else
+        generate_config_from_url
+    fi
+
+    log "Starting Xray..."
     nohup "$XRAY_EXEC" -config "$CONFIG_FILE" > "$LOG_FILE" 2>&1 &
     pid=$!
 
@@ -252,6 +261,13 @@ EOL
     echo "$pid" > "$LOCK_FILE"
     log "Xray process started with PID $pid."
 
+    if [ "$NO_WAIT" = true ]; then
+        # The caller (the native host) waits for the SOCKS port itself.
+        echo "V2Ray tunnel process started with PID $pid."
+        log "Start script finished without waiting for readiness."
+        return 0
+    fi
+
     # Wait up to 5 seconds for the process to confirm it's running by checking the log file.
     # This is more reliable than a fixed sleep duration.
     local success=false
@@ -319,7 +335,7 @@ stop_tunnel() {
 
 # --- Main Script Logic ---
 if [ "$#" -eq 0 ]; then
-    echo "Usage: $0 {start|stop} --identifier <id> [--url <url>]"
+    echo "Usage: $0 {start|stop} --identifier <id> [--url <url> [--socks-port <port>] | --config <file>]"
     exit 1
 fi
 
@@ -337,6 +353,18 @@ while [ "$#" -gt 0 ]; do
             V2RAY_URL="$2"
             shift 2
             ;;
+        --config)
+            CONFIG_OVERRIDE="$2"
+            shift 2
+            ;;
+        --socks-port)
+            SOCKS_PORT="$2"
+            shift 2
+            ;;
+        --no-wait)
+            NO_WAIT=true
+            shift
+            ;;
         *)
             echo "Unknown option: $1"
             exit 1
@@ -353,12 +381,16 @@ fi
 LOCK_FILE="/tmp/holocron_v2ray_${IDENTIFIER}.lock"
 LOG_FILE="/tmp/holocron_v2ray_${IDENTIFIER}.log"
 CONFIG_FILE="/tmp/holocron_v2ray_config_${IDENTIFIER}.json"
+if [ -n "$CONFIG_OVERRIDE" ]; then
+    CONFIG_FILE="$CONFIG_OVERRIDE"
+    KEEP_CONFIG=true
+fi
 
 # Execute command
 case "$COMMAND" in
     start)
-        if [ -z "$V2RAY_URL" ]; then
-            echo "Error: --url is required for the start command."
+        if [ -z "$V2RAY_URL" ] && [ -z "$CONFIG_OVERRIDE" ]; then
+            echo "Error: --url or --config is required for the start command."
             exit 1
         fi
         start_tunnel
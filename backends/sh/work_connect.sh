@@ -57,6 +57,7 @@ start_tunnels() {
     local identifier=""
     local work_ssids=()
     local remote_command=""
+    local no_wait=false
 
     while (( "$#" )); do
       case "$1" in
@@ -80,6 +81,10 @@ start_tunnels() {
           work_ssids+=("$2")
           shift 2
           ;;
+        --no-wait) # The caller (the native host) waits for readiness itself.
+          no_wait=true
+          shift
+          ;;
         -L|-D|-R)
           forwards+=("$1" "$2")
           if [ "$1" == "-D" ]; then
@@ -153,12 +158,15 @@ start_tunnels() {
         -o "ExitOnForwardFailure=yes"
     )
 
-    # Use a unique ControlPath to tag the SSH process with the identifier.
-    # This is a standard SSH option, and since ControlMaster is 'no' by default,
-    # it won't create a socket but will appear in the process's command line,
-    # allowing the native host to find it reliably.
+    # Run the tunnel as a ControlMaster on a per-identifier socket. The native host adds
+    # and removes forwards on it with 'ssh -O forward/cancel' and checks it with
+    # 'ssh -O check', so reconnects reuse the authenticated connection. The ControlPath
+    # also appears in the process's command line, which identifies the tunnel's process.
     if [ -n "$identifier" ]; then
-        final_ssh_args+=(-o "ControlPath=/tmp/holocron.ssh.socket.$identifier")
+        local control_path="/tmp/holocron.ssh.socket.$identifier"
+        # No master is running (checked above), so a leftover socket is stale.
+        rm -f "$control_path"
+        final_ssh_args+=(-o "ControlMaster=yes" -o "ControlPath=$control_path" -o "ControlPersist=no")
     fi
 
     # If no remote command is specified, use -N to prevent shell allocation.
@@ -191,6 +199,10 @@ start_tunnels() {
         echo "✅ Tunnel process started with PID $SSH_PID (no SOCKS port to check)."
         return 0
     fi
+    if $no_wait; then
+        echo "✅ Tunnel process started with PID $SSH_PID."
+        return 0
+    fi
 
     echo "⏳ Waiting for SOCKS proxy on port $socks_port to become available..."
     for i in {1..10}; do # Wait for up to 10 seconds
@@ -1,7 +1,20 @@
 // This is a background service worker for the extension.
 
-import { COMMANDS, STORAGE_KEYS } from './constants.js';
-import { IRAN_IP_RANGES_NETMASK } from './iran_ip_ranges.js';
+import { COMMANDS, STORAGE_KEYS, NATIVE_HOST_EVENTS, LOG_STREAM_PORT_NAME } from './constants.js';
+import { IRAN_IP_RANGES_CIDR } from './iran_ip_ranges.js';
+import {
+  compileIpRanges, compileDomainPatterns,
+  buildPacHelpers, buildGeoIpDeclarations, buildDomainDeclarations, hashPacInputs
+} from './pac_builder.js';
+import {
+  isValidGeoRecord, packGeoIp, unpackGeoIp, packGeoSite, unpackGeoSite, diffGeoEntries, geoIpEntries
+} from './geo_database.js';
+import {
+  createLatencySeries, recordLatencySample, serializeLatencySeries, deserializeLatencySeries
+} from './latency_history.js';
+import {
+  createTrafficStore, recordTrafficSample, serializeTrafficStore, deserializeTrafficStore
+} from './traffic_history.js';
 
 const NATIVE_HOST_NAME = 'com.holocron.native_host';
 
@@ -13,6 +26,7 @@ const GEOIP_UPDATE_COOLDOWN_HOURS = 24;
 
 // --- State Variables ---
 let isUpdateInProgress = false; // A flag to prevent concurrent updates.
+let isUpdateQueued = false; // Set when an update is requested while one is running.
 let lastReconnectAttemptTimestamp = 0; // For throttling auto-reconnect attempts.
 const RECONNECT_COOLDOWN_MS = 10000; // 10 seconds
 
@@ -131,88 +145,218 @@ function setActionIcon(status) {
 }
 
 /**
- * Converts a CIDR string to an [IP, Netmask] pair for use with isInNet().
- * @param {string} cidr The CIDR string (e.g., "192.168.1.0/24").
- * @returns {Array<string>|null} An array [ip, netmask] or null if invalid.
- */
-function cidrToIpNetmask(cidr) {
-  try {
-    const [ip, prefixStr] = cidr.split('/');
-    const prefix = parseInt(prefixStr, 10);
-    if (isNaN(prefix) || prefix < 0 || prefix > 32) {
-      return null;
-    }
-    let mask = [];
-    for (let i = 0; i < 4; i++) {
-      let n = Math.min(prefix - (i * 8), 8);
-      n = Math.max(n, 0);
-      mask.push(256 - Math.pow(2, 8 - n));
-    }
-    const netmask = mask.join('.');
-    // Basic validation for the IP part
-    if (ip.split('.').length !== 4) return null;
-    return [ip, netmask];
-  } catch (e) {
-    return null;
-  }
-}
-
-/**
- * Fetches the latest GeoIP database for Iran, processes it, and stores it.
+ * Fetches a GeoIP or GeoSite list and stores it packed (see geo_database.js).
+ * The request is conditional on the stored ETag, so an unchanged list is not downloaded
+ * again, and a changed list is diffed against the stored one to log what the update did.
  * Includes a cooldown mechanism to avoid fetching too frequently.
+ * @param {object} database The name, URL, storage keys, packer and entry lister of the database.
  * @param {boolean} force - If true, ignores the cooldown and forces an update.
  */
-async function updateGeoIpDatabase(force = false) {
-  const { [STORAGE_KEYS.GEOIP_LAST_UPDATE]: lastUpdate } = await chrome.storage.local.get(STORAGE_KEYS.GEOIP_LAST_UPDATE);
+async function updateGeoDatabase({ name, url, databaseKey, lastUpdateKey, pack, listEntries }, force) {
+  const {
+    [lastUpdateKey]: lastUpdate,
+    [databaseKey]: stored
+  } = await chrome.storage.local.get([lastUpdateKey, databaseKey]);
   const now = Date.now();
 
   if (!force && lastUpdate && (now - lastUpdate < GEOIP_UPDATE_COOLDOWN_HOURS * 60 * 60 * 1000)) {
-    console.log(`GeoIP database update skipped. Last update was less than ${GEOIP_UPDATE_COOLDOWN_HOURS} hours ago.`);
+    console.log(`${name} database update skipped. Last update was less than ${GEOIP_UPDATE_COOLDOWN_HOURS} hours ago.`);
     return;
   }
 
-  console.log("Fetching updated GeoIP database for Iran from:", GEOIP_URL);
+  console.log(`Fetching updated ${name} database for Iran from:`, url);
   try {
-    const response = await fetch(GEOIP_URL, { cache: 'no-store' });
+    const storedIsValid = await isValidGeoRecord(stored);
+    const headers = storedIsValid && stored.etag ? { 'If-None-Match': stored.etag } : {};
+    const response = await fetch(url, { cache: 'no-store', headers });
+    if (response.status === 304) {
+      await chrome.storage.local.set({ [lastUpdateKey]: now });
+      console.log(`${name} database is unchanged (revision ${stored.revision}).`);
+      return;
+    }
     if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
 
-    const text = await response.text();
-    const cidrList = text.split('\n').map(line => line.trim()).filter(Boolean);
-    const ranges = cidrList.map(cidrToIpNetmask).filter(Boolean);
-
-    await chrome.storage.local.set({ [STORAGE_KEYS.GEOIP_RANGES]: ranges, [STORAGE_KEYS.GEOIP_LAST_UPDATE]: now });
-    console.log(`Successfully updated and cached GeoIP database with ${ranges.length} ranges.`);
+    const record = await pack((await response.text()).split('\n'));
+    record.etag = response.headers.get('ETag');
+    if (storedIsValid && stored.checksum === record.checksum) {
+      record.revision = stored.revision;
+      console.log(`${name} database is unchanged (revision ${record.revision}).`);
+    } else {
+      record.revision = storedIsValid ? stored.revision + 1 : 1;
+      const { added, removed } = diffGeoEntries(storedIsValid ? listEntries(stored) : [], listEntries(record));
+      console.log(`Updated ${name} database to revision ${record.revision} with ${record.count} entries (+${added}, -${removed}).`);
+    }
+    await chrome.storage.local.set({ [databaseKey]: record, [lastUpdateKey]: now });
   } catch (error) {
-    console.error("Failed to update GeoIP database:", error.message);
+    console.error(`Failed to update ${name} database:`, error.message);
   }
 }
 
 /**
- * Fetches the latest GeoSite database for Iran (list of domains) and stores it.
+ * Fetches the latest GeoIP database for Iran (CIDR ranges) and stores it as merged intervals.
+ * @param {boolean} force - If true, ignores the cooldown and forces an update.
+ */
+async function updateGeoIpDatabase(force = false) {
+  await updateGeoDatabase({
+    name: 'GeoIP',
+    url: GEOIP_URL,
+    databaseKey: STORAGE_KEYS.GEOIP_DATABASE,
+    lastUpdateKey: STORAGE_KEYS.GEOIP_LAST_UPDATE,
+    pack: lines => packGeoIp(lines.map(line => line.trim()).filter(Boolean)),
+    listEntries: geoIpEntries,
+  }, force);
+}
+
+/**
+ * Fetches the latest GeoSite database for Iran (list of domains) and stores it front-coded.
  * @param {boolean} force - If true, ignores the cooldown and forces an update.
  */
 async function updateGeoSiteDatabase(force = false) {
-  const { [STORAGE_KEYS.GEOSITE_LAST_UPDATE]: lastUpdate } = await chrome.storage.local.get(STORAGE_KEYS.GEOSITE_LAST_UPDATE);
-  const now = Date.now();
+  await updateGeoDatabase({
+    name: 'GeoSite',
+    url: GEOSITE_URL,
+    databaseKey: STORAGE_KEYS.GEOSITE_DATABASE,
+    lastUpdateKey: STORAGE_KEYS.GEOSITE_LAST_UPDATE,
+    pack: packGeoSite, // Dedupes and drops entries already covered by a broader "*.suffix" pattern.
+    listEntries: unpackGeoSite,
+  }, force);
+}
 
-  if (!force && lastUpdate && (now - lastUpdate < GEOIP_UPDATE_COOLDOWN_HOURS * 60 * 60 * 1000)) {
-    console.log(`GeoSite database update skipped. Last update was less than ${GEOIP_UPDATE_COOLDOWN_HOURS} hours ago.`);
-    return;
+/**
+ * Returns the stored GeoIP and GeoSite records, packing lists stored by older versions.
+ * A record that fails its checksum is ignored and re-downloaded.
+ * @returns {Promise<{geoIpDatabase: object|null, geoSiteDatabase: object|null}>}
+ */
+async function loadGeoDatabases() {
+  const stored = await chrome.storage.local.get([
+    STORAGE_KEYS.GEOIP_DATABASE,
+    STORAGE_KEYS.GEOSITE_DATABASE,
+    STORAGE_KEYS.GEOIP_RANGES,
+    STORAGE_KEYS.GEOSITE_DOMAINS
+  ]);
+  let geoIpDatabase = stored[STORAGE_KEYS.GEOIP_DATABASE] || null;
+  let geoSiteDatabase = stored[STORAGE_KEYS.GEOSITE_DATABASE] || null;
+
+  const legacyRanges = stored[STORAGE_KEYS.GEOIP_RANGES];
+  const legacyDomains = stored[STORAGE_KEYS.GEOSITE_DOMAINS];
+  if (legacyRanges || legacyDomains) {
+    if (!geoIpDatabase && legacyRanges) geoIpDatabase = { ...await packGeoIp(legacyRanges), revision: 1 };
+    if (!geoSiteDatabase && legacyDomains) geoSiteDatabase = { ...await packGeoSite(legacyDomains), revision: 1 };
+    await chrome.storage.local.set({
+      ...(geoIpDatabase && { [STORAGE_KEYS.GEOIP_DATABASE]: geoIpDatabase }),
+      ...(geoSiteDatabase && { [STORAGE_KEYS.GEOSITE_DATABASE]: geoSiteDatabase }),
+    });
+    await chrome.storage.local.remove([STORAGE_KEYS.GEOIP_RANGES, STORAGE_KEYS.GEOSITE_DOMAINS]);
+    console.log("Converted the stored GeoIP/GeoSite lists to the packed format.");
   }
 
-  console.log("Fetching updated GeoSite database for Iran from:", GEOSITE_URL);
-  try {
-    const response = await fetch(GEOSITE_URL, { cache: 'no-store' });
-    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+  if (geoIpDatabase && !await isValidGeoRecord(geoIpDatabase)) {
+    console.warn("Stored GeoIP database is corrupt or outdated. Re-downloading it.");
+    geoIpDatabase = null;
+    updateGeoIpDatabase(true);
+  }
+  if (geoSiteDatabase && !await isValidGeoRecord(geoSiteDatabase)) {
+    console.warn("Stored GeoSite database is corrupt or outdated. Re-downloading it.");
+    geoSiteDatabase = null;
+    updateGeoSiteDatabase(true);
+  }
+  return { geoIpDatabase, geoSiteDatabase };
+}
 
-    const text = await response.text();
-    const domains = text.split('\n').map(line => line.trim()).filter(Boolean);
+// In-memory copy of the compiled PAC sections, so a warm service worker skips the storage read.
+let pacSectionCache = null;
 
-    await chrome.storage.local.set({ [STORAGE_KEYS.GEOSITE_DOMAINS]: domains, [STORAGE_KEYS.GEOSITE_LAST_UPDATE]: now });
-    console.log(`Successfully updated and cached GeoSite database with ${domains.length} domains.`);
-  } catch (error) {
-    console.error("Failed to update GeoSite database:", error.message);
+/**
+ * Returns the compiled data sections of the PAC script (custom rules, GeoSite, GeoIP).
+ * Each section is keyed by a hash of its inputs and only recompiled when that hash changes.
+ * Compiled sections are persisted in local storage so they survive service worker restarts.
+ * The GeoIP and GeoSite sections are keyed by their database checksums, so the databases
+ * are only unpacked when they changed.
+ * @param {object} inputs The rules, toggles and databases read from storage.
+ * @returns {Promise<{customRules: string, geoSite: string, geoIp: string, hashes: object}>}
+ */
+async function getPacSections({ customRules, geoIpBypassEnabled, geoSiteBypassEnabled, geoIpDatabase, geoSiteDatabase }) {
+  if (!pacSectionCache) {
+    const { [STORAGE_KEYS.PAC_SECTION_CACHE]: stored } = await chrome.storage.local.get(STORAGE_KEYS.PAC_SECTION_CACHE);
+    pacSectionCache = stored || {};
+  }
+
+  const geoSiteRecord = (geoSiteBypassEnabled && geoSiteDatabase && geoSiteDatabase.count > 0) ? geoSiteDatabase : null;
+  // Use dynamically fetched ranges if available, otherwise fall back to the hardcoded list.
+  const geoIpRecord = (geoIpDatabase && geoIpDatabase.count > 0) ? geoIpDatabase : null;
+
+  const builders = {
+    customRules: {
+      inputs: customRules.map(rule => [rule.domain || '', rule.target]),
+      build: () => customRules.length === 0 ? '' :
+        buildDomainDeclarations('CUSTOM', compileDomainPatterns(customRules.map(rule => rule.domain || '')), 'Custom Rule Domains')
+        + `const CUSTOM_TARGETS = ${JSON.stringify(customRules.map(rule => rule.target))};\n`,
+    },
+    geoSite: {
+      inputs: geoSiteRecord && geoSiteRecord.checksum,
+      build: () => geoSiteRecord
+        ? buildDomainDeclarations('GEOSITE', compileDomainPatterns(unpackGeoSite(geoSiteRecord), false), 'GeoSite Domains for Iran')
+        : '',
+    },
+    geoIp: {
+      inputs: !geoIpBypassEnabled ? null : geoIpRecord ? geoIpRecord.checksum : 'built-in',
+      build: () => !geoIpBypassEnabled ? ''
+        : buildGeoIpDeclarations(geoIpRecord ? unpackGeoIp(geoIpRecord) : compileIpRanges(IRAN_IP_RANGES_CIDR)),
+    },
+  };
+
+  const sections = { hashes: {} };
+  let changed = false;
+  for (const [name, { inputs, build }] of Object.entries(builders)) {
+    const hash = await hashPacInputs(inputs);
+    const cached = pacSectionCache[name];
+    if (cached && cached.hash === hash) {
+      sections[name] = cached.code;
+    } else {
+      console.log(`Rebuilding PAC section "${name}".`);
+      sections[name] = build();
+      pacSectionCache[name] = { hash, code: sections[name] };
+      changed = true;
+    }
+    sections.hashes[name] = hash;
+  }
+  if (changed) {
+    await chrome.storage.local.set({ [STORAGE_KEYS.PAC_SECTION_CACHE]: pacSectionCache });
+  }
+  return sections;
+}
+
+/**
+ * Asks the native host for the status of every configuration in a single request.
+ * @returns {Promise<object>} The response, e.g. { success, statuses: { [configId]: status } }.
+ */
+async function getAllConfigStatuses() {
+  const {
+    [STORAGE_KEYS.CORE_CONFIGURATIONS]: configs,
+    [STORAGE_KEYS.PING_HOST]: pingHost,
+    [STORAGE_KEYS.WEB_CHECK_URL]: webCheckUrl
+  } = await chrome.storage.sync.get({
+    [STORAGE_KEYS.CORE_CONFIGURATIONS]: [],
+    [STORAGE_KEYS.PING_HOST]: 'youtube.com',
+    [STORAGE_KEYS.WEB_CHECK_URL]: 'https://gemini.google.com/app'
+  });
+  if (configs.length === 0) {
+    return { success: true, statuses: {} };
   }
+  const response = await communicateWithNativeHostByRef({
+    command: COMMANDS.GET_STATUS_ALL,
+    configs: configs.map(config => ({ ...config, sshCommandIdentifier: getIdentifierForConfig(config) })),
+    pingHost,
+    webCheckUrl
+  });
+  if (response.success) {
+    for (const [configId, status] of Object.entries(response.statuses)) {
+      if (status.connected) await rememberTunnelSocksPort(configId, status.socks_port);
+      // Tunnels that are running for load balancing are only seen here.
+      if (status.connected && status.traffic) recordTraffic(configId, status.traffic);
+    }
+  }
+  return response;
 }
 
 /**
@@ -249,12 +393,50 @@ function getIdentifierForConfig(config) {
     }
     return config.id;
 }
+
+let socksPortWriteChain = Promise.resolve(); // Serializes updates of the port map, so none is lost.
+
+/**
+ * Remembers the SOCKS port the native host reported for a configuration. V2Ray tunnels
+ * get their port from the native host, so the PAC script has to look it up here.
+ * Updates run one after another: tunnels started concurrently would otherwise each read
+ * the map before the others wrote it, and overwrite their ports.
+ * @param {string} configId The configuration ID.
+ * @param {number} socksPort The SOCKS port from a start or status response.
+ * @returns {Promise<void>} Resolves once the port is stored.
+ */
+function rememberTunnelSocksPort(configId, socksPort) {
+  if (!configId || !socksPort) return Promise.resolve();
+  const write = socksPortWriteChain.then(async () => {
+    const {
+      [STORAGE_KEYS.TUNNEL_SOCKS_PORTS]: ports = {}
+    } = await chrome.storage.local.get(STORAGE_KEYS.TUNNEL_SOCKS_PORTS);
+    if (ports[configId] === socksPort) return;
+    await chrome.storage.local.set({ [STORAGE_KEYS.TUNNEL_SOCKS_PORTS]: { ...ports, [configId]: socksPort } });
+  });
+  socksPortWriteChain = write.catch(() => {}); // A failed write must not block later ones.
+  return write;
+}
+
+/**
+ * Stores the latency ranking of the running tunnels reported by the native host.
+ * The PAC script chains the tunnels in this order, so it also remembers their SOCKS ports.
+ * @param {Array<object>} ranking Ranking entries, best first, e.g. { id, socks_port, healthy, score_ms }.
+ */
+async function storeTunnelRanking(ranking = []) {
+  for (const entry of ranking) {
+    await rememberTunnelSocksPort(entry.id, entry.socks_port);
+  }
+  const tunnelRanking = ranking.map(({ id, healthy, score_ms }) => ({ id, healthy, score_ms }));
+  await chrome.storage.local.set({ [STORAGE_KEYS.TUNNEL_RANKING]: tunnelRanking });
+}
+
 /**
  * Attempts to start a tunnel for a single, specific configuration.
  * @param {object} config The configuration object to connect with.
  * @returns {Promise<object>} A promise that resolves with the response from the native host.
  */
-async function attemptConnection(config) {
+async function attemptConnection(config, makeActive = true) {
     console.log(`Attempting to connect with configuration: "${config.name}" of type ${config.type}`);
 
     const identifier = getIdentifierForConfig(config);
@@ -266,12 +448,28 @@ async function attemptConnection(config) {
         console.warn(message);
         return { success: false, message: message };
     }
+    // With auto-reconnect on, the native host supervises the tunnel and restarts it itself.
+    const {
+      [STORAGE_KEYS.AUTO_RECONNECT_ENABLED]: autoReconnectEnabled,
+      [STORAGE_KEYS.HEALTH_CHECK_INTERVAL_SECONDS]: healthCheckIntervalSeconds
+    } = await chrome.storage.sync.get({
+      [STORAGE_KEYS.AUTO_RECONNECT_ENABLED]: true,
+      [STORAGE_KEYS.HEALTH_CHECK_INTERVAL_SECONDS]: 10
+    });
     // The native host now understands the full config object.
     // The 'sshCommandIdentifier' key is used by the native host for any identifier.
-    const response = await communicateWithNativeHost({ command: COMMANDS.START_TUNNEL, config: { ...config, sshCommandIdentifier: identifier } });
+    const response = await communicateWithNativeHostByRef({
+      command: COMMANDS.START_TUNNEL,
+      config: { ...config, sshCommandIdentifier: identifier },
+      supervise: autoReconnectEnabled,
+      healthCheckIntervalSeconds
+    });
     if (response.success) {
         console.log(`Successfully connected with configuration: "${config.name}"`);
-        await chrome.storage.local.set({ [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: config.id });
+        if (makeActive) {
+            await chrome.storage.local.set({ [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: config.id });
+        }
+        await rememberTunnelSocksPort(config.id, response.socks_port);
     }
     return response;
 }
@@ -284,10 +482,12 @@ async function attemptConnection(config) {
 async function tryToConnectToEnabledConfigs() {
     const {
         [STORAGE_KEYS.CORE_CONFIGURATIONS]: configs,
-        [STORAGE_KEYS.WIFI_SSIDS]: wifiSsidList = []
+        [STORAGE_KEYS.WIFI_SSIDS]: wifiSsidList = [],
+        [STORAGE_KEYS.LOAD_BALANCING_ENABLED]: loadBalancingEnabled = false
     } = await chrome.storage.sync.get([
         STORAGE_KEYS.CORE_CONFIGURATIONS,
-        STORAGE_KEYS.WIFI_SSIDS
+        STORAGE_KEYS.WIFI_SSIDS,
+        STORAGE_KEYS.LOAD_BALANCING_ENABLED
     ]);
     if (!configs || configs.length === 0) {
         return { success: false, message: "No configurations defined." };
@@ -298,6 +498,19 @@ async function tryToConnectToEnabledConfigs() {
         return { success: false, message: "No configurations are enabled." };
     }
 
+    if (loadBalancingEnabled) {
+        return connectLoadBalanced(enabledConfigs, wifiSsidList);
+    }
+
+    // One batched status request tells us whether an enabled tunnel is already up.
+    const { statuses = {} } = await getAllConfigStatuses();
+    const runningConfig = enabledConfigs.find(c => statuses[c.id] && statuses[c.id].connected);
+    if (runningConfig) {
+        console.log(`Configuration "${runningConfig.name}" is already running. Making it the active one.`);
+        await chrome.storage.local.set({ [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: runningConfig.id });
+        return { success: true, already_running: true, message: `Tunnel "${runningConfig.name}" is already running.` };
+    }
+
     for (const config of enabledConfigs) {
         // Pass wifi list to the config object for the native host
         const response = await attemptConnection({ ...config, wifiSsidList });
@@ -311,6 +524,101 @@ async function tryToConnectToEnabledConfigs() {
     return { success: false, message: "Failed to connect using any of the enabled configurations." };
 }
 
+/**
+ * Starts all enabled configurations at once and has the native host rank them by latency.
+ * The first configuration (in the user's order) that starts becomes the active one; the
+ * others serve as fallbacks in the PAC script.
+ * @param {Array<object>} enabledConfigs The enabled configurations.
+ * @param {Array<string>} wifiSsidList The work Wi-Fi SSIDs.
+ */
+async function connectLoadBalanced(enabledConfigs, wifiSsidList) {
+    const responses = await Promise.all(
+        enabledConfigs.map(config => attemptConnection({ ...config, wifiSsidList }, false))
+    );
+    const started = enabledConfigs.filter((config, i) => responses[i].success);
+    enabledConfigs.forEach((config, i) => {
+        if (!responses[i].success) {
+            console.warn(`Failed to connect with "${config.name}": ${responses[i].message}.`);
+        }
+    });
+    if (started.length === 0) {
+        return { success: false, message: "Failed to connect using any of the enabled configurations." };
+    }
+    // Recorded before load balancing starts, so a stop reaches every tunnel even if it fails.
+    await chrome.storage.local.set({
+      [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: started[0].id,
+      [STORAGE_KEYS.LOAD_BALANCED_TUNNEL_IDS]: started.map(config => config.id)
+    });
+
+    const {
+      [STORAGE_KEYS.PING_HOST]: pingHost,
+      [STORAGE_KEYS.WEB_CHECK_URL]: webCheckUrl
+    } = await chrome.storage.sync.get({
+      [STORAGE_KEYS.PING_HOST]: 'youtube.com',
+      [STORAGE_KEYS.WEB_CHECK_URL]: 'https://gemini.google.com/app'
+    });
+    const balanceResponse = await communicateWithNativeHostByRef({
+        command: COMMANDS.START_LOAD_BALANCING,
+        configs: started.map(config => ({ ...config, sshCommandIdentifier: getIdentifierForConfig(config) })),
+        pingHost,
+        webCheckUrl
+    });
+    if (balanceResponse.success) {
+        await storeTunnelRanking(balanceResponse.ranking);
+    } else {
+        console.warn(`Failed to start load balancing: ${balanceResponse.message}`);
+    }
+    const firstResponse = responses[enabledConfigs.indexOf(started[0])];
+    return { ...firstResponse, message: `Started ${started.length} of ${enabledConfigs.length} tunnels with load balancing.` };
+}
+
+/**
+ * Stops load balancing and every tunnel connectLoadBalanced() started, whether or not the
+ * native host managed to rank them.
+ * @returns {Promise<object>} The response of the last stop, or null if load balancing was not running.
+ */
+async function stopLoadBalancedTunnels() {
+    const {
+      [STORAGE_KEYS.LOAD_BALANCED_TUNNEL_IDS]: tunnelIds = []
+    } = await chrome.storage.local.get(STORAGE_KEYS.LOAD_BALANCED_TUNNEL_IDS);
+    if (tunnelIds.length === 0) return null;
+
+    await communicateWithNativeHost({ command: COMMANDS.STOP_LOAD_BALANCING });
+    const { [STORAGE_KEYS.CORE_CONFIGURATIONS]: configs = [] } = await chrome.storage.sync.get(STORAGE_KEYS.CORE_CONFIGURATIONS);
+    let response = { success: true, message: "Load balancing stopped." };
+    for (const id of tunnelIds) {
+        const config = configs.find(c => c.id === id);
+        if (!config) continue;
+        const stopResponse = await communicateWithNativeHostByRef({
+            command: COMMANDS.STOP_TUNNEL,
+            config: { ...config, sshCommandIdentifier: getIdentifierForConfig(config) }
+        });
+        if (!stopResponse.success) response = stopResponse;
+    }
+    await chrome.storage.local.remove([
+      STORAGE_KEYS.LOAD_BALANCED_TUNNEL_IDS, STORAGE_KEYS.TUNNEL_RANKING, STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID
+    ]);
+    return response;
+}
+
+/**
+ * Makes the best healthy tunnel from the load-balancing ranking the active one.
+ * @param {string} failedId The ID of the configuration that is no longer connected.
+ * @returns {Promise<object|null>} The promoted configuration, or null if there is none.
+ */
+async function promoteNextRankedTunnel(failedId) {
+    const {
+      [STORAGE_KEYS.TUNNEL_RANKING]: tunnelRanking = []
+    } = await chrome.storage.local.get(STORAGE_KEYS.TUNNEL_RANKING);
+    const next = tunnelRanking.find(entry => entry.healthy && entry.id !== failedId);
+    if (!next) return null;
+    const { [STORAGE_KEYS.CORE_CONFIGURATIONS]: configs = [] } = await chrome.storage.sync.get(STORAGE_KEYS.CORE_CONFIGURATIONS);
+    const config = configs.find(c => c.id === next.id);
+    if (!config) return null;
+    await chrome.storage.local.set({ [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: config.id });
+    return config;
+}
+
 
 /**
  * Attempts to automatically restart the SSH tunnel.
@@ -340,6 +648,118 @@ async function attemptAutoReconnect() {
   }
 }
 
+// --- Latency History ---
+let latencySeriesPromise = null; // Resolves with the in-memory latency series, loaded once.
+let latencyFlushTimer = null;
+let latencyWriteChain = Promise.resolve(); // Serializes storage writes so they never race.
+const LATENCY_FLUSH_DELAY_MS = 5000; // Samples arriving within this window are written together.
+
+/**
+ * Loads the latency series from storage, migrating the legacy point array on first use.
+ * @returns {Promise<object>} The latency series.
+ */
+function getLatencySeries() {
+  if (!latencySeriesPromise) {
+    latencySeriesPromise = (async () => {
+      const {
+        [STORAGE_KEYS.LATENCY_SERIES]: stored,
+        [STORAGE_KEYS.LATENCY_HISTORY]: legacyHistory,
+      } = await chrome.storage.local.get([STORAGE_KEYS.LATENCY_SERIES, STORAGE_KEYS.LATENCY_HISTORY]);
+      if (stored) return deserializeLatencySeries(stored);
+
+      const series = createLatencySeries();
+      if (Array.isArray(legacyHistory) && legacyHistory.length > 0) {
+        legacyHistory.forEach(point => recordLatencySample(series, point.timestamp, point.web, point.tcp));
+        await chrome.storage.local.set({ [STORAGE_KEYS.LATENCY_SERIES]: serializeLatencySeries(series) });
+        await chrome.storage.local.remove(STORAGE_KEYS.LATENCY_HISTORY);
+        console.log(`Migrated ${legacyHistory.length} legacy latency history points.`);
+      }
+      return series;
+    })();
+  }
+  return latencySeriesPromise;
+}
+
+/**
+ * Writes the in-memory latency series to storage, after any write already in flight.
+ * @returns {Promise<void>}
+ */
+function flushLatencySeries() {
+  if (latencyFlushTimer) {
+    clearTimeout(latencyFlushTimer);
+    latencyFlushTimer = null;
+  }
+  latencyWriteChain = latencyWriteChain.then(async () => {
+    const series = await getLatencySeries();
+    await chrome.storage.local.set({ [STORAGE_KEYS.LATENCY_SERIES]: serializeLatencySeries(series) });
+  }).catch(e => console.error("Failed to store latency history:", e));
+  return latencyWriteChain;
+}
+
+/**
+ * Records a latency sample. Writes are batched: they happen when a rollup bucket
+ * closes or after LATENCY_FLUSH_DELAY_MS, whichever comes first.
+ * @param {number} web The web check latency in milliseconds.
+ * @param {number} tcp The TCP ping latency in milliseconds.
+ */
+async function recordLatency(web, tcp) {
+  const series = await getLatencySeries();
+  if (recordLatencySample(series, Date.now(), web, tcp)) {
+    flushLatencySeries();
+  } else if (!latencyFlushTimer) {
+    latencyFlushTimer = setTimeout(flushLatencySeries, LATENCY_FLUSH_DELAY_MS);
+  }
+}
+
+// --- Traffic History ---
+let trafficStorePromise = null; // Resolves with the in-memory traffic store, loaded once.
+let trafficFlushTimer = null;
+let trafficWriteChain = Promise.resolve(); // Serializes storage writes so they never race.
+const TRAFFIC_FLUSH_DELAY_MS = 5000; // Readings arriving within this window are written together.
+
+/**
+ * Loads the traffic store from storage.
+ * @returns {Promise<object>} The traffic store.
+ */
+function getTrafficStore() {
+  if (!trafficStorePromise) {
+    trafficStorePromise = chrome.storage.local.get(STORAGE_KEYS.TRAFFIC_SERIES)
+      .then(({ [STORAGE_KEYS.TRAFFIC_SERIES]: stored }) => (stored ? deserializeTrafficStore(stored) : createTrafficStore()));
+  }
+  return trafficStorePromise;
+}
+
+/**
+ * Writes the in-memory traffic store to storage, after any write already in flight.
+ * @returns {Promise<void>}
+ */
+function flushTrafficStore() {
+  if (trafficFlushTimer) {
+    clearTimeout(trafficFlushTimer);
+    trafficFlushTimer = null;
+  }
+  trafficWriteChain = trafficWriteChain.then(async () => {
+    const store = await getTrafficStore();
+    await chrome.storage.local.set({ [STORAGE_KEYS.TRAFFIC_SERIES]: serializeTrafficStore(store) });
+  }).catch(e => console.error("Failed to store traffic history:", e));
+  return trafficWriteChain;
+}
+
+/**
+ * Records the traffic reading of a tunnel. Writes are batched like latency samples.
+ * Recording the same counters twice adds no bytes, so every status response can be recorded.
+ * @param {string} configId The configuration ID of the tunnel.
+ * @param {object} traffic The host's reading: {bytes_in, bytes_out, in_bps, out_bps}.
+ */
+async function recordTraffic(configId, traffic) {
+  const store = await getTrafficStore();
+  if (recordTrafficSample(store, configId, Date.now(), traffic)) {
+    flushTrafficStore();
+  } else if (!trafficFlushTimer) {
+    trafficFlushTimer = setTimeout(flushTrafficStore, TRAFFIC_FLUSH_DELAY_MS);
+  }
+}
+
 /**
  * Centralized function to update the extension's state, icon, and broadcast to listeners.
  * @param {object} newStatus - The new status object, e.g., { connected: false }.
@@ -351,34 +771,25 @@ async function updateStateAndBroadcast(newStatus, errorMessage = null) {
     newStatus.connected ? console.log(errorMessage) : console.error(errorMessage);
   }
 
-  const wasConnected = lastStatus.connected;
+  // A tunnel the native host is restarting still counts as connected until the restart fails.
+  const wasConnected = lastStatus.connected || Boolean(lastStatus.restarting);
   lastStatus = newStatus;
 
   // --- Store latency history if connected ---
   if (newStatus.connected && typeof newStatus.web_check_latency_ms !== 'undefined' && typeof newStatus.tcp_ping_ms !== 'undefined') {
     // Only store valid readings (greater than -1)
     if (newStatus.web_check_latency_ms > -1 && newStatus.tcp_ping_ms > -1) {
-      const newHistoryPoint = {
-        timestamp: Date.now(),
-        web: newStatus.web_check_latency_ms,
-        tcp: newStatus.tcp_ping_ms,
-      };
-      // Use an async IIFE to avoid holding up the broadcast
-      (async () => {
-        const { [STORAGE_KEYS.LATENCY_HISTORY]: history = [] } = await chrome.storage.local.get(STORAGE_KEYS.LATENCY_HISTORY);
-        history.push(newHistoryPoint);
-        // Keep the history to a reasonable size, e.g., last 200 points
-        if (history.length > 200) {
-          history.shift();
-        }
-        await chrome.storage.local.set({ [STORAGE_KEYS.LATENCY_HISTORY]: history });
-      })();
+      // Not awaited, so recording never holds up the broadcast.
+      recordLatency(newStatus.web_check_latency_ms, newStatus.tcp_ping_ms);
     }
   }
+  if (newStatus.connected && newStatus.traffic && newStatus.activeConfigId) {
+    recordTraffic(newStatus.activeConfigId, newStatus.traffic);
+  }
   // --- Handle state transitions ---
   // Check if the tunnel has just disconnected.
   const { [STORAGE_KEYS.IS_PROXY_MANAGED]: isProxyManagedByHolocron } = await chrome.storage.local.get(STORAGE_KEYS.IS_PROXY_MANAGED);
-  if (wasConnected && !newStatus.connected) {
+  if (wasConnected && !newStatus.connected && !newStatus.restarting) {
     console.log("Tunnel has disconnected. Initiating disconnect sequence.");
     console.warn("Tunnel disconnected. Last status:", lastStatus); // Log the last status for debugging
 
@@ -392,7 +803,7 @@ async function updateStateAndBroadcast(newStatus, errorMessage = null) {
       } else {
         await chrome.proxy.settings.clear({ scope: 'regular' });
       }
-      await chrome.storage.local.remove([STORAGE_KEYS.ORIGINAL_PROXY, STORAGE_KEYS.IS_PROXY_MANAGED]);
+      await chrome.storage.local.remove([STORAGE_KEYS.ORIGINAL_PROXY, STORAGE_KEYS.IS_PROXY_MANAGED, STORAGE_KEYS.PAC_APPLIED_HASH]);
       console.log("Browser proxy restored to original settings.");
       lastStatus.proxyCleared = true; // For UI feedback
     }
@@ -412,6 +823,67 @@ async function updateStateAndBroadcast(newStatus, errorMessage = null) {
   broadcastStatus();
 }
 
+// --- Native Host Session ---
+// A single long-lived port to the native host is kept open for the lifetime of
+// the service worker. Each request is tagged with a correlation ID so replies can
+// be matched to their callers, which avoids spawning a new Python process (and
+// re-importing its dependencies) for every message.
+let nativePort = null;
+let nextNativeRequestId = 1;
+const pendingNativeRequests = new Map(); // requestId -> { resolve, reject, timer }
+const NATIVE_REQUEST_TIMEOUT_MS = 120000; // Generous enough for a slow tunnel start.
+
+/**
+ * Returns the open native host port, connecting it first if necessary.
+ * @returns {chrome.runtime.Port} The persistent native messaging port.
+ */
+function getNativePort() {
+  if (nativePort) {
+    return nativePort;
+  }
+  const port = chrome.runtime.connectNative(NATIVE_HOST_NAME);
+
+  port.onMessage.addListener((response) => {
+    if (response && response.event) {
+      handleNativeHostEvent(response);
+      return;
+    }
+    const requestId = response ? response.requestId : undefined;
+    const pending = pendingNativeRequests.get(requestId);
+    if (!pending) {
+      console.warn("Received a native host message that matches no pending request:", response);
+      return;
+    }
+    pendingNativeRequests.delete(requestId);
+    clearTimeout(pending.timer);
+    delete response.requestId;
+    pending.resolve(response);
+  });
+
+  port.onDisconnect.addListener(() => {
+    const reason = chrome.runtime.lastError
+      ? `Native host disconnected: ${chrome.runtime.lastError.message}`
+      : "Connection closed by native host without a response. Check native script logs for errors.";
+    if (nativePort === port) {
+      nativePort = null;
+    }
+    // Fail every request still waiting on this port; the next call reconnects.
+    pendingNativeRequests.forEach(pending => {
+      clearTimeout(pending.timer);
+      pending.reject(new Error(reason));
+    });
+    pendingNativeRequests.clear();
+    // Log streams ended with the host session; pages resubscribe when their port drops.
+    new Set(logSubscriptions.values()).forEach(pagePort => pagePort.disconnect());
+    logSubscriptions.clear();
+    // A new host process starts with an empty config registry.
+    registeredConfigHashes.clear();
+  });
+
+  nativePort = port;
+  return port;
+}
+
 /**
  * Sends a message to the native host and returns its response.
  * This is a centralized function for all native host communication.
@@ -420,34 +892,143 @@ async function updateStateAndBroadcast(newStatus, errorMessage = null) {
  */
 function communicateWithNativeHost(message) {
   return new Promise((resolve, reject) => {
+    const requestId = nextNativeRequestId++;
     try {
-      const port = chrome.runtime.connectNative(NATIVE_HOST_NAME);
-      let responseReceived = false;
- 
-      port.onMessage.addListener((response) => {
-        responseReceived = true;
-        resolve(response);
-        port.disconnect();
-      });
- 
-      port.onDisconnect.addListener(() => {
-        if (chrome.runtime.lastError) {
-          reject(new Error(`Native host disconnected: ${chrome.runtime.lastError.message}`));
-        } else if (!responseReceived) {
-          reject(new Error("Connection closed by native host without a response. Check native script logs for errors."));
-        }
-      });
- 
-      port.postMessage(message);
+      const port = getNativePort();
+      const timer = setTimeout(() => {
+        pendingNativeRequests.delete(requestId);
+        reject(new Error(`Native host did not respond to '${message.command}' within ${NATIVE_REQUEST_TIMEOUT_MS / 1000}s.`));
+      }, NATIVE_REQUEST_TIMEOUT_MS);
+      pendingNativeRequests.set(requestId, { resolve, reject, timer });
+      port.postMessage({ ...message, requestId });
     } catch (e) {
+      const pending = pendingNativeRequests.get(requestId);
+      if (pending) {
+        clearTimeout(pending.timer);
+        pendingNativeRequests.delete(requestId);
+      }
       reject(new Error(`Failed to connect to native host: ${e.message}`));
     }
   });
 }
 
+// --- Native Host Config Registry ---
+// Configs are registered with the native host once per session, keyed by their ID and a
+// hash of their content. Commands then carry a { id, hash, ref: true } reference instead of
+// the whole config, so a large 'ovpnFileContent' is not sent with every status check, and
+// the host can cache what it derives from each config version.
+const registeredConfigHashes = new Map(); // config ID -> hash registered with the current host session
+
+/**
+ * Computes the content hash under which a config is registered.
+ * @param {object} config The config as it is sent to the native host.
+ * @returns {Promise<string>} The hex SHA-256 of the config's JSON.
+ */
+async function hashConfig(config) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(JSON.stringify(config)));
+  return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+/**
+ * Registers any config whose current version the native host does not have yet, and
+ * returns references to them. Configs without an ID are returned unchanged.
+ * @param {Array<object>} configs The configs as they are sent to the native host.
+ * @returns {Promise<Array<object>>} The config references.
+ */
+async function toConfigRefs(configs) {
+  const hashed = await Promise.all(configs.map(async config => ({
+    config,
+    hash: config && config.id ? await hashConfig(config) : null
+  })));
+  const unregistered = hashed.filter(({ config, hash }) => hash && registeredConfigHashes.get(config.id) !== hash);
+  if (unregistered.length > 0) {
+    const response = await communicateWithNativeHost({
+      command: COMMANDS.REGISTER_CONFIGS,
+      configs: unregistered.map(({ config, hash }) => ({ ...config, hash }))
+    });
+    if (!response.success) {
+      throw new Error(`Failed to register configurations with the native host: ${response.message}`);
+    }
+    unregistered.forEach(({ config, hash }) => registeredConfigHashes.set(config.id, hash));
+  }
+  return hashed.map(({ config, hash }) => hash ? { id: config.id, hash, ref: true } : config);
+}
+
+/**
+ * Sends a command whose 'config' or 'configs' are passed to the native host by reference.
+ * If the host no longer has a referenced version (e.g. it restarted), the configs are
+ * registered again and the command is retried once.
+ * @param {object} message The message, with full config objects.
+ * @returns {Promise<object>} A promise that resolves with the response.
+ */
+async function communicateWithNativeHostByRef(message) {
+  for (let attempt = 0; ; attempt++) {
+    const refMessage = { ...message };
+    if (message.config) [refMessage.config] = await toConfigRefs([message.config]);
+    if (message.configs) refMessage.configs = await toConfigRefs(message.configs);
+    const response = await communicateWithNativeHost(refMessage);
+    if (!response.needsConfig || attempt > 0) return response;
+    (response.configIds || []).forEach(id => registeredConfigHashes.delete(id));
+  }
+}
+
+/**
+ * Handles an event pushed by the native host.
+ * Supervised tunnels report their state changes here, so a dropped tunnel is reflected
+ * immediately rather than at the next status-check alarm.
+ * @param {object} event The event message, e.g. { event: 'tunnelStateChanged', identifier, state }.
+ */
+async function handleNativeHostEvent(event) {
+  if (event.event === NATIVE_HOST_EVENTS.LOG_DATA) {
+    // Relayed before any await, so deltas reach the page in the order the host sent them.
+    const pagePort = logSubscriptions.get(event.subscriptionId);
+    if (pagePort) {
+      pagePort.postMessage(event);
+    } else {
+      communicateWithNativeHost({ command: COMMANDS.UNSUBSCRIBE_LOGS, subscriptionId: event.subscriptionId }).catch(() => {});
+    }
+    return;
+  }
+  if (event.event === NATIVE_HOST_EVENTS.TUNNEL_RANKING_CHANGED) {
+    await handleTunnelRankingChanged(event.ranking || []);
+    return;
+  }
+  if (event.event !== NATIVE_HOST_EVENTS.TUNNEL_STATE_CHANGED) {
+    console.warn("Received an unknown native host event:", event);
+    return;
+  }
+  const {
+    [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: activeId
+  } = await chrome.storage.local.get(STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID);
+  if (event.identifier !== activeId) return;
+  console.log(`Native host reports tunnel state "${event.state}"${event.message ? `: ${event.message}` : ''}`);
+  if (event.socks_port) {
+    await rememberTunnelSocksPort(activeId, event.socks_port);
+  }
+  updateStatus();
+}
+
+/**
+ * Stores a new tunnel ranking and rewrites the PAC script so its fallback chain follows it.
+ * @param {Array<object>} ranking The ranking entries, best first.
+ */
+async function handleTunnelRankingChanged(ranking) {
+  console.log("Tunnel ranking changed:", ranking.map(entry => `${entry.id} (${entry.healthy ? `${entry.score_ms} ms` : 'down'})`).join(', '));
+  await storeTunnelRanking(ranking);
+  const { [STORAGE_KEYS.IS_PROXY_MANAGED]: isProxyManaged } = await chrome.storage.local.get(STORAGE_KEYS.IS_PROXY_MANAGED);
+  if (!isProxyManaged) return;
+  const socksPort = lastStatus.socks_port || (ranking.find(entry => entry.healthy) || {}).socks_port;
+  const response = await applyBrowserProxy(socksPort);
+  if (!response.success) {
+    console.error(`Failed to apply the new tunnel ranking: ${response.message}`);
+  }
+}
+
 async function updateStatus() {
   if (isUpdateInProgress) {
-    console.log("Update check already in progress. Skipping.");
+    // Run again once the current check finishes, so a pushed state change is never lost.
+    isUpdateQueued = true;
+    console.log("Update check already in progress. Queued another one.");
     return;
   }
   isUpdateInProgress = true;
@@ -468,8 +1049,8 @@ async function updateStatus() {
     });
 
     try {
-      // The native host now expects the full configuration object to determine status.
-      const response = await communicateWithNativeHost({
+      // The config is sent by reference; the native host keeps the registered version.
+      const response = await communicateWithNativeHostByRef({
         command: COMMANDS.GET_STATUS,
         config: connectedConfig,
         pingHost,
@@ -477,12 +1058,23 @@ async function updateStatus() {
       });
       response.activeConfigId = connectedConfig.id; // Add the active ID to the status object
       if (response && response.connected) {
+        await rememberTunnelSocksPort(connectedConfig.id, response.socks_port);
         updateStateAndBroadcast(response);
+      } else if (response.supervisor && response.supervisor.state === 'restarting') {
+        // The native host is restarting the tunnel; keep the proxy and the active config in place.
+        updateStateAndBroadcast({ ...response, restarting: true });
       } else {
         // The currently "active" config is no longer connected.
         console.log(`Configuration "${connectedConfig.name}" is no longer connected.`);
-        await chrome.storage.local.remove(STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID);
-        updateStateAndBroadcast({ connected: false, activeConfigId: null });
+        const fallbackConfig = await promoteNextRankedTunnel(connectedConfig.id);
+        if (fallbackConfig) {
+          // Load balancing keeps other tunnels running; fail over to the best of them.
+          console.log(`Failing over to configuration "${fallbackConfig.name}".`);
+          isUpdateQueued = true;
+        } else {
+          await chrome.storage.local.remove(STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID);
+          updateStateAndBroadcast({ connected: false, activeConfigId: null });
+        }
       }
     } catch (error) {
       const errorMessage = `Error during status update for config "${connectedConfig.name}": ${error.message}`;
@@ -490,6 +1082,10 @@ async function updateStatus() {
     }
   } finally {
     isUpdateInProgress = false;
+    if (isUpdateQueued) {
+      isUpdateQueued = false;
+      updateStatus();
+    }
   }
 }
 
@@ -539,110 +1135,119 @@ chrome.alarms.onAlarm.addListener((alarm) => {
   }
 });
 
-// Listen for requests from the popup
-chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
-  if (request.command === COMMANDS.GET_POPUP_STATUS) {
-    sendResponse(lastStatus);
-    updateStatus();
-    return true; // Keep message channel open for an async response.
+/**
+ * Builds the PAC script for the current settings and applies it to the browser,
+ * along with the Incognito-specific proxy when one is configured.
+ * @param {number} socksPort The SOCKS port of the active tunnel.
+ * @returns {Promise<object>} A response of the form { success, message }.
+ */
+async function applyBrowserProxy(socksPort) {
+  if (!socksPort) {
+    return { success: false, message: "SOCKS port not provided." };
   }
+  try {
+    // --- Get all necessary data from storage ---
+    const {
+        [STORAGE_KEYS.CORE_CONFIGURATIONS]: coreConfigs = [],
+        [STORAGE_KEYS.PROXY_BYPASS_RULES]: customRules = [],
+        [STORAGE_KEYS.GLOBAL_GEOIP_BYPASS_ENABLED]: geoIpBypassEnabled = true,
+        [STORAGE_KEYS.GLOBAL_GEOSITE_BYPASS_ENABLED]: geoSiteBypassEnabled = true,
+        [STORAGE_KEYS.LOAD_BALANCING_ENABLED]: loadBalancingEnabled = false,
+    } = await chrome.storage.sync.get([
+        STORAGE_KEYS.CORE_CONFIGURATIONS,
+        STORAGE_KEYS.PROXY_BYPASS_RULES,
+        STORAGE_KEYS.GLOBAL_GEOIP_BYPASS_ENABLED,
+        STORAGE_KEYS.GLOBAL_GEOSITE_BYPASS_ENABLED,
+        STORAGE_KEYS.LOAD_BALANCING_ENABLED,
+    ]);
 
-  if (request.command === COMMANDS.SET_BROWSER_PROXY) {
-    (async () => {
-      const { socksPort } = request;
-      if (!socksPort) {
-        sendResponse({ success: false, message: "SOCKS port not provided." });
-        return;
-      }
-      try {
-        // --- Get all necessary data from storage ---
-        const {
-            [STORAGE_KEYS.CORE_CONFIGURATIONS]: coreConfigs = [],
-            [STORAGE_KEYS.PROXY_BYPASS_RULES]: customRules = [],
-            [STORAGE_KEYS.GLOBAL_GEOIP_BYPASS_ENABLED]: geoIpBypassEnabled = true,
-            [STORAGE_KEYS.GLOBAL_GEOSITE_BYPASS_ENABLED]: geoSiteBypassEnabled = true,
-        } = await chrome.storage.sync.get([
-            STORAGE_KEYS.CORE_CONFIGURATIONS,
-            STORAGE_KEYS.PROXY_BYPASS_RULES,
-            STORAGE_KEYS.GLOBAL_GEOIP_BYPASS_ENABLED,
-            STORAGE_KEYS.GLOBAL_GEOSITE_BYPASS_ENABLED,
-        ]);
+    const {
+      [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: activeConfigId,
+      [STORAGE_KEYS.TUNNEL_SOCKS_PORTS]: tunnelSocksPorts = {},
+      [STORAGE_KEYS.TUNNEL_RANKING]: tunnelRanking = [],
+    } = await chrome.storage.local.get([
+        STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID,
+        STORAGE_KEYS.TUNNEL_SOCKS_PORTS,
+        STORAGE_KEYS.TUNNEL_RANKING
+    ]);
 
-        const {
-          [STORAGE_KEYS.GEOIP_RANGES]: storedRanges,
-          [STORAGE_KEYS.GEOSITE_DOMAINS]: storedDomains,
-          [STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID]: activeConfigId,
-        } = await chrome.storage.local.get([
-            STORAGE_KEYS.GEOIP_RANGES,
-            STORAGE_KEYS.GEOSITE_DOMAINS,
-            STORAGE_KEYS.CURRENTLY_ACTIVE_CONFIG_ID
-        ]);
+    if (!activeConfigId) {
+        return { success: false, message: "Cannot apply proxy, no active configuration is set." };
+    }
 
-        if (!activeConfigId) {
-            sendResponse({ success: false, message: "Cannot apply proxy, no active configuration is set." });
-            return;
-        }
+    // --- Compile the data-heavy sections, reusing cached ones whose inputs are unchanged ---
+    const { geoIpDatabase, geoSiteDatabase } = await loadGeoDatabases();
+    const sections = await getPacSections({
+      customRules, geoIpBypassEnabled, geoSiteBypassEnabled, geoIpDatabase, geoSiteDatabase
+    });
 
-        // --- Create a PAC script for advanced routing ---
-        let pacScript = `/**
- * Holocron PAC (Proxy Auto-Configuration) Script
- * Generated: ${new Date().toISOString()}
- * Active Configuration ID: ${activeConfigId}
- */
-function FindProxyForURL(url, host) {
+    // --- Create a PAC script for advanced routing ---
+    let pacScript = `function FindProxyForURL(url, host) {
     // --- Proxy Definitions ---
     // These are defined based on your Core Configurations that have a Dynamic (-D) port forward.
 `
-        const proxyDefinitions = [];
-        coreConfigs.forEach(config => {
-            const proxyVar = `PROXY_${config.id.replace(/-/g, '_')}`;
-            if (config.type === 'external') {
-                if (config.proxyHost && config.proxyPort) {
-                    let pacProtocol = 'SOCKS5'; // Default
-                    if (config.proxyProtocol === 'SOCKS4') pacProtocol = 'SOCKS';
-                    else if (config.proxyProtocol === 'HTTP') pacProtocol = 'PROXY';
-                    else if (config.proxyProtocol === 'HTTPS') pacProtocol = 'HTTPS';
-
-                    pacScript += `    const ${proxyVar} = "${pacProtocol} ${config.proxyHost}:${config.proxyPort}"; // For "${config.name}"\n`;
+    const proxyDefinitions = [];
+    coreConfigs.forEach(config => {
+        const proxyVar = `PROXY_${config.id.replace(/-/g, '_')}`;
+        if (config.type === 'external') {
+            if (config.proxyHost && config.proxyPort) {
+                let pacProtocol = 'SOCKS5'; // Default
+                if (config.proxyProtocol === 'SOCKS4') pacProtocol = 'SOCKS';
+                else if (config.proxyProtocol === 'HTTP') pacProtocol = 'PROXY';
+                else if (config.proxyProtocol === 'HTTPS') pacProtocol = 'HTTPS';
+
+                pacScript += `    const ${proxyVar} = "${pacProtocol} ${config.proxyHost}:${config.proxyPort}"; // For "${config.name}"\n`;
+                proxyDefinitions.push({ id: config.id, variable: proxyVar });
+            }
+        } else if (config.portForwards && config.portForwards.length > 0) {
+            // Handle tunnel-based configs (ssh, openvpn, v2ray)
+            config.portForwards.forEach(rule => {
+                if (rule.type === 'D' && rule.localPort) {
+                    pacScript += `    const ${proxyVar} = "SOCKS5 127.0.0.1:${rule.localPort}"; // For "${config.name}"\n`;
                     proxyDefinitions.push({ id: config.id, variable: proxyVar });
                 }
-            } else if (config.portForwards && config.portForwards.length > 0) {
-                // Handle tunnel-based configs (ssh, openvpn, v2ray)
-                config.portForwards.forEach(rule => {
-                    if (rule.type === 'D' && rule.localPort) {
-                        pacScript += `    const ${proxyVar} = "SOCKS5 127.0.0.1:${rule.localPort}"; // For "${config.name}"\n`;
-                        proxyDefinitions.push({ id: config.id, variable: proxyVar });
-                    }
-                });
-            }
-            // For V2Ray configs, add the hardcoded SOCKS port
-            if (config.type === 'v2ray') {
-                const port = '10808'; // The default SOCKS port for V2Ray in this system
-                const proxyVar = `PROXY_${config.id.replace(/-/g, '_')}`;
+            });
+        }
+        // For V2Ray configs, use the SOCKS port the native host assigned to the tunnel
+        if (config.type === 'v2ray') {
+            const port = tunnelSocksPorts[config.id] || (config.id === activeConfigId ? socksPort : null);
+            if (port) {
                 pacScript += `    const ${proxyVar} = "SOCKS5 127.0.0.1:${port}"; // For "${config.name}"\n`;
                 proxyDefinitions.push({ id: config.id, variable: proxyVar });
             }
-        });
+        }
+    });
 
-        pacScript += `
+    pacScript += `
     const DIRECT = "DIRECT";
 
     // Determine the default proxy to use. This will be the proxy of the
     // currently active configuration.
 `;
-        let activeProxyVar = 'DIRECT'; // Fallback
-        const activeProxyDef = proxyDefinitions.find(p => p.id === activeConfigId);
-        if (activeProxyDef) {
-            activeProxyVar = activeProxyDef.variable;
-        } else {
-            // If the active config has no SOCKS proxy, but one was passed (e.g. from a legacy setup), create a generic one.
-            // This maintains backward compatibility.
-            pacScript += `    // NOTE: Active config has no SOCKS proxy defined. Using generic port.\n`;
-            activeProxyVar = `"SOCKS5 127.0.0.1:${socksPort}"`;
-        }
+    let activeProxyVar = 'DIRECT'; // Fallback
+    const activeProxyDef = proxyDefinitions.find(p => p.id === activeConfigId);
+    if (activeProxyDef) {
+        activeProxyVar = activeProxyDef.variable;
+    } else {
+        // If the active config has no SOCKS proxy, but one was passed (e.g. from a legacy setup), create a generic one.
+        // This maintains backward compatibility.
+        pacScript += `    // NOTE: Active config has no SOCKS proxy defined. Using generic port.\n`;
+        activeProxyVar = `"SOCKS5 127.0.0.1:${socksPort}"`;
+    }
+    // With load balancing, the default is a fallback chain over every running tunnel, in the
+    // order the native host ranked them. Chrome moves to the next entry as soon as one fails,
+    // so an outage of the fastest tunnel does not wait for a reconnect.
+    const rankedProxyVars = (loadBalancingEnabled ? tunnelRanking : [])
+        .map(entry => proxyDefinitions.find(p => p.id === entry.id))
+        .filter(Boolean)
+        .map(p => p.variable);
+    if (rankedProxyVars.length > 0) {
+        pacScript += `    const PROXY = ${[...rankedProxyVars, 'DIRECT'].join(' + "; " + ')}; // Ranked by latency\n`;
+    } else {
         pacScript += `    const PROXY = ${activeProxyVar};\n`;
+    }
 
-        pacScript += `
+    pacScript += `
     // --- Standard Bypasses (always active) ---
     // Bypass for local, non-qualified, and common internal domains.
     if (isPlainHostName(host) ||
@@ -651,161 +1256,250 @@ function FindProxyForURL(url, host) {
       shExpMatch(host, "*.ir")) {
     return DIRECT;
     }
+    // Resolve the host once; the address is shared by the private-range and GeoIP checks.
+    let ipNum = -1;
     try {
-        const ip = dnsResolve(host);
-        if (ip && (isInNet(ip, "10.0.0.0", "255.0.0.0") ||
-                   isInNet(ip, "172.16.0.0", "255.240.0.0") ||
-                   isInNet(ip, "192.168.0.0", "255.255.0.0") ||
-                   isInNet(ip, "127.0.0.0", "255.0.0.0"))) {
-            return DIRECT;
-        }
+        ipNum = ipToInt(dnsResolve(host));
     } catch (e) { /* dnsResolve can fail, fall through */ }
+    if (isInRanges(ipNum, PRIVATE_STARTS, PRIVATE_ENDS)) {
+        return DIRECT;
+    }
 `;
 
-        // --- Custom User-Defined Rules ---
-        if (customRules.length > 0) {
-            pacScript += `
+    // --- Custom User-Defined Rules ---
+    if (sections.customRules) {
+        pacScript += `
     // --- Custom Bypass & Routing Rules ---
-    // Rules you have defined to route specific domains.
-    const customRules = ${JSON.stringify(customRules, null, 4)};
-
-    for (let i = 0; i < customRules.length; i++) {
-        const rule = customRules[i];
-        if (shExpMatch(host, rule.domain)) {
-            // Rule target is "DIRECT" -> bypass the proxy.
-            if (rule.target === "DIRECT") {
-                return DIRECT;
-            }
-            // Find the proxy variable for the targeted configuration.
-`;
-            proxyDefinitions.forEach(def => {
-                pacScript += `            if (rule.target === "${def.id}") { return ${def.variable}; }\n`;
-            });
-            pacScript += `
-            // If the rule targets a configuration that doesn't have a SOCKS proxy
-            // or is otherwise unhandled, bypass it for safety.
+    // Rules you have defined to route specific domains. The first matching rule wins.
+    const ruleIndex = matchDomain(host, CUSTOM_EXACT, CUSTOM_SUFFIX, CUSTOM_GLOBS);
+    if (ruleIndex !== -1) {
+        const target = CUSTOM_TARGETS[ruleIndex];
+        // Rule target is "DIRECT" -> bypass the proxy.
+        if (target === "DIRECT") {
             return DIRECT;
         }
+        // Find the proxy variable for the targeted configuration.
+`;
+        proxyDefinitions.forEach(def => {
+            pacScript += `        if (target === "${def.id}") { return ${def.variable}; }\n`;
+        });
+        pacScript += `
+        // If the rule targets a configuration that doesn't have a SOCKS proxy
+        // or is otherwise unhandled, bypass it for safety.
+        return DIRECT;
     }
 `;
-        }
+    }
 
-        // --- GeoSite Bypass ---
-        if (geoSiteBypassEnabled && storedDomains && storedDomains.length > 0) {
-          pacScript += `
+    // --- GeoSite Bypass ---
+    if (sections.geoSite) {
+      pacScript += `
     // --- GeoSite Bypass for Iran (domain list) ---
-    const domains = ${JSON.stringify(storedDomains)};
-    for (let i = 0; i < domains.length; i++) {
-        if (shExpMatch(host, domains[i])) {
-            return DIRECT;
-        }
+    if (matchDomain(host, GEOSITE_EXACT, GEOSITE_SUFFIX, GEOSITE_GLOBS) !== -1) {
+        return DIRECT;
     }
 `;
-        }
+    }
 
-        // --- GeoIP Bypass ---
-        if (geoIpBypassEnabled) {
-          // Use dynamically fetched ranges if available, otherwise fall back to the hardcoded list.
-          const rangesToUse = (storedRanges && storedRanges.length > 0) ? storedRanges : IRAN_IP_RANGES_NETMASK;
-          pacScript += `
+    // --- GeoIP Bypass ---
+    if (sections.geoIp) {
+      pacScript += `
     // --- GeoIP Bypass for Iran (IP ranges) ---
-    try {
-        const ip = dnsResolve(host);
-        if (ip) {
-            const ranges = ${JSON.stringify(rangesToUse)};
-            for (let i = 0; i < ranges.length; i++) {
-                if (isInNet(ip, ranges[i][0], ranges[i][1])) {
-                    return DIRECT;
-                }
-            }
-        }
-    } catch (e) { /* dnsResolve can fail, fall through */ }
+    if (isInRanges(ipNum, GEOIP_STARTS, GEOIP_ENDS)) {
+        return DIRECT;
+    }
 `;
-        }
+    }
 
-        pacScript += `
+    pacScript += `
     // --- Default Action ---
     // If no specific rules matched, use the default active proxy.
     return PROXY;
 }`;
 
-        const config = {
-          mode: "pac_script",
-          pacScript: { data: pacScript }
-        };
+    // The hash covers every section, so an unchanged hash means Chrome already has this exact PAC.
+    const pacHash = await hashPacInputs([sections.hashes, pacScript]);
+    pacScript = `/**
+ * Holocron PAC (Proxy Auto-Configuration) Script
+ * Generated: ${new Date().toISOString()}
+ * Active Configuration ID: ${activeConfigId}
+ * Content Hash: ${pacHash}
+ */
+${buildPacHelpers()}${sections.customRules}${sections.geoSite}${sections.geoIp}
+${pacScript}`;
 
-        // Store original settings before changing them.
-        const originalRegularSettings = await chrome.proxy.settings.get({ incognito: false });
-        // --- Apply Regular Proxy ---
-        await chrome.proxy.settings.set({ value: config, scope: 'regular' });
+    const config = {
+      mode: "pac_script",
+      pacScript: { data: pacScript }
+    };
 
-        // --- Handle Incognito-Specific Proxy (if permission is granted) ---
-        const isAllowedInIncognito = await chrome.extension.isAllowedIncognitoAccess();
-        if (isAllowedInIncognito) {
-            const { [STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID]: incognitoConfigId } = await chrome.storage.sync.get(STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID);
-
-            if (incognitoConfigId) {
-                const incognitoConfig = coreConfigs.find(c => c.id === incognitoConfigId);
-                let incognitoProxyRule = null;
-
-                if (incognitoConfig) {
-                    if (incognitoConfig.type === 'external' && incognitoConfig.proxyHost && incognitoConfig.proxyPort) {
-                        let scheme = 'socks5'; // Default
-                        if (incognitoConfig.proxyProtocol === 'SOCKS4') scheme = 'socks4';
-                        else if (incognitoConfig.proxyProtocol === 'HTTP') scheme = 'http';
-                        else if (incognitoConfig.proxyProtocol === 'HTTPS') scheme = 'https';
+    // Store original settings before changing them.
+    const originalRegularSettings = await chrome.proxy.settings.get({ incognito: false });
+    const {
+      [STORAGE_KEYS.IS_PROXY_MANAGED]: isProxyManaged,
+      [STORAGE_KEYS.PAC_APPLIED_HASH]: appliedPacHash,
+    } = await chrome.storage.local.get([STORAGE_KEYS.IS_PROXY_MANAGED, STORAGE_KEYS.PAC_APPLIED_HASH]);
+    // Re-applying an identical PAC makes Chrome re-parse it and drop in-flight proxy resolution.
+    const isAlreadyApplied = isProxyManaged && appliedPacHash === pacHash &&
+      originalRegularSettings.levelOfControl === 'controlled_by_this_extension' &&
+      originalRegularSettings.value?.mode === 'pac_script';
+    // --- Apply Regular Proxy ---
+    if (isAlreadyApplied) {
+      console.log("PAC script unchanged since it was last applied; skipping proxy settings update.");
+    } else {
+      await chrome.proxy.settings.set({ value: config, scope: 'regular' });
+    }
+
+    // --- Handle Incognito-Specific Proxy (if permission is granted) ---
+    const isAllowedInIncognito = await chrome.extension.isAllowedIncognitoAccess();
+    if (isAllowedInIncognito) {
+        const { [STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID]: incognitoConfigId } = await chrome.storage.sync.get(STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID);
+
+        if (incognitoConfigId) {
+            const incognitoConfig = coreConfigs.find(c => c.id === incognitoConfigId);
+            let incognitoProxyRule = null;
+
+            if (incognitoConfig) {
+                if (incognitoConfig.type === 'external' && incognitoConfig.proxyHost && incognitoConfig.proxyPort) {
+                    let scheme = 'socks5'; // Default
+                    if (incognitoConfig.proxyProtocol === 'SOCKS4') scheme = 'socks4';
+                    else if (incognitoConfig.proxyProtocol === 'HTTP') scheme = 'http';
+                    else if (incognitoConfig.proxyProtocol === 'HTTPS') scheme = 'https';
+                    incognitoProxyRule = {
+                        mode: "fixed_servers",
+                        rules: { singleProxy: { scheme, host: incognitoConfig.proxyHost, port: parseInt(incognitoConfig.proxyPort, 10) }, bypassList: ["<local>"] }
+                    };
+                } else if (incognitoConfig.type === 'v2ray') {
+                    const port = tunnelSocksPorts[incognitoConfig.id];
+                    if (port) {
                         incognitoProxyRule = {
                             mode: "fixed_servers",
-                            rules: { singleProxy: { scheme, host: incognitoConfig.proxyHost, port: parseInt(incognitoConfig.proxyPort, 10) }, bypassList: ["<local>"] }
+                            rules: { singleProxy: { scheme: "socks5", host: "127.0.0.1", port }, bypassList: ["<local>"] }
                         };
-                    } else if (incognitoConfig.type === 'v2ray') {
+                    }
+                } else { // ssh, openvpn
+                    const socksPortForward = incognitoConfig.portForwards?.find(pf => pf.type === 'D');
+                    if (socksPortForward && socksPortForward.localPort) {
                         incognitoProxyRule = {
                             mode: "fixed_servers",
-                            rules: { singleProxy: { scheme: "socks5", host: "127.0.0.1", port: 10808 }, bypassList: ["<local>"] }
+                            rules: { singleProxy: { scheme: "socks5", host: "127.0.0.1", port: parseInt(socksPortForward.localPort, 10) }, bypassList: ["<local>"] }
                         };
-                    } else { // ssh, openvpn
-                        const socksPortForward = incognitoConfig.portForwards?.find(pf => pf.type === 'D');
-                        if (socksPortForward && socksPortForward.localPort) {
-                            incognitoProxyRule = {
-                                mode: "fixed_servers",
-                                rules: { singleProxy: { scheme: "socks5", host: "127.0.0.1", port: parseInt(socksPortForward.localPort, 10) }, bypassList: ["<local>"] }
-                            };
-                        }
                     }
                 }
+            }
 
-                if (incognitoProxyRule) {
-                    await chrome.proxy.settings.set({ value: incognitoProxyRule, scope: 'incognito_persistent' });
-                    console.log(`Applied specific proxy "${incognitoConfig.name}" to Incognito mode.`);
-                } else {
-                    // If the selected config has no applicable proxy, clear the setting for safety.
-                    await chrome.proxy.settings.clear({ scope: 'incognito_persistent' });
-                    console.warn(`Selected Incognito config "${incognitoConfig?.name}" has no applicable proxy. Incognito will use regular settings.`);
-                }
+            if (incognitoProxyRule) {
+                await chrome.proxy.settings.set({ value: incognitoProxyRule, scope: 'incognito_persistent' });
+                console.log(`Applied specific proxy "${incognitoConfig.name}" to Incognito mode.`);
             } else {
-                // No incognito-specific proxy is selected, so ensure it's cleared.
+                // If the selected config has no applicable proxy, clear the setting for safety.
                 await chrome.proxy.settings.clear({ scope: 'incognito_persistent' });
+                console.warn(`Selected Incognito config "${incognitoConfig?.name}" has no applicable proxy. Incognito will use regular settings.`);
             }
         } else {
-            const { [STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID]: incognitoConfigId } = await chrome.storage.sync.get(STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID);
-            if (incognitoConfigId) {
-                // Only warn if the user has actually configured an incognito-specific proxy.
-                // Otherwise, it's just noise.
-                console.warn("Cannot apply incognito-specific proxy. Please enable 'Allow in Incognito' for the Holocron extension in chrome://extensions.");
-            }
+            // No incognito-specific proxy is selected, so ensure it's cleared.
+            await chrome.proxy.settings.clear({ scope: 'incognito_persistent' });
         }
+    } else {
+        const { [STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID]: incognitoConfigId } = await chrome.storage.sync.get(STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID);
+        if (incognitoConfigId) {
+            // Only warn if the user has actually configured an incognito-specific proxy.
+            // Otherwise, it's just noise.
+            console.warn("Cannot apply incognito-specific proxy. Please enable 'Allow in Incognito' for the Holocron extension in chrome://extensions.");
+        }
+    }
+
+
+    // Set flag and store original settings AFTER successfully setting the new proxy.
+    // While the proxy is already managed, the current settings are our own PAC and must
+    // not replace the stored originals.
+    if (!isAlreadyApplied) {
+      await chrome.storage.local.set({
+        [STORAGE_KEYS.IS_PROXY_MANAGED]: true,
+        [STORAGE_KEYS.PAC_APPLIED_HASH]: pacHash,
+        ...(isProxyManaged ? {} : { [STORAGE_KEYS.ORIGINAL_PROXY]: originalRegularSettings.value }), // Store only the regular settings
+      });
+    }
+    return { success: true, message: "Browser proxy settings applied." };
+  } catch (e) {
+    return { success: false, message: `Failed to set proxy: ${e.message}` };
+  }
+}
 
+// --- Log Streams ---
+// Extension pages stream logs over a runtime port named LOG_STREAM_PORT_NAME instead of
+// polling getLogs. Each subscription is registered here before it is sent to the native
+// host, so no pushed delta can arrive for an unknown subscription, and all of a page's
+// subscriptions end when its port disconnects (e.g. the tab is closed).
+const logSubscriptions = new Map(); // subscription ID -> the page's port
+let nextLogSubscriptionId = 1;
+
+function unsubscribeLogStream(subscriptionId) {
+  if (!logSubscriptions.delete(subscriptionId)) return;
+  communicateWithNativeHost({ command: COMMANDS.UNSUBSCRIBE_LOGS, subscriptionId })
+    .catch(error => console.warn(`Failed to end log subscription ${subscriptionId}: ${error.message}`));
+}
 
-        // Set flag and store original settings AFTER successfully setting the new proxy.
-        await chrome.storage.local.set({
-          [STORAGE_KEYS.IS_PROXY_MANAGED]: true,
-          [STORAGE_KEYS.ORIGINAL_PROXY]: originalRegularSettings.value, // Store only the regular settings
+chrome.runtime.onConnect.addListener((pagePort) => {
+  if (pagePort.name !== LOG_STREAM_PORT_NAME) return;
+  const pageSubscriptions = new Set();
+
+  pagePort.onMessage.addListener(async (message) => {
+    if (message.command === COMMANDS.SUBSCRIBE_LOGS) {
+      const subscriptionId = `logs-${nextLogSubscriptionId++}`;
+      logSubscriptions.set(subscriptionId, pagePort);
+      pageSubscriptions.add(subscriptionId);
+      let response;
+      try {
+        response = await communicateWithNativeHost({
+          command: COMMANDS.SUBSCRIBE_LOGS,
+          subscriptionId,
+          identifier: message.identifier,
+          conn_type: message.conn_type,
+          offset: message.offset,
+          token: message.token,
         });
-        sendResponse({ success: true, message: "Browser proxy settings applied." });
+      } catch (error) {
+        response = { success: false, message: `Failed to subscribe to logs: ${error.message}` };
+      }
+      if (!response.success) {
+        logSubscriptions.delete(subscriptionId);
+        pageSubscriptions.delete(subscriptionId);
+      }
+      try {
+        pagePort.postMessage({ ...response, command: COMMANDS.SUBSCRIBE_LOGS, subscriptionId });
       } catch (e) {
-        sendResponse({ success: false, message: `Failed to set proxy: ${e.message}` });
+        unsubscribeLogStream(subscriptionId); // The page went away while we were subscribing.
       }
-    })();
+    } else if (message.command === COMMANDS.UNSUBSCRIBE_LOGS) {
+      pageSubscriptions.delete(message.subscriptionId);
+      unsubscribeLogStream(message.subscriptionId);
+    }
+  });
+
+  pagePort.onDisconnect.addListener(() => {
+    pageSubscriptions.forEach(unsubscribeLogStream);
+    pageSubscriptions.clear();
+  });
+});
+
+// Listen for requests from the popup
+chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
+  if (request.command === COMMANDS.GET_POPUP_STATUS) {
+    sendResponse(lastStatus);
+    updateStatus();
+    return true; // Keep message channel open for an async response.
+  }
+
+  if (request.command === COMMANDS.GET_STATUS_ALL) {
+    getAllConfigStatuses()
+      .then(sendResponse)
+      .catch(error => sendResponse({ success: false, message: `Failed to get statuses: ${error.message}` }));
+    return true; // Indicate async response
+  }
+
+  if (request.command === COMMANDS.SET_BROWSER_PROXY) {
+    applyBrowserProxy(request.socksPort).then(sendResponse);
     return true;
   }
 
@@ -826,7 +1520,7 @@ function FindProxyForURL(url, host) {
              await chrome.proxy.settings.set({ value: originalProxySettings, scope: 'regular' });
         }
 
-        await chrome.storage.local.remove([STORAGE_KEYS.ORIGINAL_PROXY, STORAGE_KEYS.IS_PROXY_MANAGED]);
+        await chrome.storage.local.remove([STORAGE_KEYS.ORIGINAL_PROXY, STORAGE_KEYS.IS_PROXY_MANAGED, STORAGE_KEYS.PAC_APPLIED_HASH]);
         sendResponse({ success: true, message: "Browser proxy restored." });
       } catch (e) {
         sendResponse({ success: false, message: `Failed to clear proxy: ${e.message}` });
@@ -866,7 +1560,7 @@ function FindProxyForURL(url, host) {
         }
 
         try {
-            const response = await communicateWithNativeHost({
+            const response = await communicateWithNativeHostByRef({
                 command: COMMANDS.TEST_CONNECTION,
                 config: config,
                 pingHost,
@@ -898,13 +1592,19 @@ function FindProxyForURL(url, host) {
                 response = await tryToConnectToEnabledConfigs();
             }
         } else { // STOP_TUNNEL
+          const balancedResponse = await stopLoadBalancedTunnels();
+          if (balancedResponse) {
+            sendResponse(balancedResponse);
+            setTimeout(updateStatus, 1500);
+            return;
+          }
           const connectedConfig = await getCurrentlyConnectedConfig();
           if (!connectedConfig) {
             sendResponse({ success: true, message: "No active tunnel to stop." });
             return;
           }
-          // Pass the entire config object to the native host
-          response = await communicateWithNativeHost({
+          // Pass the config to the native host by reference
+          response = await communicateWithNativeHostByRef({
             command: request.command,
             config: connectedConfig
           });
@@ -937,6 +1637,9 @@ function FindProxyForURL(url, host) {
             command: COMMANDS.GET_LOGS,
             identifier: request.identifier,
             conn_type: request.conn_type,
+            // Optional: with an offset and token the host returns only new log bytes.
+            offset: request.offset,
+            token: request.token,
         });
         sendResponse(response);
       } catch (error) {
@@ -946,6 +1649,42 @@ function FindProxyForURL(url, host) {
     return true; // Indicate async response
   }
 
+  if (request.command === COMMANDS.BENCHMARK_TUNNEL || request.command === COMMANDS.GET_BENCHMARKS) {
+    (async () => {
+      try {
+        let response;
+        if (request.command === COMMANDS.BENCHMARK_TUNNEL) {
+          // Benchmarks a running tunnel; the native host stores the result for later comparison.
+          response = await communicateWithNativeHostByRef({
+            command: COMMANDS.BENCHMARK_TUNNEL,
+            config: { ...request.config, sshCommandIdentifier: getIdentifierForConfig(request.config) },
+            samples: request.samples,
+            transferBytes: request.transferBytes,
+          });
+        } else {
+          response = await communicateWithNativeHost({ command: COMMANDS.GET_BENCHMARKS, identifier: request.identifier });
+        }
+        sendResponse(response);
+      } catch (error) {
+        sendResponse({ success: false, message: `Benchmark request failed: ${error.message}` });
+      }
+    })();
+    return true; // Indicate async response
+  }
+
+  if (request.command === COMMANDS.GET_METRICS) {
+    (async () => {
+      try {
+        // A simple pass-through: the native host keeps the metrics for its session.
+        const response = await communicateWithNativeHost({ command: COMMANDS.GET_METRICS });
+        sendResponse(response);
+      } catch (error) {
+        sendResponse({ success: false, message: `Failed to get metrics: ${error.message}` });
+      }
+    })();
+    return true; // Indicate async response
+  }
+
   if (request.command === COMMANDS.CLEAR_LOGS) {
     (async () => {
       try {
@@ -8,6 +8,8 @@ export const STORAGE_KEYS = {
   WEB_CHECK_URL: 'webCheckUrl',
   WIFI_SSIDS: 'wifiSsidList',
   AUTO_RECONNECT_ENABLED: 'autoReconnectEnabled',
+  HEALTH_CHECK_INTERVAL_SECONDS: 'healthCheckIntervalSeconds',
+  LOAD_BALANCING_ENABLED: 'loadBalancingEnabled',
   // New Global Proxy Settings
   PROXY_BYPASS_RULES: 'proxyBypassRules',
   GLOBAL_GEOIP_BYPASS_ENABLED: 'globalGeoIpBypassEnabled',
@@ -25,20 +27,30 @@ export const STORAGE_KEYS = {
   LEGACY_SSH_REMOTE_COMMAND: 'sshRemoteCommand',
   LEGACY_PORT_FORWARDS: 'portForwards',
   LEGACY_ACTIVE_CONFIGURATION_ID: 'activeConfigurationId',
+  LATENCY_HISTORY: 'latencyHistory', // Replaced by LATENCY_SERIES (stored in chrome.storage.local)
+  GEOIP_RANGES: 'geoIpRanges', // Replaced by GEOIP_DATABASE
+  GEOSITE_DOMAINS: 'geoSiteDomains', // Replaced by GEOSITE_DATABASE
 
   // --- State (stored in chrome.storage.local) ---
   IS_PROXY_MANAGED: 'isProxyManagedByHolocron',
   ORIGINAL_PROXY: 'originalProxySettings',
   CURRENTLY_ACTIVE_CONFIG_ID: 'currentlyActiveConfigId',
-  GEOIP_RANGES: 'geoIpRanges',
+  GEOIP_DATABASE: 'geoIpDatabase',
   GEOIP_LAST_UPDATE: 'geoIpLastUpdate',
-  GEOSITE_DOMAINS: 'geoSiteDomains',
+  GEOSITE_DATABASE: 'geoSiteDatabase',
   GEOSITE_LAST_UPDATE: 'geoSiteLastUpdate',
-  LATENCY_HISTORY: 'latencyHistory',
+  LATENCY_SERIES: 'latencySeries',
+  TRAFFIC_SERIES: 'trafficSeries',
+  PAC_SECTION_CACHE: 'pacSectionCache',
+  PAC_APPLIED_HASH: 'pacAppliedHash',
+  TUNNEL_SOCKS_PORTS: 'tunnelSocksPorts',
+  TUNNEL_RANKING: 'tunnelRanking',
+  LOAD_BALANCED_TUNNEL_IDS: 'loadBalancedTunnelIds',
 };
 
 export const COMMANDS = {
   GET_STATUS: 'getStatus',
+  GET_STATUS_ALL: 'getStatusAll',
   STATUS_UPDATED: 'statusUpdated',
   GET_POPUP_STATUS: 'getPopupStatus',
   SET_BROWSER_PROXY: 'setBrowserProxy',
@@ -50,4 +62,22 @@ export const COMMANDS = {
   GET_LOGS: 'getLogs',
   CLEAR_LOGS: 'clearLogs',
   APPLY_WEBRTC_POLICY: 'applyWebRtcPolicy',
-};
\ No newline at end of file
+  START_LOAD_BALANCING: 'startLoadBalancing',
+  STOP_LOAD_BALANCING: 'stopLoadBalancing',
+  BENCHMARK_TUNNEL: 'benchmarkTunnel',
+  GET_BENCHMARKS: 'getBenchmarks',
+  SUBSCRIBE_LOGS: 'subscribeLogs',
+  UNSUBSCRIBE_LOGS: 'unsubscribeLogs',
+  REGISTER_CONFIGS: 'registerConfigs',
+  GET_METRICS: 'getMetrics',
+};
+
+// Unsolicited messages pushed by the native host (they carry an 'event' instead of a requestId).
+export const NATIVE_HOST_EVENTS = {
+  TUNNEL_STATE_CHANGED: 'tunnelStateChanged',
+  TUNNEL_RANKING_CHANGED: 'tunnelRankingChanged',
+  LOG_DATA: 'logData',
+};
+
+// Name of the runtime port over which extension pages stream logs from the background script.
+export const LOG_STREAM_PORT_NAME = 'logStream';
\ No newline at end of file
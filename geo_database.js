@@ -0,0 +1,129 @@
+// This module stores the GeoIP and GeoSite databases in a packed form in chrome.storage.local.
+// GeoIP ranges are kept as merged [start, end] intervals in a little-endian Uint32 array,
+// and GeoSite domains as a sorted, deduplicated, front-coded table. Both are base64 or
+// plain strings inside a small record, so storage holds a few JSON strings instead of
+// thousands of array entries, and the PAC builder gets its intervals without parsing
+// dotted addresses again.
+//
+// A record looks like { format, count, data, checksum, revision, etag }. `format` is
+// bumped whenever the packing changes; `checksum` is the SHA-256 of `data`, so a record
+// that was truncated or written by an incompatible version is detected and rebuilt.
+
+import { compileIpRanges, normalizeDomainList } from './pac_builder.js';
+import { bytesToBase64, base64ToBytes } from './ring_buffer.js';
+
+export const GEO_DATABASE_FORMAT = 1;
+
+// Front-coded entries start with one character holding the length of the prefix shared
+// with the previous entry, offset into the printable range.
+const FRONT_CODE_OFFSET = 0x21;
+
+async function sha256Hex(text) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+/**
+ * Returns true if a stored record has the current format and an intact payload.
+ * @param {object} record A record from packGeoIp() or packGeoSite().
+ * @returns {Promise<boolean>}
+ */
+export async function isValidGeoRecord(record) {
+  return Boolean(record && record.format === GEO_DATABASE_FORMAT && typeof record.data === 'string'
+    && record.checksum === await sha256Hex(record.data));
+}
+
+/**
+ * Packs IP ranges into a GeoIP record of merged intervals.
+ * @param {Array<string|Array<string>>} ranges CIDR strings and/or [ip, netmask] pairs.
+ * @returns {Promise<object>} The record.
+ */
+export async function packGeoIp(ranges) {
+  const { starts, ends } = compileIpRanges(ranges);
+  const view = new DataView(new ArrayBuffer(starts.length * 8));
+  starts.forEach((start, i) => {
+    view.setUint32(i * 8, start, true);
+    view.setUint32(i * 8 + 4, ends[i], true);
+  });
+  const data = bytesToBase64(new Uint8Array(view.buffer));
+  return { format: GEO_DATABASE_FORMAT, count: starts.length, data, checksum: await sha256Hex(data) };
+}
+
+/**
+ * Unpacks a GeoIP record into the interval arrays used by the PAC builder.
+ * @param {object} record A record from packGeoIp().
+ * @returns {{starts: Array<number>, ends: Array<number>}}
+ */
+export function unpackGeoIp(record) {
+  const bytes = base64ToBytes(record.data);
+  const view = new DataView(bytes.buffer);
+  const starts = [];
+  const ends = [];
+  for (let offset = 0; offset + 8 <= bytes.length; offset += 8) {
+    starts.push(view.getUint32(offset, true));
+    ends.push(view.getUint32(offset + 4, true));
+  }
+  return { starts, ends };
+}
+
+const reverseString = s => s.split('').reverse().join('');
+
+/**
+ * Packs domain patterns into a GeoSite record. Domains are stored reversed, so that
+ * sorting groups names under the same parent domain and front coding shares the suffix.
+ * @param {Array<string>} domains The raw domain patterns.
+ * @returns {Promise<object>} The record.
+ */
+export async function packGeoSite(domains) {
+  const reversed = normalizeDomainList(domains).map(reverseString).sort();
+  let previous = '';
+  const entries = reversed.map(name => {
+    let shared = 0;
+    const limit = Math.min(previous.length, name.length);
+    while (shared < limit && previous[shared] === name[shared]) shared++;
+    previous = name;
+    return String.fromCharCode(FRONT_CODE_OFFSET + shared) + name.slice(shared);
+  });
+  const data = entries.join('\n');
+  return { format: GEO_DATABASE_FORMAT, count: entries.length, data, checksum: await sha256Hex(data) };
+}
+
+/**
+ * Unpacks a GeoSite record into its domain patterns.
+ * @param {object} record A record from packGeoSite().
+ * @returns {Array<string>} The domain patterns, grouped by parent domain.
+ */
+export function unpackGeoSite(record) {
+  if (!record.data) return [];
+  let previous = '';
+  return record.data.split('\n').map(entry => {
+    previous = previous.slice(0, entry.charCodeAt(0) - FRONT_CODE_OFFSET) + entry.slice(1);
+    return reverseString(previous);
+  });
+}
+
+/**
+ * Compares the entries of two unpacked databases.
+ * @param {Array<string>} before The previous entries.
+ * @param {Array<string>} after The new entries.
+ * @returns {{added: number, removed: number}} How many entries the update adds and removes.
+ */
+export function diffGeoEntries(before, after) {
+  const previous = new Set(before);
+  const next = new Set(after);
+  let added = 0;
+  next.forEach(entry => { if (!previous.has(entry)) added++; });
+  let removed = 0;
+  previous.forEach(entry => { if (!next.has(entry)) removed++; });
+  return { added, removed };
+}
+
+/**
+ * Lists the intervals of a GeoIP record as comparable "start-end" strings, for diffGeoEntries().
+ * @param {object} record A record from packGeoIp().
+ * @returns {Array<string>}
+ */
+export function geoIpEntries(record) {
+  const { starts, ends } = unpackGeoIp(record);
+  return starts.map((start, i) => `${start}-${ends[i]}`);
+}
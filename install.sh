@@ -131,6 +131,26 @@ else
     echo "⚠️ Warning: requirements.txt not found. Skipping package check."
 fi
 
+# --- Step 2: Package the native host ---
+# Chrome starts the host on demand, so its cold start is paid before the first reply.
+# A script run directly is compiled from source on every start; packaging it as a zipapp
+# with precompiled bytecode skips that. Set HOLOCRON_NO_ZIPAPP=1 to run the script as is
+# (for development). Re-run this installer after changing the Python source.
+if [ -z "$HOLOCRON_NO_ZIPAPP" ]; then
+    echo "📦 Packaging the native host as a zipapp..."
+    ZIPAPP_PATH="$PROJECT_ROOT/backends/python/holocron_native_host.pyz"
+    STAGING_DIR=$(mktemp -d)
+    cp "$PYTHON_SCRIPT_PATH" "$STAGING_DIR/"
+    # -b writes the bytecode next to the source, where zipimport looks for it.
+    "$PYTHON_EXEC" -m compileall -q -b "$STAGING_DIR"
+    "$PYTHON_EXEC" -m zipapp "$STAGING_DIR" -m "holocron_native_host:cli" -o "$ZIPAPP_PATH"
+    rm -rf "$STAGING_DIR"
+    PYTHON_SCRIPT_PATH="$ZIPAPP_PATH"
+    echo "✅ Native host packaged at: $ZIPAPP_PATH"
+else
+    echo "⚠️  HOLOCRON_NO_ZIPAPP is set. The native host will run from its source file."
+fi
+
 # --- Step 1: Make scripts executable ---
 echo "🔧 Setting script permissions..."
 chmod +x "$LAUNCHER_SCRIPT_PATH"
@@ -0,0 +1,152 @@
+// This module implements a compact time-series store for tunnel latency.
+// Samples are rolled up into fixed-size buckets at three resolutions, each kept
+// in a typed-array ring buffer. Old buckets are overwritten in place, so the
+// store never grows and never needs to be re-sorted or shifted.
+
+import { createRing, openRingBucket, readRing, serializeRing, restoreRing } from './ring_buffer.js';
+
+/**
+ * Rollup tiers: bucket length in seconds and how many buckets each ring keeps.
+ * 1m covers one day, 15m one week, 1h six weeks.
+ */
+export const LATENCY_TIERS = {
+  '1m': { seconds: 60, capacity: 1440 },
+  '15m': { seconds: 15 * 60, capacity: 672 },
+  '1h': { seconds: 60 * 60, capacity: 1008 },
+};
+
+const SERIES_VERSION = 1;
+// Per-bucket fields: sample count, then min/avg/p95/max for web and TCP latency.
+const STAT_FIELDS = 9;
+// The open bucket keeps at most this many raw samples for its p95 (reservoir sampled beyond that).
+const MAX_OPEN_SAMPLES = 512;
+
+function createOpenBucket(start) {
+  return {
+    start, count: 0,
+    webMin: Infinity, webMax: -Infinity, webSum: 0,
+    tcpMin: Infinity, tcpMax: -Infinity, tcpSum: 0,
+    webSamples: [], tcpSamples: [],
+  };
+}
+
+/**
+ * Creates an empty latency series with one ring per tier.
+ * @returns {object} The series.
+ */
+export function createLatencySeries() {
+  const tiers = {};
+  for (const [name, { capacity }] of Object.entries(LATENCY_TIERS)) {
+    tiers[name] = createRing(capacity, STAT_FIELDS);
+  }
+  return { tiers };
+}
+
+function percentile95(values) {
+  if (values.length === 0) return 0;
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.ceil(sorted.length * 0.95) - 1)];
+}
+
+function summarizeOpenBucket(open) {
+  return [
+    open.count,
+    open.webMin, open.webSum / open.count, percentile95(open.webSamples), open.webMax,
+    open.tcpMin, open.tcpSum / open.count, percentile95(open.tcpSamples), open.tcpMax,
+  ];
+}
+
+/**
+ * Adds one web/TCP latency sample to every tier.
+ * @param {object} series The series from createLatencySeries() or deserializeLatencySeries().
+ * @param {number} timestamp The sample time in milliseconds since the epoch.
+ * @param {number} web The web check latency in milliseconds.
+ * @param {number} tcp The TCP ping latency in milliseconds.
+ * @returns {boolean} True if at least one bucket was closed by this sample.
+ */
+export function recordLatencySample(series, timestamp, web, tcp) {
+  const nowSeconds = Math.floor(timestamp / 1000);
+  let closedBucket = false;
+  for (const [name, { seconds }] of Object.entries(LATENCY_TIERS)) {
+    const bucket = openRingBucket(series.tiers[name], nowSeconds - (nowSeconds % seconds), createOpenBucket, summarizeOpenBucket);
+    if (!bucket) continue; // Clock moved backwards; drop the sample for this tier.
+    closedBucket = closedBucket || bucket.closed;
+
+    const open = bucket.open;
+    open.count++;
+    open.webMin = Math.min(open.webMin, web);
+    open.webMax = Math.max(open.webMax, web);
+    open.webSum += web;
+    open.tcpMin = Math.min(open.tcpMin, tcp);
+    open.tcpMax = Math.max(open.tcpMax, tcp);
+    open.tcpSum += tcp;
+    if (open.webSamples.length < MAX_OPEN_SAMPLES) {
+      open.webSamples.push(web);
+      open.tcpSamples.push(tcp);
+    } else {
+      const slot = Math.floor(Math.random() * open.count);
+      if (slot < MAX_OPEN_SAMPLES) {
+        open.webSamples[slot] = web;
+        open.tcpSamples[slot] = tcp;
+      }
+    }
+  }
+  return closedBucket;
+}
+
+function toPoint(start, stats) {
+  return {
+    timestamp: start * 1000,
+    count: stats[0],
+    web: { min: stats[1], avg: stats[2], p95: stats[3], max: stats[4] },
+    tcp: { min: stats[5], avg: stats[6], p95: stats[7], max: stats[8] },
+  };
+}
+
+/**
+ * Reads the buckets of one tier, oldest first. The still-open bucket is included last.
+ * @param {object} series The latency series.
+ * @param {string} tierName One of the LATENCY_TIERS keys.
+ * @param {number} [limit=Infinity] The maximum number of (most recent) points to return.
+ * @returns {Array<object>} Points of the form {timestamp, count, web: {min, avg, p95, max}, tcp: {...}}.
+ */
+export function readLatencyTier(series, tierName, limit = Infinity) {
+  const ring = series.tiers[tierName];
+  if (!ring) return [];
+  return readRing(ring, summarizeOpenBucket).map(([start, stats]) => toPoint(start, stats)).slice(-limit);
+}
+
+/**
+ * Converts a series to a plain object that chrome.storage can hold.
+ * Ring buffers are stored as base64-encoded typed arrays.
+ * @param {object} series The latency series.
+ * @returns {object} The serialized series.
+ */
+export function serializeLatencySeries(series) {
+  const tiers = {};
+  for (const [name, ring] of Object.entries(series.tiers)) {
+    tiers[name] = serializeRing(ring);
+  }
+  return { version: SERIES_VERSION, tiers };
+}
+
+/**
+ * Restores a series written by serializeLatencySeries().
+ * Tiers that are missing or whose capacity changed start out empty.
+ * @param {object} stored The serialized series.
+ * @returns {object} The latency series.
+ */
+export function deserializeLatencySeries(stored) {
+  const series = createLatencySeries();
+  if (!stored || stored.version !== SERIES_VERSION) return series;
+  for (const [name, ring] of Object.entries(series.tiers)) {
+    const data = stored.tiers && stored.tiers[name];
+    if (!data) continue;
+    try {
+      restoreRing(ring, data, createOpenBucket);
+    } catch (e) {
+      console.warn(`Discarding unreadable latency history tier "${name}":`, e);
+    }
+  }
+  return series;
+}
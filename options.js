@@ -1,4 +1,13 @@
-import { COMMANDS, STORAGE_KEYS } from './constants.js';
+import { COMMANDS, STORAGE_KEYS, NATIVE_HOST_EVENTS, LOG_STREAM_PORT_NAME } from './constants.js';
+import {
+  compileIpRanges, compileDomainPatterns,
+  buildPacHelpers, buildGeoIpDeclarations, buildDomainDeclarations
+} from './pac_builder.js';
+import { deserializeLatencySeries, readLatencyTier } from './latency_history.js';
+import { deserializeTrafficStore, readTrafficTier } from './traffic_history.js';
+
+// Share-link schemes the native host can turn into an Xray config.
+const V2RAY_URL_SCHEMES = ['vless://', 'vmess://', 'trojan://'];
 
 document.addEventListener('DOMContentLoaded', () => {
   // --- DOM Elements ---
@@ -11,6 +20,8 @@ document.addEventListener('DOMContentLoaded', () => {
   const proxyBypassRuleTemplate = document.getElementById('proxy-bypass-rule-template');
   const addProxyRuleButton = document.getElementById('add-proxy-rule-button');
   const autoReconnectCheckbox = document.getElementById('auto-reconnect-enabled');
+  const healthCheckIntervalInput = document.getElementById('health-check-interval');
+  const loadBalancingCheckbox = document.getElementById('load-balancing-enabled');
   const wifiListContainer = document.getElementById('wifi-networks-list');
   const addWifiButton = document.getElementById('add-wifi-button');
   const ruleTemplate = document.getElementById('port-forward-rule-template');
@@ -28,6 +39,10 @@ document.addEventListener('DOMContentLoaded', () => {
   const revertProxyButton = document.getElementById('revert-proxy-button');
   const webLatencyChartCanvas = document.getElementById('web-latency-chart');
   const tcpPingChartCanvas = document.getElementById('tcp-ping-chart');
+  const latencyHistoryRangeSelect = document.getElementById('latency-history-range');
+  const throughputChartCanvas = document.getElementById('throughput-chart');
+  const trafficTunnelSelect = document.getElementById('traffic-tunnel-select');
+  const trafficTotals = document.getElementById('traffic-totals');
     const refreshWebLatencyChartButton = document.getElementById('refresh-web-latency-chart');
     const refreshTcpPingChartButton = document.getElementById('refresh-tcp-ping-chart');
   const globalGeoIpBypassCheckbox = document.getElementById('global-geoip-bypass');
@@ -49,6 +64,8 @@ document.addEventListener('DOMContentLoaded', () => {
   const aiLiveLogContainer = document.getElementById('ai-live-log-container');
   const aiLiveLogContent = document.getElementById('ai-live-log-content');
   const webRtcPolicyToggle = document.getElementById('webrtc-policy-toggle');
+  const metricsContent = document.getElementById('metrics-content');
+  const refreshMetricsButton = document.getElementById('refresh-metrics-button');
   const predefinedModal = document.getElementById('predefined-modal');
   const modalCloseButton = document.getElementById('modal-close-button');
   const predefinedChoices = document.querySelector('.predefined-choices');
@@ -76,18 +93,26 @@ document.addEventListener('DOMContentLoaded', () => {
         if (targetPanel) {
           targetPanel.classList.add('active');
         }
+        if (tabId === 'settings') {
+          loadMetrics();
+        }
     });
   }
 
   // --- State ---
   let currentStatus = {}; // Cache the latest status object
+  let configStatuses = {}; // Per-configuration statuses from the last getStatusAll request
   let webLatencyChart = null;
   let tcpPingChart = null;
+  let throughputChart = null;
   let coreConfigsForSelect = []; // Cache configs for dropdowns
-  const MAX_CHART_POINTS = 60; // Show last 60 data points
-  let configLogPollIntervals = {}; // To hold setInterval IDs for config-specific log polling.
-  let logPollInterval = null; // To hold the setInterval ID for log polling
-  let mainLogPollInterval = null; // For the main log viewer
+  let latencySeries = null; // Latency history, kept in sync with storage
+  let trafficStore = null; // Per-tunnel traffic history, kept in sync with storage
+  let configLogStreams = {}; // configId -> stop function of the config's live log stream
+  let aiLogStream = null; // Stop function of the AI assistant's live log stream
+  let mainLogStream = null; // Stop function of the main log viewer's stream
+  let aiLogCursor = null; // Incremental read position for the AI assistant's live log
+  let mainLogCursor = createLogCursor(); // Incremental read position for the main log viewer
   let isLogPollingPaused = false;
 
   // --- Debouncer for auto-saving ---
@@ -125,6 +150,16 @@ document.addEventListener('DOMContentLoaded', () => {
     return error.replace(/Error$/, '').trim();
   }
 
+  // Formats a probe's phase timings (e.g. DNS, connect, TLS) for a tooltip.
+  function formatProbeTimings(timings) {
+    if (!timings) return '';
+    const labels = { dns_ms: 'DNS', connect_ms: 'Connect', tls_ms: 'TLS', first_byte_ms: 'First byte', cold_connect_ms: 'Cold connect' };
+    return Object.entries(labels)
+      .filter(([key]) => typeof timings[key] === 'number')
+      .map(([key, label]) => `${label}: ${timings[key]}ms`)
+      .join(' | ');
+  }
+
   // --- Core Configuration Management ---
   function createConfigElement(config = {}, activeConfigId, startInEditMode = false) {
     const content = coreConfigTemplate.content.cloneNode(true);
@@ -319,13 +354,20 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     const parseAndDisplayV2RayUrl = (url) => {
-        if (!url || !url.startsWith('vless://')) {
+        if (!url || !V2RAY_URL_SCHEMES.some(scheme => url.startsWith(scheme))) {
             v2rayDetectedParams.style.display = 'none';
             return;
         }
 
         try {
-            const urlObject = new URL(url);
+            let urlObject;
+            if (url.startsWith('vmess://')) {
+                // VMess links carry base64-encoded JSON rather than a URL body.
+                const info = JSON.parse(atob(url.slice('vmess://'.length).split('#')[0].replace(/-/g, '+').replace(/_/g, '/')));
+                urlObject = { hash: `#${encodeURIComponent(info.ps || '')}`, hostname: info.add, port: info.port, protocol: 'vmess:' };
+            } else {
+                urlObject = new URL(url);
+            }
             v2rayParamsList.innerHTML = ''; // Clear previous
             let hasParams = false;
 
@@ -363,46 +405,32 @@ document.addEventListener('DOMContentLoaded', () => {
 
     connectButton.addEventListener('click', () => {
         const type = typeSelect.value;
-        if (configLogPollIntervals[configId]) clearInterval(configLogPollIntervals[configId]);
+        stopConfigLogStream(configId);
         details.style.display = 'block'; // Show details to reveal log
         liveLogContainer.style.display = 'block';
         liveLogContent.textContent = 'Initiating connection...';
 
-        const pollConfigLogs = () => {
-            if (!document.body.contains(configCard) || liveLogContainer.style.display === 'none') {
-                if (configLogPollIntervals[configId]) clearInterval(configLogPollIntervals[configId]);
-                delete configLogPollIntervals[configId];
-                return;
-            }
-            chrome.runtime.sendMessage(
-                { command: COMMANDS.GET_LOGS, identifier: configId, conn_type: type },
-                (response) => {
-                    if (!configLogPollIntervals[configId]) return;
-                    if (chrome.runtime.lastError) {
-                        liveLogContent.textContent = `Error polling logs: ${chrome.runtime.lastError.message}`;
-                        clearInterval(configLogPollIntervals[configId]);
-                        delete configLogPollIntervals[configId];
-                    } else if (response && response.success) {
-                        liveLogContent.textContent = response.log_content || 'Waiting for log output...';
-                        liveLogContainer.scrollTop = liveLogContainer.scrollHeight;
-                    }
-                }
-            );
-        };
+        const logCursor = createLogCursor(0);
         const configPayload = getConfigPayloadFromElement(configCard);
 
         statusMessage.textContent = `Connecting with "${configPayload.name}"...`;
         statusMessage.className = 'info';
         connectButton.disabled = true;
-        pollConfigLogs(); // Initial call
-        configLogPollIntervals[configId] = setInterval(pollConfigLogs, 1500);
+        configLogStreams[configId] = streamLog(logCursor, { identifier: configId, conn_type: type }, (error, changed) => {
+            if (!document.body.contains(configCard) || liveLogContainer.style.display === 'none') {
+                stopConfigLogStream(configId);
+            } else if (error) {
+                liveLogContent.textContent = `Error streaming logs: ${error}`;
+                stopConfigLogStream(configId);
+            } else if (changed) {
+                liveLogContent.textContent = logCursor.text || 'Waiting for log output...';
+                liveLogContainer.scrollTop = liveLogContainer.scrollHeight;
+            }
+        });
 
         chrome.runtime.sendMessage({ command: COMMANDS.START_TUNNEL, config: configPayload }, (response) => {
             if (response && !response.success) {
-                if (configLogPollIntervals[configId]) {
-                    clearInterval(configLogPollIntervals[configId]);
-                    delete configLogPollIntervals[configId];
-                }
+                stopConfigLogStream(configId);
                 statusMessage.textContent = `Failed to connect: ${response.message}`;
                 statusMessage.className = 'error';
                 if (type === 'openvpn' && response.message.includes("Authentication failed")) {
@@ -415,8 +443,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     disconnectButton.addEventListener('click', () => {
         liveLogContainer.style.display = 'none';
-        if (configLogPollIntervals[configId]) clearInterval(configLogPollIntervals[configId]);
-        delete configLogPollIntervals[configId];
+        stopConfigLogStream(configId);
         statusMessage.textContent = `Disconnecting...`;
         statusMessage.className = 'info';
         chrome.runtime.sendMessage({ command: COMMANDS.STOP_TUNNEL });
@@ -456,6 +483,8 @@ document.addEventListener('DOMContentLoaded', () => {
             } else {
                 tcpPingValue.textContent = formatTcpError(response.tcp_ping_error);
             }
+            webLatencyValue.title = formatProbeTimings(response.probe_timings?.web);
+            tcpPingValue.title = formatProbeTimings(response.probe_timings?.tcp);
 
             if (response.success) {
                 testStatusValue.textContent = response.web_check_status || 'OK';
@@ -649,10 +678,9 @@ document.addEventListener('DOMContentLoaded', () => {
       revertProxyButton.style.display = 'none';
       reconnectNowContainer.style.display = 'block';
 
-      // Stop all config log polling if disconnected
-      if (Object.keys(configLogPollIntervals).length > 0) {
-        Object.values(configLogPollIntervals).forEach(clearInterval);
-        configLogPollIntervals = {};
+      // Stop all config log streams if disconnected
+      if (Object.keys(configLogStreams).length > 0) {
+        Object.keys(configLogStreams).forEach(stopConfigLogStream);
         document.querySelectorAll('.config-live-log-container').forEach(el => el.style.display = 'none');
       }
     } else {
@@ -711,6 +739,34 @@ document.addEventListener('DOMContentLoaded', () => {
             statusBadge.dataset.status = 'disconnected';
         }
     });
+    applyConfigStatuses();
+  }
+
+  /**
+   * Marks cards whose tunnels are running without being the active one (e.g. with load
+   * balancing), using the statuses from the last batched status request.
+   */
+  function applyConfigStatuses() {
+    const activeConfigId = currentStatus ? currentStatus.activeConfigId : null;
+    document.querySelectorAll('#core-configurations-list .config-card').forEach(card => {
+        const status = configStatuses[card.dataset.id];
+        if (!status || !status.connected || card.dataset.id === activeConfigId) return;
+        const statusBadge = card.querySelector('.status-badge');
+        statusBadge.textContent = '[● RUNNING]';
+        statusBadge.dataset.status = 'connected';
+        statusBadge.title = status.tcp_ping_ms > -1 ? `TCP ping: ${status.tcp_ping_ms}ms` : '';
+    });
+  }
+
+  function requestAllConfigStatuses() {
+    chrome.runtime.sendMessage({ command: COMMANDS.GET_STATUS_ALL }, (response) => {
+      if (chrome.runtime.lastError || !response || !response.success) {
+        console.error("Error requesting configuration statuses:", chrome.runtime.lastError?.message || response?.message);
+        return;
+      }
+      configStatuses = response.statuses;
+      applyConfigStatuses();
+    });
   }
 
   async function checkAndSetIncognitoControls() {
@@ -747,10 +803,23 @@ document.addEventListener('DOMContentLoaded', () => {
       return { domain, target };
     }).filter(Boolean);
 
+    // (Preview uses placeholder GeoIP/GeoSite lists; actual lists are loaded from database)
+    const geoIpDeclarations = geoIpBypassEnabled
+      ? buildGeoIpDeclarations(compileIpRanges(["2.176.0.0/13", "5.52.192.0/20"]))
+      : '';
+    const geoSiteDeclarations = geoSiteBypassEnabled
+      ? buildDomainDeclarations('GEOSITE', compileDomainPatterns(["*.ir", "example.ir", "another-example.ir"], false), 'GeoSite Domains for Iran')
+      : '';
+    const customRuleDeclarations = customRules.length > 0
+      ? buildDomainDeclarations('CUSTOM', compileDomainPatterns(customRules.map(rule => rule.domain)), 'Custom Rule Domains')
+        + `const CUSTOM_TARGETS = ${JSON.stringify(customRules.map(rule => rule.target))};\n`
+      : '';
+
     let pacScript = `/**
  * Holocron PAC (Proxy Auto-Configuration) Script
  * Generated: ${new Date().toISOString()}
  */
+${buildPacHelpers()}${customRuleDeclarations}${geoSiteDeclarations}${geoIpDeclarations}
 function FindProxyForURL(url, host) {
     // --- Proxy Definitions ---
     // These are defined based on your Core Configurations that have a Dynamic (-D) port forward.
@@ -822,40 +891,36 @@ function FindProxyForURL(url, host) {
       shExpMatch(host, "*.ir")) {
     return DIRECT;
     }
+    // Resolve the host once; the address is shared by the private-range and GeoIP checks.
+    let ipNum = -1;
     try {
-        const ip = dnsResolve(host);
-        if (ip && (isInNet(ip, "10.0.0.0", "255.0.0.0") ||
-                   isInNet(ip, "172.16.0.0", "255.240.0.0") ||
-                   isInNet(ip, "192.168.0.0", "255.255.0.0") ||
-                   isInNet(ip, "127.0.0.0", "255.0.0.0"))) {
-            return DIRECT;
-        }
+        ipNum = ipToInt(dnsResolve(host));
     } catch (e) { /* dnsResolve can fail, fall through */ }
+    if (isInRanges(ipNum, PRIVATE_STARTS, PRIVATE_ENDS)) {
+        return DIRECT;
+    }
 `;
 
-    if (customRules.length > 0) {
+    if (customRuleDeclarations) {
       pacScript += `
     // --- Custom Bypass & Routing Rules ---
-    // Rules you have defined to route specific domains.
-    const customRules = ${JSON.stringify(customRules, null, 4)};
-
-    for (let i = 0; i < customRules.length; i++) {
-        const rule = customRules[i];
-        if (shExpMatch(host, rule.domain)) {
-            // Rule target is "DIRECT" -> bypass the proxy.
-            if (rule.target === "DIRECT") {
-                return DIRECT;
-            }
-            // Find the proxy variable for the targeted configuration.
+    // Rules you have defined to route specific domains. The first matching rule wins.
+    const ruleIndex = matchDomain(host, CUSTOM_EXACT, CUSTOM_SUFFIX, CUSTOM_GLOBS);
+    if (ruleIndex !== -1) {
+        const target = CUSTOM_TARGETS[ruleIndex];
+        // Rule target is "DIRECT" -> bypass the proxy.
+        if (target === "DIRECT") {
+            return DIRECT;
+        }
+        // Find the proxy variable for the targeted configuration.
 `;
       proxyDefinitions.forEach(def => {
-        pacScript += `            if (rule.target === "${def.id}") { return ${def.variable}; }\n`;
+        pacScript += `        if (target === "${def.id}") { return ${def.variable}; }\n`;
       });
       pacScript += `
-            // If the rule targets a configuration that doesn't have a SOCKS proxy
-            // or is otherwise unhandled, bypass it for safety.
-            return DIRECT;
-        }
+        // If the rule targets a configuration that doesn't have a SOCKS proxy
+        // or is otherwise unhandled, bypass it for safety.
+        return DIRECT;
     }
 `;
     }
@@ -863,12 +928,8 @@ function FindProxyForURL(url, host) {
     if (geoSiteBypassEnabled) {
       pacScript += `
     // --- GeoSite Bypass for Iran (domain list) ---
-    // (Preview uses a placeholder list; actual list is loaded from database)
-    const domains = ["*.ir", "example.ir", "another-example.ir", "..."];
-    for (let i = 0; i < domains.length; i++) {
-        if (shExpMatch(host, domains[i])) {
-            return DIRECT;
-        }
+    if (matchDomain(host, GEOSITE_EXACT, GEOSITE_SUFFIX, GEOSITE_GLOBS) !== -1) {
+        return DIRECT;
     }
 `;
     }
@@ -876,18 +937,9 @@ function FindProxyForURL(url, host) {
     if (geoIpBypassEnabled) {
       pacScript += `
     // --- GeoIP Bypass for Iran (IP ranges) ---
-    // (Preview uses a placeholder list; actual list is loaded from database)
-    try {
-        const ip = dnsResolve(host);
-        if (ip) {
-            const ranges = [["2.176.0.0", "255.248.0.0"], ["5.52.192.0", "255.255.240.0"], ["..."]];
-            for (let i = 0; i < ranges.length; i++) {
-                if (isInNet(ip, ranges[i][0], ranges[i][1])) {
-                    return DIRECT;
-                }
-            }
-        }
-    } catch (e) { /* dnsResolve can fail, fall through */ }
+    if (isInRanges(ipNum, GEOIP_STARTS, GEOIP_ENDS)) {
+        return DIRECT;
+    }
 `;
     }
 
@@ -931,6 +983,7 @@ function FindProxyForURL(url, host) {
         // Try to restore the previously selected value
         select.value = currentValue;
     });
+    populateTrafficTunnelSelect();
 
     // 3. Finally, update the PAC script preview with the new state
     updatePacScriptPreview();
@@ -938,15 +991,89 @@ function FindProxyForURL(url, host) {
 
   // --- Chart Management ---
 
-  function initializeCharts(history = []) {
-    // Slice the history to only show the most recent points, matching the real-time behavior.
-    const recentHistory = history.slice(-MAX_CHART_POINTS);
+  /**
+   * Reads the chart points for the selected range from the latency history.
+   * Range values have the form "<tier>:<number of buckets>", e.g. "15m:96".
+   */
+  function getLatencyChartData() {
+    const [tierName, limitStr] = latencyHistoryRangeSelect.value.split(':');
+    const points = latencySeries ? readLatencyTier(latencySeries, tierName, parseInt(limitStr, 10)) : [];
+    const formatLabel = tierName === '1m'
+      ? p => new Date(p.timestamp).toLocaleTimeString()
+      : p => new Date(p.timestamp).toLocaleString([], { month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit' });
+    return {
+      labels: points.map(formatLabel),
+      webAvg: points.map(p => Math.round(p.web.avg)),
+      webP95: points.map(p => Math.round(p.web.p95)),
+      tcpAvg: points.map(p => Math.round(p.tcp.avg)),
+      tcpP95: points.map(p => Math.round(p.tcp.p95)),
+    };
+  }
+
+  function formatBitRate(bps) {
+    const units = ['bps', 'Kbps', 'Mbps', 'Gbps'];
+    let value = bps;
+    let unit = 0;
+    while (value >= 1000 && unit < units.length - 1) {
+      value /= 1000;
+      unit++;
+    }
+    return `${Number(value.toFixed(1))} ${units[unit]}`;
+  }
 
-    const chartData = {
-      labels: recentHistory.map(p => new Date(p.timestamp).toLocaleTimeString()),
-      webData: recentHistory.map(p => p.web),
-      tcpData: recentHistory.map(p => p.tcp),
+  function formatByteCount(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let value = bytes;
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) {
+      value /= 1024;
+      unit++;
+    }
+    return `${Number(value.toFixed(1))} ${units[unit]}`;
+  }
+
+  /**
+   * Reads the throughput chart points for the selected range and tunnel from the traffic history.
+   * Uses the same range values as getLatencyChartData().
+   */
+  function getTrafficChartData() {
+    const [tierName, limitStr] = latencyHistoryRangeSelect.value.split(':');
+    const tunnelId = trafficTunnelSelect.value || null;
+    const points = trafficStore ? readTrafficTier(trafficStore, tierName, parseInt(limitStr, 10), tunnelId) : [];
+    const formatLabel = tierName === '1m'
+      ? p => new Date(p.timestamp).toLocaleTimeString()
+      : p => new Date(p.timestamp).toLocaleString([], { month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit' });
+    return {
+      labels: points.map(formatLabel),
+      inAvg: points.map(p => Math.round(p.in.avgBps)),
+      inPeak: points.map(p => Math.round(p.in.peakBps)),
+      outAvg: points.map(p => Math.round(p.out.avgBps)),
+      outPeak: points.map(p => Math.round(p.out.peakBps)),
+      bytesIn: points.reduce((sum, p) => sum + p.bytesIn, 0),
+      bytesOut: points.reduce((sum, p) => sum + p.bytesOut, 0),
     };
+  }
+
+  /**
+   * Lists the configurations in the throughput chart's tunnel selector, keeping the selection.
+   */
+  function populateTrafficTunnelSelect() {
+    const currentValue = trafficTunnelSelect.value;
+    while (trafficTunnelSelect.options.length > 1) {
+      trafficTunnelSelect.remove(1);
+    }
+    coreConfigsForSelect.forEach(config => {
+      const option = document.createElement('option');
+      option.value = config.id;
+      option.textContent = config.name;
+      trafficTunnelSelect.appendChild(option);
+    });
+    trafficTunnelSelect.value = coreConfigsForSelect.some(config => config.id === currentValue) ? currentValue : '';
+  }
+
+  function initializeCharts() {
+    const chartData = getLatencyChartData();
+    const trafficData = getTrafficChartData();
 
     const computedStyle = getComputedStyle(document.documentElement);
 
@@ -983,17 +1110,27 @@ function FindProxyForURL(url, host) {
       elements: { line: { tension: 0.3 } }
     };
 
+    const webColor = computedStyle.getPropertyValue('--chart-web-color').trim() || 'rgb(75, 192, 192)';
+    const tcpColor = computedStyle.getPropertyValue('--chart-tcp-color').trim() || 'rgb(54, 162, 235)';
+
     if (webLatencyChart) webLatencyChart.destroy();
     webLatencyChart = new Chart(webLatencyChartCanvas.getContext('2d'), {
       type: 'line',
       data: {
         labels: chartData.labels,
         datasets: [{
-          label: 'Web Latency',
-          data: chartData.webData,
-          borderColor: computedStyle.getPropertyValue('--chart-web-color').trim() || 'rgb(75, 192, 192)',
+          label: 'Web Latency (avg)',
+          data: chartData.webAvg,
+          borderColor: webColor,
           backgroundColor: computedStyle.getPropertyValue('--chart-web-bg').trim() || 'rgba(75, 192, 192, 0.2)',
           fill: true,
+        }, {
+          label: 'Web Latency (p95)',
+          data: chartData.webP95,
+          borderColor: webColor,
+          borderDash: [4, 4],
+          pointRadius: 0,
+          fill: false,
         }]
       },
       options: chartOptions
@@ -1005,68 +1142,207 @@ function FindProxyForURL(url, host) {
       data: {
         labels: chartData.labels,
         datasets: [{
-          label: 'TCP Ping',
-          data: chartData.tcpData,
-          borderColor: computedStyle.getPropertyValue('--chart-tcp-color').trim() || 'rgb(54, 162, 235)',
+          label: 'TCP Ping (avg)',
+          data: chartData.tcpAvg,
+          borderColor: tcpColor,
           backgroundColor: computedStyle.getPropertyValue('--chart-tcp-bg').trim() || 'rgba(54, 162, 235, 0.2)',
           fill: true,
+        }, {
+          label: 'TCP Ping (p95)',
+          data: chartData.tcpP95,
+          borderColor: tcpColor,
+          borderDash: [4, 4],
+          pointRadius: 0,
+          fill: false,
         }]
       },
       options: chartOptions
     });
+
+    const throughputOptions = {
+      ...chartOptions,
+      scales: {
+        ...chartOptions.scales,
+        y: { ...chartOptions.scales.y, ticks: { ...chartOptions.scales.y.ticks, callback: value => formatBitRate(value) } }
+      },
+      plugins: {
+        ...chartOptions.plugins,
+        tooltip: { ...chartOptions.plugins.tooltip, callbacks: { label: item => `${item.dataset.label}: ${formatBitRate(item.raw)}` } }
+      }
+    };
+    const inColor = computedStyle.getPropertyValue('--chart-in-color').trim() || 'rgb(153, 102, 255)';
+    const outColor = computedStyle.getPropertyValue('--chart-out-color').trim() || 'rgb(255, 159, 64)';
+
+    if (throughputChart) throughputChart.destroy();
+    throughputChart = new Chart(throughputChartCanvas.getContext('2d'), {
+      type: 'line',
+      data: {
+        labels: trafficData.labels,
+        datasets: [{
+          label: 'Download (avg)',
+          data: trafficData.inAvg,
+          borderColor: inColor,
+          backgroundColor: computedStyle.getPropertyValue('--chart-in-bg').trim() || 'rgba(153, 102, 255, 0.2)',
+          fill: true,
+        }, {
+          label: 'Download (peak)',
+          data: trafficData.inPeak,
+          borderColor: inColor,
+          borderDash: [4, 4],
+          pointRadius: 0,
+          fill: false,
+        }, {
+          label: 'Upload (avg)',
+          data: trafficData.outAvg,
+          borderColor: outColor,
+          fill: false,
+        }, {
+          label: 'Upload (peak)',
+          data: trafficData.outPeak,
+          borderColor: outColor,
+          borderDash: [4, 4],
+          pointRadius: 0,
+          fill: false,
+        }]
+      },
+      options: throughputOptions
+    });
+    updateTrafficTotals(trafficData);
   }
 
-  function updateCharts(status) {
-    if (!webLatencyChart || !tcpPingChart || !status.connected || status.web_check_latency_ms <= -1 || status.tcp_ping_ms <= -1) {
-      return; // Don't update if charts aren't ready, tunnel is down, or data is invalid
+  function updateTrafficTotals(trafficData) {
+    trafficTotals.textContent = trafficData.labels.length > 0
+      ? `Downloaded ${formatByteCount(trafficData.bytesIn)}, uploaded ${formatByteCount(trafficData.bytesOut)} in this range.`
+      : 'No traffic recorded in this range yet.';
+  }
+
+  function updateCharts() {
+    if (!webLatencyChart || !tcpPingChart || !throughputChart) {
+      return; // Charts aren't ready yet
     }
-    [webLatencyChart, tcpPingChart].forEach((chart, index) => {
-      const newData = index === 0 ? status.web_check_latency_ms : status.tcp_ping_ms;
-      chart.data.labels.push(new Date().toLocaleTimeString());
-      chart.data.datasets[0].data.push(newData);
-      if (chart.data.labels.length > MAX_CHART_POINTS) {
-        chart.data.labels.shift();
-        chart.data.datasets[0].data.shift();
-      }
-      chart.update();
+    const chartData = getLatencyChartData();
+    webLatencyChart.data.labels = chartData.labels;
+    webLatencyChart.data.datasets[0].data = chartData.webAvg;
+    webLatencyChart.data.datasets[1].data = chartData.webP95;
+    tcpPingChart.data.labels = chartData.labels;
+    tcpPingChart.data.datasets[0].data = chartData.tcpAvg;
+    tcpPingChart.data.datasets[1].data = chartData.tcpP95;
+    webLatencyChart.update();
+    tcpPingChart.update();
+
+    const trafficData = getTrafficChartData();
+    throughputChart.data.labels = trafficData.labels;
+    ['inAvg', 'inPeak', 'outAvg', 'outPeak'].forEach((key, i) => {
+      throughputChart.data.datasets[i].data = trafficData[key];
     });
+    throughputChart.update();
+    updateTrafficTotals(trafficData);
   }
 
-  // --- Live Log Polling for AI Assistant ---
-  function pollLogs() {
-    // Stop polling if the container has been hidden
-    if (aiLiveLogContainer.style.display === 'none') {
-      if (logPollInterval) clearInterval(logPollInterval);
-      return;
+  // --- Incremental Log Tailing ---
+  const MAX_LOG_VIEW_CHARS = 200 * 1024; // Older output is dropped from a log view beyond this size.
+  const LOG_STREAM_RECONNECT_DELAY_MS = 1000;
+
+  /**
+   * Creates the streaming state for one log view. Without an initial offset the stream
+   * starts with the host's default window (whole tunnel log, or tail of the main log).
+   */
+  function createLogCursor(initialOffset = null) {
+    return { offset: initialOffset, token: null, text: '' };
+  }
+
+  /**
+   * Merges a getLogs-style response (a subscription reply or a pushed delta) into a cursor.
+   * @param {object} cursor State from createLogCursor(); updated in place.
+   * @param {object} response The response with log_content, next_offset, token and truncated.
+   * @returns {boolean} Whether the cursor's text changed.
+   */
+  function applyLogDelta(cursor, response) {
+    // A truncated response does not continue the previous text, so it replaces it.
+    let text = (response.truncated ? '' : cursor.text) + (response.log_content || '');
+    if (text.length > MAX_LOG_VIEW_CHARS) {
+      text = text.slice(text.length - MAX_LOG_VIEW_CHARS);
     }
-    chrome.runtime.sendMessage({ command: COMMANDS.GET_LOGS }, (response) => {
-      if (chrome.runtime.lastError) {
-        aiLiveLogContent.textContent = `Error polling logs: ${chrome.runtime.lastError.message}`;
-      } else if (response && response.success) {
-        aiLiveLogContent.textContent = response.log_content || 'Waiting for log output...';
+    const changed = text !== cursor.text;
+    cursor.text = text;
+    if (typeof response.next_offset === 'number') {
+      cursor.offset = response.next_offset;
+      cursor.token = response.token;
+    }
+    return changed;
+  }
+
+  /**
+   * Streams a log into a cursor. The native host pushes what is written as it arrives,
+   * relayed by the background script over a runtime port. If the port drops (e.g. the
+   * native host restarted), the stream resubscribes from the cursor's position.
+   * @param {object} cursor State from createLogCursor(); updated in place.
+   * @param {object} request Extra SUBSCRIBE_LOGS fields (identifier, conn_type).
+   * @param {function(string|null, boolean):void} callback Called with an error message, or null and whether the text changed.
+   * @returns {function():void} Stops the stream.
+   */
+  function streamLog(cursor, request, callback) {
+    let port = null;
+    let stopped = false;
+    const connect = () => {
+      port = chrome.runtime.connect({ name: LOG_STREAM_PORT_NAME });
+      port.onMessage.addListener((message) => {
+        if (message.command === COMMANDS.SUBSCRIBE_LOGS && !message.success) {
+          stopped = true;
+          port.disconnect();
+          callback(message.message || 'Unknown error.', false);
+        } else if (message.command === COMMANDS.SUBSCRIBE_LOGS || message.event === NATIVE_HOST_EVENTS.LOG_DATA) {
+          callback(null, applyLogDelta(cursor, message));
+        }
+      });
+      port.onDisconnect.addListener(() => {
+        port = null;
+        if (!stopped) setTimeout(connect, LOG_STREAM_RECONNECT_DELAY_MS);
+      });
+      port.postMessage({
+        command: COMMANDS.SUBSCRIBE_LOGS, ...request,
+        offset: cursor.offset ?? undefined, token: cursor.token ?? undefined
+      });
+    };
+    connect();
+    return () => {
+      stopped = true;
+      if (port) port.disconnect();
+    };
+  }
+
+  function stopConfigLogStream(configId) {
+    if (configLogStreams[configId]) configLogStreams[configId]();
+    delete configLogStreams[configId];
+  }
+
+  // --- Live Log for AI Assistant ---
+  function startAiLogStream() {
+    stopAiLogStream();
+    aiLogStream = streamLog(aiLogCursor, {}, (error, changed) => {
+      if (error) {
+        aiLiveLogContent.textContent = `Failed to load log: ${error}`;
+      } else if (changed) {
+        aiLiveLogContent.textContent = aiLogCursor.text || 'Waiting for log output...';
         aiLiveLogContainer.scrollTop = aiLiveLogContainer.scrollHeight; // Auto-scroll
-      } else {
-        aiLiveLogContent.textContent = `Failed to load log: ${response.message || 'Unknown error.'}`;
       }
     });
   }
 
-  // --- Live Log Polling for Main Log Viewer ---
-  function pollMainLogs() {
-    // Don't poll if the page is hidden or if polling is paused
-    if (document.hidden || isLogPollingPaused) {
-        if (mainLogPollInterval) {
-            clearInterval(mainLogPollInterval);
-            mainLogPollInterval = null;
-        }
-        return;
-    }
-    chrome.runtime.sendMessage({ command: COMMANDS.GET_LOGS }, (response) => {
-        if (chrome.runtime.lastError) {
-            logViewerContent.textContent = `Error polling logs: ${chrome.runtime.lastError.message}`;
-        } else if (response && response.success) {
+  function stopAiLogStream() {
+    if (aiLogStream) aiLogStream();
+    aiLogStream = null;
+  }
+
+  // --- Live Log for Main Log Viewer ---
+  function startMainLogStream() {
+    if (mainLogStream) return;
+    mainLogStream = streamLog(mainLogCursor, {}, (error) => {
+        if (error) {
+            logViewerContent.textContent = `Failed to load log: ${error}`;
+        } else {
             const currentContent = logViewerContent.textContent;
-            const newContent = response.log_content || 'Waiting for log entries...';
+            const newContent = mainLogCursor.text || 'Waiting for log entries...';
             // Only update DOM if content has changed to prevent flicker/reflow
             if (currentContent !== newContent) {
                 logViewerContent.textContent = newContent;
@@ -1077,25 +1353,101 @@ function FindProxyForURL(url, host) {
                     container.scrollTop = container.scrollHeight;
                 }
             }
-        } else {
-            logViewerContent.textContent = `Failed to load log: ${response.message || 'Unknown error.'}`;
         }
     });
   }
 
+  function stopMainLogStream() {
+    if (mainLogStream) mainLogStream();
+    mainLogStream = null;
+  }
+
   function handleVisibilityChange() {
-      if (document.hidden) {
-          if (mainLogPollInterval) clearInterval(mainLogPollInterval);
-          mainLogPollInterval = null;
+      // Stream the main log only while the page is visible and the log is not paused.
+      if (document.hidden || isLogPollingPaused) {
+          stopMainLogStream();
       } else {
-          // Start polling immediately when tab becomes visible
-          if (!mainLogPollInterval) {
-              pollMainLogs(); // Initial call
-              mainLogPollInterval = setInterval(pollMainLogs, 2000); // Poll every 2 seconds
-          }
+          startMainLogStream();
       }
   }
 
+  // --- Native Host Metrics ---
+  /**
+   * Builds a table for the metrics panel.
+   * @param {Array<string>} headers The column headers.
+   * @param {Array<Array<string|number>>} rows The table rows.
+   * @returns {HTMLTableElement}
+   */
+  function createMetricsTable(headers, rows) {
+    const table = document.createElement('table');
+    table.className = 'metrics-table';
+    const headerRow = table.createTHead().insertRow();
+    headers.forEach(header => {
+      const th = document.createElement('th');
+      th.textContent = header;
+      headerRow.appendChild(th);
+    });
+    const body = table.createTBody();
+    rows.forEach(row => {
+      const tr = body.insertRow();
+      row.forEach(value => { tr.insertCell().textContent = value; });
+    });
+    return table;
+  }
+
+  function renderMetrics(metrics, textfile) {
+    metricsContent.textContent = '';
+    const summary = document.createElement('p');
+    summary.textContent = `Host session up for ${Math.round(metrics.uptime_seconds)}s.`
+      + (textfile ? ` Prometheus textfile: ${textfile}` : '');
+    metricsContent.appendChild(summary);
+
+    const latencyHeaders = ['Name', 'Count', 'Mean (ms)', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Max (ms)'];
+    const latencyRows = (timings) => Object.entries(timings).map(([name, t]) =>
+      [name, t.count, t.mean_ms, t.p50_ms, t.p95_ms, t.p99_ms, t.max_ms]);
+    [['Commands', metrics.commands], ['Stages', metrics.stages]].forEach(([title, timings]) => {
+      if (Object.keys(timings).length === 0) return;
+      const heading = document.createElement('h3');
+      heading.className = 'sub-heading';
+      heading.textContent = title;
+      metricsContent.appendChild(heading);
+      metricsContent.appendChild(createMetricsTable(latencyHeaders, latencyRows(timings)));
+    });
+
+    if (metrics.failures.length > 0) {
+      const heading = document.createElement('h3');
+      heading.className = 'sub-heading';
+      heading.textContent = 'Failures';
+      metricsContent.appendChild(heading);
+      metricsContent.appendChild(createMetricsTable(['Source', 'Error Class', 'Count'],
+        metrics.failures.map(f => [f.source, f.error_class, f.count])));
+    }
+
+    const outcomeRows = [];
+    Object.entries(metrics.probe_outcomes).forEach(([probe, outcomes]) => {
+      Object.entries(outcomes).forEach(([outcome, count]) => outcomeRows.push([probe, outcome, count]));
+    });
+    if (outcomeRows.length > 0) {
+      const heading = document.createElement('h3');
+      heading.className = 'sub-heading';
+      heading.textContent = 'Probe Outcomes';
+      metricsContent.appendChild(heading);
+      metricsContent.appendChild(createMetricsTable(['Probe', 'Outcome', 'Count'], outcomeRows));
+    }
+  }
+
+  function loadMetrics() {
+    chrome.runtime.sendMessage({ command: COMMANDS.GET_METRICS }, (response) => {
+      if (chrome.runtime.lastError) {
+        metricsContent.textContent = `Error communicating with background script: ${chrome.runtime.lastError.message}`;
+      } else if (response && response.success) {
+        renderMetrics(response.metrics, response.textfile);
+      } else {
+        metricsContent.textContent = `Failed to load metrics: ${(response && response.message) || 'Unknown error.'}`;
+      }
+    });
+  }
+
   // --- Settings Load/Save ---
 
   function loadSettings() {
@@ -1116,6 +1468,8 @@ function FindProxyForURL(url, host) {
       STORAGE_KEYS.PING_HOST,
       STORAGE_KEYS.WEB_CHECK_URL,
       STORAGE_KEYS.AUTO_RECONNECT_ENABLED,
+      STORAGE_KEYS.HEALTH_CHECK_INTERVAL_SECONDS,
+      STORAGE_KEYS.LOAD_BALANCING_ENABLED,
       STORAGE_KEYS.LEGACY_PORT_FORWARDS,
       STORAGE_KEYS.WIFI_SSIDS,
     ];
@@ -1190,6 +1544,8 @@ function FindProxyForURL(url, host) {
       pingHostInput.value = result[STORAGE_KEYS.PING_HOST] || 'youtube.com';
       webCheckUrlInput.value = result[STORAGE_KEYS.WEB_CHECK_URL] || 'https://gemini.google.com/app';
       autoReconnectCheckbox.checked = result[STORAGE_KEYS.AUTO_RECONNECT_ENABLED] !== false; // Default to true
+      healthCheckIntervalInput.value = result[STORAGE_KEYS.HEALTH_CHECK_INTERVAL_SECONDS] || 10;
+      loadBalancingCheckbox.checked = result[STORAGE_KEYS.LOAD_BALANCING_ENABLED] === true; // Default to false
 
       wifiListContainer.innerHTML = ''; // Clear existing Wi-Fi networks
       const wifiSsids = result[STORAGE_KEYS.WIFI_SSIDS] || [];
@@ -1233,6 +1589,7 @@ function FindProxyForURL(url, host) {
           incognitoProxySelect.appendChild(option);
       });
       incognitoProxySelect.value = result[STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID] || '';
+      populateTrafficTunnelSelect();
 
       // --- Populate Global Proxy Bypass Rules ---
       globalGeoIpBypassCheckbox.checked = result[STORAGE_KEYS.GLOBAL_GEOIP_BYPASS_ENABLED] !== false; // Default true
@@ -1254,37 +1611,39 @@ function FindProxyForURL(url, host) {
 
     // Load and display database statuses from local storage
     chrome.storage.local.get([
-      STORAGE_KEYS.GEOIP_RANGES,
+      STORAGE_KEYS.GEOIP_DATABASE,
       STORAGE_KEYS.GEOIP_LAST_UPDATE,
-      STORAGE_KEYS.GEOSITE_DOMAINS,
+      STORAGE_KEYS.GEOSITE_DATABASE,
       STORAGE_KEYS.GEOSITE_LAST_UPDATE,
-      STORAGE_KEYS.LATENCY_HISTORY
+      STORAGE_KEYS.LATENCY_SERIES,
+      STORAGE_KEYS.TRAFFIC_SERIES
     ], (result) => {
       // GeoIP Status
-      const ipRanges = result[STORAGE_KEYS.GEOIP_RANGES];
+      const ipDatabase = result[STORAGE_KEYS.GEOIP_DATABASE];
       const ipLastUpdate = result[STORAGE_KEYS.GEOIP_LAST_UPDATE];
       if (ipLastUpdate) {
         const date = new Date(ipLastUpdate).toLocaleDateString('en-CA'); // YYYY-MM-DD format
-        const count = ipRanges ? ipRanges.length : 0;
-        geoipStatusDiv.innerHTML = `<strong>GeoIP:</strong> ${count} IP ranges loaded (Last Updated: ${date})`;
+        const count = ipDatabase ? ipDatabase.count : 0;
+        geoipStatusDiv.innerHTML = `<strong>GeoIP:</strong> ${count} merged IP ranges loaded (Last Updated: ${date})`;
       } else {
         geoipStatusDiv.textContent = 'GeoIP: Database has not been updated yet.';
       }
 
       // GeoSite Status
-      const domains = result[STORAGE_KEYS.GEOSITE_DOMAINS];
+      const siteDatabase = result[STORAGE_KEYS.GEOSITE_DATABASE];
       const siteLastUpdate = result[STORAGE_KEYS.GEOSITE_LAST_UPDATE];
       if (siteLastUpdate) {
         const date = new Date(siteLastUpdate).toLocaleDateString('en-CA'); // YYYY-MM-DD format
-        const count = domains ? domains.length : 0;
+        const count = siteDatabase ? siteDatabase.count : 0;
         geositeStatusDiv.innerHTML = `<strong>GeoSite:</strong> ${count} domains loaded (Last Updated: ${date})`;
       } else {
         geositeStatusDiv.textContent = 'GeoSite: Database has not been updated yet.';
       }
 
-      // Initialize latency charts with historical data
-      const history = result[STORAGE_KEYS.LATENCY_HISTORY] || [];
-      initializeCharts(history);
+      // Initialize latency and throughput charts with historical data
+      latencySeries = deserializeLatencySeries(result[STORAGE_KEYS.LATENCY_SERIES]);
+      trafficStore = deserializeTrafficStore(result[STORAGE_KEYS.TRAFFIC_SERIES]);
+      initializeCharts();
     });
   }
 
@@ -1372,8 +1731,8 @@ function FindProxyForURL(url, host) {
         const url = v2rayUrlInput.value.trim();
         if (!url) {
             showError(v2rayUrlInput, 'V2Ray URL cannot be empty.');
-        } else if (!url.startsWith('vless://')) {
-            showError(v2rayUrlInput, 'URL must start with vless://');
+        } else if (!V2RAY_URL_SCHEMES.some(scheme => url.startsWith(scheme))) {
+            showError(v2rayUrlInput, 'URL must start with vless://, vmess:// or trojan://');
         }
       }
     });
@@ -1445,6 +1804,8 @@ function FindProxyForURL(url, host) {
       [STORAGE_KEYS.WEB_CHECK_URL]: webCheckUrlInput.value,
       [STORAGE_KEYS.WIFI_SSIDS]: wifiSsids,
       [STORAGE_KEYS.AUTO_RECONNECT_ENABLED]: autoReconnectCheckbox.checked,
+      [STORAGE_KEYS.HEALTH_CHECK_INTERVAL_SECONDS]: Math.min(60, Math.max(2, parseInt(healthCheckIntervalInput.value, 10) || 10)),
+      [STORAGE_KEYS.LOAD_BALANCING_ENABLED]: loadBalancingCheckbox.checked,
       [STORAGE_KEYS.PROXY_BYPASS_RULES]: proxyBypassRules,
       [STORAGE_KEYS.INCOGNITO_PROXY_CONFIG_ID]: incognitoProxySelect.value,
       [STORAGE_KEYS.WEBRTC_IP_HANDLING_POLICY]: webRtcPolicyToggle.checked ? 'disable_non_proxied_udp' : 'default',
@@ -1485,6 +1846,7 @@ function FindProxyForURL(url, host) {
         updateConnectionUI(response);
       }
     });
+    requestAllConfigStatuses();
   }
 
   // --- Auto-saving setup ---
@@ -1563,8 +1925,8 @@ function FindProxyForURL(url, host) {
     // Start live log
     aiLiveLogContainer.style.display = 'none';
     aiLiveLogContent.textContent = 'Initializing live log...';
-    pollLogs();
-    logPollInterval = setInterval(pollLogs, 1500);
+    aiLogCursor = createLogCursor();
+    startAiLogStream();
 
     const maxRetries = 3;
     let lastError = null;
@@ -1700,10 +2062,7 @@ function FindProxyForURL(url, host) {
     // --- Cleanup ---
     aiSuggestRuleButton.textContent = originalButtonText;
     aiSuggestRuleButton.disabled = false;
-    if (logPollInterval) {
-      clearInterval(logPollInterval);
-      logPollInterval = null;
-    }
+    stopAiLogStream();
         setTimeout(() => {
       aiLiveLogContainer.style.display = 'block'; // Show log after delay
     }, 8000); // Keep log visible for 8 seconds to see final output
@@ -1729,10 +2088,7 @@ function FindProxyForURL(url, host) {
   toggleLogPollingButton.addEventListener('click', () => {
     isLogPollingPaused = !isLogPollingPaused;
     toggleLogPollingButton.textContent = isLogPollingPaused ? 'Resume Log' : 'Pause Log';
-    // If we are resuming, we need to restart the polling interval.
-    if (!isLogPollingPaused) {
-        handleVisibilityChange();
-    }
+    handleVisibilityChange(); // Stops the stream when pausing and resumes it from the cursor.
   });
 
   copyLogButton.addEventListener('click', () => {
@@ -1749,10 +2105,14 @@ function FindProxyForURL(url, host) {
 
 
 
+  refreshMetricsButton.addEventListener('click', loadMetrics);
+
   // Add listeners to global inputs
   pingHostInput.addEventListener('input', () => debouncedSave());
   webCheckUrlInput.addEventListener('input', () => debouncedSave());
   autoReconnectCheckbox.addEventListener('change', () => debouncedSave());
+  healthCheckIntervalInput.addEventListener('input', () => debouncedSave());
+  loadBalancingCheckbox.addEventListener('change', () => debouncedSave());
   aiApiKeyInput.addEventListener('input', () => debouncedSave());
   aiModelInput.addEventListener('input', () => debouncedSave());
   aiSystemMessageInput.addEventListener('input', () => debouncedSave());
@@ -1800,6 +2160,23 @@ function FindProxyForURL(url, host) {
         refreshTcpPingChartButton.addEventListener('click', refreshChartData);
     }
 
+  latencyHistoryRangeSelect.addEventListener('change', updateCharts);
+  trafficTunnelSelect.addEventListener('change', updateCharts);
+
+  // The background script writes latency and traffic history in batches; redraw whenever a batch lands.
+  chrome.storage.onChanged.addListener((changes, areaName) => {
+    if (areaName !== 'local') return;
+    if (changes[STORAGE_KEYS.LATENCY_SERIES]) {
+      latencySeries = deserializeLatencySeries(changes[STORAGE_KEYS.LATENCY_SERIES].newValue);
+    }
+    if (changes[STORAGE_KEYS.TRAFFIC_SERIES]) {
+      trafficStore = deserializeTrafficStore(changes[STORAGE_KEYS.TRAFFIC_SERIES].newValue);
+    }
+    if (changes[STORAGE_KEYS.LATENCY_SERIES] || changes[STORAGE_KEYS.TRAFFIC_SERIES]) {
+      updateCharts();
+    }
+  });
+
 
 
   // --- Connection Control Event Listeners ---
@@ -1835,7 +2212,6 @@ function FindProxyForURL(url, host) {
   chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     if (request.command === COMMANDS.STATUS_UPDATED) {
       updateConnectionUI(request.status);
-      updateCharts(request.status);
     }
   });
 
@@ -1908,6 +2284,6 @@ function FindProxyForURL(url, host) {
   requestStatusUpdate();
   // Add visibility change listener for live log
   document.addEventListener('visibilitychange', handleVisibilityChange);
-  // Start polling for the main log viewer
+  // Start streaming the main log viewer
   handleVisibilityChange();
 });
\ No newline at end of file
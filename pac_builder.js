@@ -0,0 +1,262 @@
+// This module compiles routing data (GeoIP ranges, domain lists) into compact structures
+// and emits the PAC (Proxy Auto-Configuration) code that queries them.
+// The PAC script is evaluated for every request the browser makes, so any
+// work that can be done once at build time is done here instead.
+
+// Bump when the emitted PAC code changes, so cached sections built by an older version are discarded.
+export const PAC_BUILDER_VERSION = 2;
+
+const PRIVATE_IP_RANGES = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '127.0.0.0/8'];
+
+/**
+ * Converts a dotted IPv4 address to an unsigned 32-bit integer.
+ * @param {string} ip The IPv4 address (e.g., "192.168.1.1").
+ * @returns {number} The address as an integer, or -1 if it is not a valid IPv4 address.
+ */
+export function ipToInt(ip) {
+  if (typeof ip !== 'string') return -1;
+  const octets = ip.split('.');
+  if (octets.length !== 4) return -1;
+  let value = 0;
+  for (const octet of octets) {
+    const n = Number(octet);
+    if (octet === '' || !Number.isInteger(n) || n < 0 || n > 255) return -1;
+    value = value * 256 + n;
+  }
+  return value;
+}
+
+/**
+ * Converts a single range to an inclusive [start, end] integer interval.
+ * @param {string|Array<string>} range A CIDR string ("2.176.0.0/13") or an [ip, netmask] pair.
+ * @returns {Array<number>|null} The interval, or null if the range is invalid.
+ */
+function rangeToInterval(range) {
+  let ipInt;
+  let size;
+  if (Array.isArray(range)) {
+    ipInt = ipToInt(range[0]);
+    const maskInt = ipToInt(range[1]);
+    if (ipInt < 0 || maskInt < 0) return null;
+    size = 2 ** 32 - maskInt;
+  } else if (typeof range === 'string') {
+    const [ip, prefixStr] = range.split('/');
+    const prefix = parseInt(prefixStr, 10);
+    ipInt = ipToInt(ip);
+    if (ipInt < 0 || isNaN(prefix) || prefix < 0 || prefix > 32) return null;
+    size = 2 ** (32 - prefix);
+  } else {
+    return null;
+  }
+  const start = ipInt - (ipInt % size);
+  return [start, start + size - 1];
+}
+
+/**
+ * Compiles IP ranges into merged, sorted, non-overlapping integer intervals.
+ * Adjacent and overlapping ranges are collapsed into one interval.
+ * @param {Array<string|Array<string>>} ranges CIDR strings and/or [ip, netmask] pairs.
+ * @returns {{starts: Array<number>, ends: Array<number>}} Parallel arrays of interval bounds.
+ */
+export function compileIpRanges(ranges) {
+  const intervals = (ranges || []).map(rangeToInterval).filter(Boolean);
+  intervals.sort((a, b) => a[0] - b[0]);
+
+  const starts = [];
+  const ends = [];
+  for (const [start, end] of intervals) {
+    const last = ends.length - 1;
+    if (last >= 0 && start <= ends[last] + 1) {
+      ends[last] = Math.max(ends[last], end);
+    } else {
+      starts.push(start);
+      ends.push(end);
+    }
+  }
+  return { starts, ends };
+}
+
+/**
+ * Emits the helper functions and private-range table shared by every PAC script.
+ * These are declared at the top level so they are parsed once per PAC load.
+ * @returns {string} PAC source code.
+ */
+export function buildPacHelpers() {
+  const privateRanges = compileIpRanges(PRIVATE_IP_RANGES);
+  return `// --- Helpers ---
+// Converts a dotted IPv4 address to an integer, or -1 if it cannot be parsed.
+function ipToInt(ip) {
+    if (!ip) return -1;
+    const p = ip.split(".");
+    if (p.length !== 4) return -1;
+    const n = ((+p[0] * 256 + +p[1]) * 256 + +p[2]) * 256 + +p[3];
+    return isNaN(n) ? -1 : n;
+}
+
+// Decodes intervals written by encodeIntervals() into [starts, ends]. Runs once per PAC load.
+function decodeIntervals(encoded) {
+    const parts = encoded ? encoded.split(",") : [];
+    const starts = [], ends = [];
+    let end = -1;
+    for (let i = 0; i + 1 < parts.length; i += 2) {
+        const start = end + 1 + parseInt(parts[i], 36);
+        end = start + parseInt(parts[i + 1], 36);
+        starts.push(start);
+        ends.push(end);
+    }
+    return [starts, ends];
+}
+
+// Binary search over sorted, non-overlapping [starts[i], ends[i]] intervals.
+function isInRanges(n, starts, ends) {
+    let lo = 0, hi = starts.length - 1;
+    while (lo <= hi) {
+        const mid = (lo + hi) >> 1;
+        if (n < starts[mid]) hi = mid - 1;
+        else if (n > ends[mid]) lo = mid + 1;
+        else return true;
+    }
+    return false;
+}
+
+// Returns the lowest rule index whose domain pattern matches the host, or -1.
+// Exact hosts and "*.suffix" patterns are hashed; the host's parent domains are
+// looked up label by label. Only genuine globs fall back to shExpMatch().
+function matchDomain(host, exact, suffix, globs) {
+    const has = Object.prototype.hasOwnProperty;
+    let best = has.call(exact, host) ? exact[host] : -1;
+    for (let i = host.indexOf("."); i !== -1; i = host.indexOf(".", i + 1)) {
+        const parent = host.substring(i + 1);
+        if (has.call(suffix, parent) && (best === -1 || suffix[parent] < best)) {
+            best = suffix[parent];
+        }
+    }
+    for (let i = 0; i < globs.length; i++) {
+        if (best !== -1 && globs[i][1] > best) break;
+        if (shExpMatch(host, globs[i][0])) return globs[i][1];
+    }
+    return best;
+}
+
+const PRIVATE_STARTS = ${JSON.stringify(privateRanges.starts)};
+const PRIVATE_ENDS = ${JSON.stringify(privateRanges.ends)};
+`;
+}
+
+/**
+ * Encodes sorted, non-overlapping intervals as base-36 pairs of (gap after the previous
+ * interval, length - 1). This is several times shorter than two arrays of 10-digit
+ * addresses, which keeps the PAC string Chrome has to parse small.
+ * @param {{starts: Array<number>, ends: Array<number>}} compiled The output of compileIpRanges().
+ * @returns {string} The encoded intervals, decoded in the PAC by decodeIntervals().
+ */
+export function encodeIntervals(compiled) {
+  const parts = [];
+  let previousEnd = -1;
+  compiled.starts.forEach((start, i) => {
+    parts.push((start - previousEnd - 1).toString(36), (compiled.ends[i] - start).toString(36));
+    previousEnd = compiled.ends[i];
+  });
+  return parts.join(',');
+}
+
+/**
+ * Emits the top-level GeoIP interval tables for a PAC script.
+ * @param {{starts: Array<number>, ends: Array<number>}} compiled The output of compileIpRanges().
+ * @returns {string} PAC source code.
+ */
+export function buildGeoIpDeclarations(compiled) {
+  return `
+// --- GeoIP Ranges for Iran (${compiled.starts.length} merged, sorted intervals) ---
+const GEOIP = decodeIntervals("${encodeIntervals(compiled)}");
+const GEOIP_STARTS = GEOIP[0];
+const GEOIP_ENDS = GEOIP[1];
+`;
+}
+
+/**
+ * Returns true if a domain pattern needs shExpMatch() rather than a hash lookup.
+ * @param {string} pattern A lowercased domain pattern.
+ * @returns {boolean}
+ */
+function isGlobPattern(pattern) {
+  const body = pattern.startsWith('*.') ? pattern.slice(2) : pattern;
+  return /[*?\[\]]/.test(body);
+}
+
+/**
+ * Cleans a domain list: lowercases, drops blanks, comments and duplicates, and
+ * removes entries already covered by a broader "*.suffix" pattern in the list.
+ * @param {Array<string>} domains The raw domain patterns.
+ * @returns {Array<string>} The normalized list, in original order.
+ */
+export function normalizeDomainList(domains) {
+  const unique = [...new Set(
+    (domains || []).map(d => d.trim().toLowerCase()).filter(d => d && !d.startsWith('#'))
+  )];
+  const suffixes = new Set(
+    unique.filter(d => d.startsWith('*.') && !isGlobPattern(d)).map(d => d.slice(2))
+  );
+  return unique.filter(d => {
+    if (isGlobPattern(d)) return true;
+    const name = d.startsWith('*.') ? d.slice(2) : d;
+    for (let i = name.indexOf('.'); i !== -1; i = name.indexOf('.', i + 1)) {
+      if (suffixes.has(name.slice(i + 1))) return false;
+    }
+    return true;
+  });
+}
+
+/**
+ * Compiles domain patterns into the hashed tables queried by the PAC matchDomain() helper.
+ * Each pattern maps to its index so ordered rule lists keep first-match-wins semantics.
+ * @param {Array<string>} patterns Domain patterns as accepted by shExpMatch().
+ * @param {boolean} [ordered=true] If false, all indices are 0 (smaller output for plain sets).
+ * @returns {{exact: object, suffix: object, globs: Array<Array>}}
+ */
+export function compileDomainPatterns(patterns, ordered = true) {
+  const exact = Object.create(null);
+  const suffix = Object.create(null);
+  const globs = [];
+  (patterns || []).forEach((raw, i) => {
+    const pattern = raw.trim().toLowerCase();
+    const index = ordered ? i : 0;
+    if (!pattern) return;
+    if (isGlobPattern(pattern)) {
+      globs.push([pattern, index]);
+    } else if (pattern.startsWith('*.')) {
+      const name = pattern.slice(2);
+      if (!(name in suffix)) suffix[name] = index;
+    } else if (!(pattern in exact)) {
+      exact[pattern] = index;
+    }
+  });
+  return { exact, suffix, globs };
+}
+
+/**
+ * Emits top-level domain tables for a PAC script.
+ * @param {string} prefix The table name prefix (e.g., "GEOSITE").
+ * @param {{exact: object, suffix: object, globs: Array<Array>}} compiled The output of compileDomainPatterns().
+ * @param {string} title A short description used in the section comment.
+ * @returns {string} PAC source code.
+ */
+export function buildDomainDeclarations(prefix, compiled, title) {
+  return `
+// --- ${title} (${Object.keys(compiled.exact).length} exact, ${Object.keys(compiled.suffix).length} suffix, ${compiled.globs.length} glob) ---
+const ${prefix}_EXACT = ${JSON.stringify(compiled.exact)};
+const ${prefix}_SUFFIX = ${JSON.stringify(compiled.suffix)};
+const ${prefix}_GLOBS = ${JSON.stringify(compiled.globs)};
+`;
+}
+
+/**
+ * Computes a SHA-256 hex digest of PAC builder inputs, used as a cache key.
+ * @param {*} inputs Any JSON-serializable value.
+ * @returns {Promise<string>} The hex digest.
+ */
+export async function hashPacInputs(inputs) {
+  const data = new TextEncoder().encode(JSON.stringify([PAC_BUILDER_VERSION, inputs ?? null]));
+  const digest = await crypto.subtle.digest('SHA-256', data);
+  return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+}
@@ -43,6 +43,16 @@ document.addEventListener('DOMContentLoaded', () => {
     // Fallback for unmapped errors
     return error.replace(/Error$/, '').trim();
   }
+
+  // Formats a probe's phase timings (e.g. DNS, connect, TLS) for a tooltip.
+  function formatProbeTimings(timings) {
+    if (!timings) return '';
+    const labels = { dns_ms: 'DNS', connect_ms: 'Connect', tls_ms: 'TLS', first_byte_ms: 'First byte', cold_connect_ms: 'Cold connect' };
+    return Object.entries(labels)
+      .filter(([key]) => typeof timings[key] === 'number')
+      .map(([key, label]) => `${label}: ${timings[key]}ms`)
+      .join(' | ');
+  }
   function updateUI(status) {
     // Hide spinner once we have a status to show
     spinnerOverlay.style.display = 'none';
@@ -78,6 +88,16 @@ document.addEventListener('DOMContentLoaded', () => {
       connectButton.style.display = 'inline-flex';
       disconnectButton.style.display = 'none';
       tunnelMessage.textContent = 'Tunnel is disconnected.';
+
+      if (status && status.restarting) {
+        // The native host's supervisor is restarting the tunnel; it can still be stopped.
+        statusEl.textContent = 'Reconnecting...';
+        connectButton.style.display = 'none';
+        disconnectButton.style.display = 'inline-flex';
+        tunnelMessage.textContent = status.supervisor?.message
+          ? `Tunnel dropped (${status.supervisor.message}) and is being restarted.`
+          : 'Tunnel dropped and is being restarted.';
+      }
       return;
     }
 
@@ -95,6 +115,7 @@ document.addEventListener('DOMContentLoaded', () => {
       webLatencyEl.textContent = `${webLatency}ms`;
       webLatencyEl.className = 'value good';
     }
+    webLatencyEl.title = formatProbeTimings(status.probe_timings?.web);
 
     // Display TCP Ping Latency
     const tcpLatency = status.tcp_ping_ms;
@@ -105,6 +126,7 @@ document.addEventListener('DOMContentLoaded', () => {
       tcpPingEl.textContent = `${tcpLatency}ms`;
       tcpPingEl.className = 'value good';
     }
+    tcpPingEl.title = formatProbeTimings(status.probe_timings?.tcp);
 
     // Display Web Check Status
     const webStatus = status.web_check_status;
@@ -0,0 +1,139 @@
+// This module holds the ring buffers behind the latency and traffic histories, and the
+// base64 helpers that let chrome.storage hold typed arrays.
+//
+// A ring keeps fixed-size buckets: their start times (seconds since the epoch) in a
+// Uint32Array and their statistics, `fields` numbers per bucket, in a Float32Array. Old
+// buckets are overwritten in place, so a ring never grows and never needs to be re-sorted
+// or shifted. The bucket still being filled is kept as a plain "open" object with a `start`
+// and a sample `count`; each store defines its other fields and how they are summarized.
+
+/**
+ * Encodes bytes as base64, in chunks so that large arrays do not overflow the call stack.
+ * @param {Uint8Array} bytes The bytes.
+ * @returns {string}
+ */
+export function bytesToBase64(bytes) {
+  let binary = '';
+  const CHUNK = 0x8000;
+  for (let i = 0; i < bytes.length; i += CHUNK) {
+    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + CHUNK));
+  }
+  return btoa(binary);
+}
+
+/**
+ * Decodes base64 written by bytesToBase64().
+ * @param {string} base64 The encoded bytes.
+ * @returns {Uint8Array}
+ */
+export function base64ToBytes(base64) {
+  const binary = atob(base64);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+  return bytes;
+}
+
+/**
+ * Creates an empty ring.
+ * @param {number} capacity How many closed buckets the ring keeps.
+ * @param {number} fields How many statistics each bucket holds.
+ * @returns {object} The ring.
+ */
+export function createRing(capacity, fields) {
+  return { starts: new Uint32Array(capacity), stats: new Float32Array(capacity * fields), fields, head: 0, size: 0, open: null };
+}
+
+/**
+ * Moves a ring's open bucket to its buffer, overwriting the oldest bucket once it is full.
+ * @param {object} ring The ring.
+ * @param {function(object): Array<number>} summarize Turns the open bucket into its statistics.
+ */
+export function closeOpenBucket(ring, summarize) {
+  const open = ring.open;
+  if (!open || open.count === 0) return;
+  ring.starts[ring.head] = open.start;
+  ring.stats.set(summarize(open), ring.head * ring.fields);
+  ring.head = (ring.head + 1) % ring.starts.length;
+  ring.size = Math.min(ring.size + 1, ring.starts.length);
+}
+
+/**
+ * Returns the open bucket a sample in the bucket starting at `bucketStart` belongs to,
+ * closing the previous open bucket first if the sample starts a new one.
+ * @param {object} ring The ring.
+ * @param {number} bucketStart The start of the sample's bucket, in seconds.
+ * @param {function(number): object} createOpenBucket Creates an empty open bucket.
+ * @param {function(object): Array<number>} summarize Turns an open bucket into its statistics.
+ * @returns {{open: object, closed: boolean}|null} The open bucket and whether a bucket was
+ *   closed, or null if the clock moved backwards and the sample should be dropped.
+ */
+export function openRingBucket(ring, bucketStart, createOpenBucket, summarize) {
+  let closed = false;
+  if (ring.open && ring.open.start !== bucketStart) {
+    if (bucketStart < ring.open.start) return null;
+    closeOpenBucket(ring, summarize);
+    closed = true;
+    ring.open = null;
+  }
+  if (!ring.open) ring.open = createOpenBucket(bucketStart);
+  return { open: ring.open, closed };
+}
+
+/**
+ * Lists a ring's buckets, oldest first. The still-open bucket is included last.
+ * @param {object} ring The ring.
+ * @param {function(object): Array<number>} summarize Turns the open bucket into its statistics.
+ * @returns {Array<Array>} [start, stats] pairs; start is in seconds.
+ */
+export function readRing(ring, summarize) {
+  const capacity = ring.starts.length;
+  const buckets = [];
+  for (let i = 0; i < ring.size; i++) {
+    const index = (ring.head - ring.size + i + capacity) % capacity;
+    buckets.push([ring.starts[index], ring.stats.subarray(index * ring.fields, (index + 1) * ring.fields)]);
+  }
+  if (ring.open && ring.open.count > 0) {
+    buckets.push([ring.open.start, summarize(ring.open)]);
+  }
+  return buckets;
+}
+
+/**
+ * Converts a ring to a plain object that chrome.storage can hold.
+ * @param {object} ring The ring.
+ * @returns {object} The serialized ring.
+ */
+export function serializeRing(ring) {
+  return {
+    starts: bytesToBase64(new Uint8Array(ring.starts.buffer)),
+    stats: bytesToBase64(new Uint8Array(ring.stats.buffer)),
+    head: ring.head,
+    size: ring.size,
+    open: ring.open,
+  };
+}
+
+/**
+ * Restores a ring written by serializeRing() into an empty ring of the same shape.
+ * Throws if the data cannot be decoded.
+ * @param {object} ring The empty ring.
+ * @param {object} data The serialized ring.
+ * @param {function(number): object} createOpenBucket Creates an empty open bucket, whose
+ *   fields fill in any that the stored open bucket lacks.
+ * @returns {boolean} False if the stored ring has a different capacity and was ignored.
+ */
+export function restoreRing(ring, data, createOpenBucket) {
+  const starts = new Uint32Array(base64ToBytes(data.starts).buffer);
+  const stats = new Float32Array(base64ToBytes(data.stats).buffer);
+  if (starts.length !== ring.starts.length || stats.length !== ring.stats.length) return false;
+  ring.starts.set(starts);
+  ring.stats.set(stats);
+  ring.head = data.head;
+  ring.size = data.size;
+  if (data.open) {
+    // JSON turns Infinity into null; an open bucket always has at least one sample, so
+    // its min/max are finite whenever it is persisted.
+    ring.open = { ...createOpenBucket(data.open.start), ...data.open };
+  }
+  return true;
+}
@@ -0,0 +1,179 @@
+// This module implements a compact time-series store for per-tunnel traffic.
+// The native host reports cumulative byte counters and the current throughput of each
+// tunnel; the store turns consecutive counters into byte deltas and rolls them up into
+// the same fixed-size, typed-array ring buffers as the latency history. At most
+// MAX_TRAFFIC_TUNNELS tunnels are kept, so the store never grows without bound.
+
+import { LATENCY_TIERS } from './latency_history.js';
+import { createRing, openRingBucket, readRing, serializeRing, restoreRing } from './ring_buffer.js';
+
+/**
+ * Rollup tiers. They match the latency tiers, so both histories share one range selector.
+ */
+export const TRAFFIC_TIERS = LATENCY_TIERS;
+
+// Tunnels beyond this count evict the one updated least recently. Each tunnel takes about
+// 80 KB of storage.
+export const MAX_TRAFFIC_TUNNELS = 8;
+
+const STORE_VERSION = 1;
+// Per-bucket fields: bytes in, bytes out, then peak in/out throughput in bits per second.
+const STAT_FIELDS = 4;
+
+function createOpenBucket(start) {
+  return { start, count: 0, bytesIn: 0, bytesOut: 0, peakInBps: 0, peakOutBps: 0 };
+}
+
+function createTunnelSeries() {
+  const tiers = {};
+  for (const [name, { capacity }] of Object.entries(TRAFFIC_TIERS)) {
+    tiers[name] = createRing(capacity, STAT_FIELDS);
+  }
+  return { counters: null, updatedAt: 0, tiers };
+}
+
+/**
+ * Creates an empty traffic store.
+ * @returns {object} The store, holding one series per tunnel ID.
+ */
+export function createTrafficStore() {
+  return { tunnels: {} };
+}
+
+function summarizeOpenBucket(open) {
+  return [open.bytesIn, open.bytesOut, open.peakInBps, open.peakOutBps];
+}
+
+function evictStaleTunnels(store) {
+  const ids = Object.keys(store.tunnels);
+  if (ids.length <= MAX_TRAFFIC_TUNNELS) return;
+  ids.sort((a, b) => store.tunnels[a].updatedAt - store.tunnels[b].updatedAt)
+    .slice(0, ids.length - MAX_TRAFFIC_TUNNELS)
+    .forEach(id => delete store.tunnels[id]);
+}
+
+/**
+ * Adds one traffic reading of a tunnel to every tier. The bytes since the tunnel's previous
+ * reading are counted in the current bucket; the first reading only sets the baseline, and
+ * counters that went down (the tunnel restarted) count from zero.
+ * @param {object} store The store from createTrafficStore() or deserializeTrafficStore().
+ * @param {string} tunnelId The configuration ID of the tunnel.
+ * @param {number} timestamp The reading time in milliseconds since the epoch.
+ * @param {object} traffic The host's reading: {bytes_in, bytes_out, in_bps, out_bps}.
+ * @returns {boolean} True if at least one bucket was closed by this reading.
+ */
+export function recordTrafficSample(store, tunnelId, timestamp, traffic) {
+  let series = store.tunnels[tunnelId];
+  if (!series) {
+    series = store.tunnels[tunnelId] = createTunnelSeries();
+  }
+  const previous = series.counters;
+  const delta = (current, last) => (current >= last ? current - last : current);
+  const bytesIn = previous ? delta(traffic.bytes_in, previous.bytesIn) : 0;
+  const bytesOut = previous ? delta(traffic.bytes_out, previous.bytesOut) : 0;
+  series.counters = { bytesIn: traffic.bytes_in, bytesOut: traffic.bytes_out };
+  series.updatedAt = timestamp;
+  evictStaleTunnels(store);
+
+  const nowSeconds = Math.floor(timestamp / 1000);
+  let closedBucket = false;
+  for (const [name, { seconds }] of Object.entries(TRAFFIC_TIERS)) {
+    const bucket = openRingBucket(series.tiers[name], nowSeconds - (nowSeconds % seconds), createOpenBucket, summarizeOpenBucket);
+    if (!bucket) continue; // Clock moved backwards; drop the reading for this tier.
+    closedBucket = closedBucket || bucket.closed;
+
+    const open = bucket.open;
+    open.count++;
+    open.bytesIn += bytesIn;
+    open.bytesOut += bytesOut;
+    open.peakInBps = Math.max(open.peakInBps, traffic.in_bps || 0);
+    open.peakOutBps = Math.max(open.peakOutBps, traffic.out_bps || 0);
+  }
+  return closedBucket;
+}
+
+/**
+ * Reads the buckets of one tier, oldest first. The still-open bucket is included last.
+ * Without a tunnel ID, the buckets of all tunnels are added up; their peaks are then the
+ * sum of the per-tunnel peaks, an upper bound of the combined peak. Average throughput is
+ * taken over the bucket length, or for the open bucket over the time elapsed so far.
+ * @param {object} store The traffic store.
+ * @param {string} tierName One of the TRAFFIC_TIERS keys.
+ * @param {number} [limit=Infinity] The maximum number of (most recent) points to return.
+ * @param {string|null} [tunnelId=null] The tunnel to read, or null for all tunnels.
+ * @param {number} [now=Date.now()] The current time in milliseconds since the epoch.
+ * @returns {Array<object>} Points of the form {timestamp, bytesIn, bytesOut, in: {avgBps, peakBps}, out: {...}}.
+ */
+export function readTrafficTier(store, tierName, limit = Infinity, tunnelId = null, now = Date.now()) {
+  const tier = TRAFFIC_TIERS[tierName];
+  if (!tier) return [];
+  const ids = tunnelId === null ? Object.keys(store.tunnels) : [tunnelId].filter(id => store.tunnels[id]);
+  const totals = new Map(); // bucket start -> [bytesIn, bytesOut, peakInBps, peakOutBps]
+  for (const id of ids) {
+    for (const [start, stats] of readRing(store.tunnels[id].tiers[tierName], summarizeOpenBucket)) {
+      const sum = totals.get(start) || [0, 0, 0, 0];
+      stats.forEach((value, i) => { sum[i] += value; });
+      totals.set(start, sum);
+    }
+  }
+  const nowSeconds = Math.floor(now / 1000);
+  return [...totals.entries()]
+    .sort(([a], [b]) => a - b)
+    .slice(-limit)
+    .map(([start, [bytesIn, bytesOut, peakInBps, peakOutBps]]) => {
+      // Closed buckets span the whole tier length; the open one only the seconds since it started.
+      const elapsed = Math.min(tier.seconds, Math.max(1, nowSeconds - start));
+      return {
+        timestamp: start * 1000,
+        bytesIn,
+        bytesOut,
+        in: { avgBps: bytesIn * 8 / elapsed, peakBps: peakInBps },
+        out: { avgBps: bytesOut * 8 / elapsed, peakBps: peakOutBps },
+      };
+    });
+}
+
+/**
+ * Converts a store to a plain object that chrome.storage can hold.
+ * Ring buffers are stored as base64-encoded typed arrays.
+ * @param {object} store The traffic store.
+ * @returns {object} The serialized store.
+ */
+export function serializeTrafficStore(store) {
+  const tunnels = {};
+  for (const [id, series] of Object.entries(store.tunnels)) {
+    const tiers = {};
+    for (const [name, ring] of Object.entries(series.tiers)) {
+      tiers[name] = serializeRing(ring);
+    }
+    tunnels[id] = { counters: series.counters, updatedAt: series.updatedAt, tiers };
+  }
+  return { version: STORE_VERSION, tunnels };
+}
+
+/**
+ * Restores a store written by serializeTrafficStore().
+ * Tiers that are missing or whose capacity changed start out empty.
+ * @param {object} stored The serialized store.
+ * @returns {object} The traffic store.
+ */
+export function deserializeTrafficStore(stored) {
+  const store = createTrafficStore();
+  if (!stored || stored.version !== STORE_VERSION || !stored.tunnels) return store;
+  for (const [id, data] of Object.entries(stored.tunnels)) {
+    const series = createTunnelSeries();
+    series.counters = data.counters || null;
+    series.updatedAt = data.updatedAt || 0;
+    for (const [name, ring] of Object.entries(series.tiers)) {
+      const tier = data.tiers && data.tiers[name];
+      if (!tier) continue;
+      try {
+        restoreRing(ring, tier, createOpenBucket);
+      } catch (e) {
+        console.warn(`Discarding unreadable traffic history tier "${name}" of tunnel "${id}":`, e);
+      }
+    }
+    store.tunnels[id] = series;
+  }
+  return store;
+}